@@ -1,16 +1,21 @@
+import asyncio
 import logging
 import typing
 
-import pandas as pd
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 
 import config
 import schemas
-from pools.contract_data import get_etf_portfolio
-from pools.datasources import SpicyaDataSource
-from pools.known_pools import find_pools
+from pools.contract_data import get_etf_portfolio_async, token_address
+from pools.datasources import HistoryFetchError, SpicyaDataSource
+from pools.frame_cache import FrameCache
+from pools.known_pools import QUIPI_DATA
+from pools.price_store import PriceHistoryStore
+from pools.registry import PoolRegistry, load_snapshot
+from pools.routing import Router
 from portfolios.portfolio import RebalancedPortfolioModel, MarkovitzOptimization
+from tzktpy import aio, cache as tzkt_cache, events, singleflight
 
 logger = logging.getLogger(__name__)
 app = FastAPI(title="Tezos ETF")
@@ -24,29 +29,79 @@ app.add_middleware(
 
 KNOWN_POOLS: typing.List[schemas.PoolSpec]
 SPICY_SOURCE: SpicyaDataSource
+TZKT_EVENTS: typing.Optional[events.EventSubscriber] = None
+POOL_REGISTRY: PoolRegistry
+POOL_REFRESH_TASK: typing.Optional[asyncio.Task] = None
+TOKEN_REFRESH_TASK: typing.Optional[asyncio.Task] = None
+POOL_ROUTER: Router
 
 
-@app.on_event("startup")
-async def on_startup():
-    global KNOWN_POOLS, SPICY_SOURCE
-    # KNOWN_POOLS = [schemas.PoolSpec(**e) for e in find_pools(config.TZKT_ENDPOINT)]
+def publish_pools():
+    global KNOWN_POOLS, POOL_ROUTER
+    KNOWN_POOLS = [schemas.PoolSpec(**e) for e in POOL_REGISTRY.known_pools()]
+    # routes use every pool, not only the most recent one of each token symbol
+    POOL_ROUTER = Router(list(POOL_REGISTRY.pools.values()))
 
-    try:
-        logging.info(f'trying to load cached data')
-        pools_data = pd.read_pickle('cached-pools.pkl.gz').to_dict(orient='records')
-    except:
-        logger.warning(f"can't load cached pool data")
 
-        pools_data = find_pools(config.TZKT_ENDPOINT)
-        pd.DataFrame(pools_data).to_pickle('cached-pools.pkl.gz')
+async def refresh_pools_periodically():
+    while True:
+        try:
+            changed = await asyncio.to_thread(POOL_REGISTRY.refresh)
+            if changed:
+                publish_pools()
+                logger.info(f"{len(changed)} pools changed, registry version {POOL_REGISTRY.version}")
+        except Exception:
+            logger.exception("can't refresh pools")
+        await asyncio.sleep(config.POOL_REFRESH_INTERVAL)
+
 
-    KNOWN_POOLS = [schemas.PoolSpec(**e) for e in pools_data]
-    SPICY_SOURCE = SpicyaDataSource()
+async def refresh_tokens_periodically():
+    while True:
+        await asyncio.sleep(config.TOKEN_LIST_REFRESH_INTERVAL)
+        added = await asyncio.to_thread(SPICY_SOURCE.refresh_tokens)
+        if added:
+            logger.info(f"new spicya tokens: {added}")
+        logger.info(f"history cache: {SPICY_SOURCE.cache.stats()}")
+
+
+@app.on_event("startup")
+async def on_startup():
+    global SPICY_SOURCE, TZKT_EVENTS, POOL_REGISTRY, POOL_REFRESH_TASK, TOKEN_REFRESH_TASK
+    singleflight.enable()
+    response_cache = tzkt_cache.enable(directory=config.TZKT_CACHE_DIR)
+    if config.TZKT_EVENTS:
+        # new heads invalidate the latest-state cache entries as they are produced
+        TZKT_EVENTS = events.EventSubscriber(QUIPI_DATA[config.TZKT_ENDPOINT]['endpoint'])
+        TZKT_EVENTS.feed_cache(response_cache)
+        TZKT_EVENTS.start()
+
+    POOL_REGISTRY = PoolRegistry(config.TZKT_ENDPOINT, config.POOL_REGISTRY_PATH)
+    if not POOL_REGISTRY.pools:
+        POOL_REGISTRY.seed(load_snapshot('cached-pools.pkl.gz'))
+    if not POOL_REGISTRY.pools:
+        await asyncio.to_thread(POOL_REGISTRY.refresh)
+    publish_pools()
+    # the registry only fetches pools changed since its last refresh
+    POOL_REFRESH_TASK = asyncio.create_task(refresh_pools_periodically())
+
+    # daily metrics are downloaded again only when older than PRICE_HISTORY_MAX_AGE, and the histories of recently
+    # requested tokens are kept processed in memory
+    SPICY_SOURCE = SpicyaDataSource(
+        PriceHistoryStore(config.PRICE_HISTORY_DIR, config.PRICE_HISTORY_MAX_AGE),
+        FrameCache(config.HISTORY_CACHE_MAX_BYTES, config.HISTORY_CACHE_TTL),
+    )
+    TOKEN_REFRESH_TASK = asyncio.create_task(refresh_tokens_periodically())
     logger.info("App started")
 
 
 @app.on_event("shutdown")
 async def on_shutdown():
+    for task in (POOL_REFRESH_TASK, TOKEN_REFRESH_TASK):
+        if task is not None:
+            task.cancel()
+    if TZKT_EVENTS is not None:
+        TZKT_EVENTS.stop()
+    await aio.get_async_transport().aclose()
     logger.info("Shutdown")
 
 
@@ -55,14 +110,49 @@ async def get_pools() -> typing.List[schemas.PoolSpec]:
     return KNOWN_POOLS
 
 
+@app.get("/route", response_model=schemas.RouteResult)
+async def get_route(token_in: str, token_out: str, amount: int = Query(..., gt=0)) -> schemas.RouteResult:
+    try:
+        route = POOL_ROUTER.route(token_in, token_out, amount)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+
+    return schemas.RouteResult(
+        token_in=route.token_in,
+        token_out=route.token_out,
+        amount_in=route.amount_in,
+        amount_out=route.amount_out,
+        hops=[
+            schemas.RouteHop(
+                token_in=hop.token_in,
+                token_out=hop.token_out,
+                amount_in=hop.amount_in,
+                amount_out=hop.amount_out,
+                splits=[schemas.RouteSplit(**split._asdict()) for split in hop.splits],
+            )
+            for hop in route.hops
+        ],
+        effective_rate=route.effective_rate,
+        spot_rate=route.spot_rate,
+        price_impact=route.price_impact,
+    )
+
+
+async def load_prices(symbols):
+    try:
+        return await asyncio.to_thread(SPICY_SOURCE.get_price_matrix, symbols)
+    except HistoryFetchError as e:
+        raise HTTPException(status_code=502, detail={symbol: str(error) for symbol, error in e.errors.items()})
+
+
 @app.post("/emulate", response_model=schemas.EmulationResult)
 async def emulate(portfolio: schemas.Portfolio) -> schemas.EmulationResult:
     symbols = [asset.symbol for asset in portfolio.assets]
-    history = SPICY_SOURCE.get_history(symbols)
+    prices = await load_prices(symbols)
     tokens = [SPICY_SOURCE.get_hash(symbol) for symbol in symbols]
 
     token_weights = {token: asset.weight for token, asset in zip(tokens, portfolio.assets)}
-    emulation_result = RebalancedPortfolioModel(history).emulate(token_weights)
+    emulation_result = RebalancedPortfolioModel(prices).emulate(token_weights)
 
     total = emulation_result['portfolio-totals']
     return schemas.EmulationResult(result=[
@@ -74,11 +164,11 @@ async def emulate(portfolio: schemas.Portfolio) -> schemas.EmulationResult:
 @app.post("/markovitz-optimize", response_model=schemas.OptimizationResult)
 async def emulate(portfolio: schemas.Portfolio) -> schemas.OptimizationResult:
     symbols = [asset.symbol for asset in portfolio.assets]
-    history = SPICY_SOURCE.get_history(symbols)
+    prices = await load_prices(symbols)
 
     hashes_map = {SPICY_SOURCE.get_hash(symbol): symbol for symbol in symbols}
 
-    optimization_result = MarkovitzOptimization(history).do_optimize()
+    optimization_result = MarkovitzOptimization(prices).do_optimize()
     optimization_result = optimization_result[['profit_percent', 'volatility', 'weights']]
 
     result = list()
@@ -91,27 +181,18 @@ async def emulate(portfolio: schemas.Portfolio) -> schemas.OptimizationResult:
     return schemas.OptimizationResult(result=result)
 
 
-def map_v_type(dct, target_type):
-    return {k: target_type(v) for k, v in dct.items()}
-
-
 @app.get("/portfolio", response_model=schemas.PortfolioSpec)
-async def get_portfolio(owner: str, contract_address: str) -> schemas.PortfolioSpec:
-    portfolio = get_etf_portfolio(owner, contract_address)
+async def get_portfolio(owner: str, contract_address: str, level: typing.Optional[int] = None) -> schemas.PortfolioSpec:
+    portfolio = await get_etf_portfolio_async(owner, contract_address, level, decoded=True)
     if portfolio is None:
         return schemas.PortfolioSpec(result=[])
 
-    assets = map_v_type(portfolio['assets'], int)
-    weights = map_v_type(portfolio['weights'], int)
-    tokens = portfolio['tokens']
-    tokens = {k: v.get('fa12') or v.get('fa2', {}).get('address') for k, v in tokens.items()}
-
     token_specs = list()
-    for symbol, asset in assets.items():
-        weight = weights[symbol]
-        token = tokens.get(symbol)
+    for symbol, asset in portfolio.assets.items():
+        weight = portfolio.weights[symbol]
+        token = token_address(portfolio.tokens.get(symbol))
         token_specs.append(
-            schemas.TokenSpec(symbol=symbol, asset=asset, weight=weight, token=token)
+            schemas.TokenSpec(symbol=symbol, asset=str(asset), weight=str(weight), token=token)
         )
 
     return schemas.PortfolioSpec(result=token_specs)
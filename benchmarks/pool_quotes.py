@@ -0,0 +1,33 @@
+"""
+Benchmark of the vectorized pool quotes on the example pools.
+
+Run from the repository root:
+    python -m benchmarks.pool_quotes
+"""
+import json
+import os
+import time
+
+import numpy as np
+
+from pools.quotes import quote_pools
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLE_POOLS = os.path.join(ROOT, 'resources', 'examples', 'pool.json')
+
+
+def main():
+    with open(EXAMPLE_POOLS) as pools_file:
+        example_pools = json.load(pools_file)
+
+    trade_sizes = np.logspace(3, 9, 1000).astype(np.int64)
+    started = time.perf_counter()
+    quotes = quote_pools(example_pools, trade_sizes)
+    elapsed = time.perf_counter() - started
+    print(f'{quotes.amount_out.size} quotes in {elapsed * 1000:.3f}ms')
+    for pool, impacts in zip(example_pools, quotes.price_impact):
+        print(f"{pool['token_symbol']}: impact of 1 tez {np.interp(1e6, trade_sizes, impacts):.4%}")
+
+
+if __name__ == '__main__':
+    main()
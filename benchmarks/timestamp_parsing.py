@@ -0,0 +1,57 @@
+"""
+Benchmark of TzKT timestamp parsing on a page of operations: strptime against the cached `Base.to_datetime` and the
+vectorized `Base.to_datetime64`.
+
+Run from the repository root:
+    python -m benchmarks.timestamp_parsing --operations 100000
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from tzktpy.base import Base, _parse_timestamp
+
+
+def legacy_to_datetime(text):
+    for format in [Base.datetime_format]:
+        try:
+            return datetime.strptime(text, format)
+        except Exception:
+            pass
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark timestamp parsing on a page of operations.')
+    parser.add_argument('--operations', type=int, default=100000, help='operations in the page')
+    parser.add_argument('--per-block', type=int, default=20, help='operations sharing a block timestamp')
+    args = parser.parse_args()
+
+    start = datetime(2022, 3, 10)
+    timestamps = []
+    for index in range(args.operations):
+        value = start + timedelta(seconds=30 * (index // args.per_block), milliseconds=index % 2 * 250)
+        timestamps.append(value.strftime(Base.datetime_ms_format if index % 2 else Base.datetime_format))
+
+    def cold():
+        _parse_timestamp.cache_clear()
+        return [Base.to_datetime(text) for text in timestamps]
+
+    benchmarks = (
+        ('legacy strptime', lambda: [legacy_to_datetime(text) for text in timestamps]),
+        ('to_datetime (cold)', cold),
+        ('to_datetime (warm)', lambda: [Base.to_datetime(text) for text in timestamps]),
+        ('to_datetime64', lambda: Base.to_datetime64(timestamps)),
+    )
+    message_format = '{:<20} {:>10} {:>10}'
+    print(message_format.format('Parser', 'Seconds', 'Parsed'))
+    for name, benchmark in benchmarks:
+        began = time.perf_counter()
+        parsed = benchmark()
+        elapsed = time.perf_counter() - began
+        count = sum(1 for value in parsed if value is not None and value == value)
+        print(message_format.format(name, '%.3f' % elapsed, count))
+
+
+if __name__ == '__main__':
+    main()
@@ -9,6 +9,20 @@ CONTRACT_ADDRESS= {
 }
 
 TZKT_ENDPOINT = os.getenv("TZKT_ENDPOINT", "hangzhou")
+TZKT_CACHE_DIR = os.getenv("TZKT_CACHE_DIR", ".tzkt-cache")
+TZKT_EVENTS = os.getenv("TZKT_EVENTS", "1") == "1"
+TZKT_MIRROR_DB = os.getenv("TZKT_MIRROR_DB", ".tzkt-mirror.sqlite3")
+TZKT_MIRROR_SYNC_INTERVAL = float(os.getenv("TZKT_MIRROR_SYNC_INTERVAL", "10"))
+TZKT_MIRROR_CONFIRMATIONS = int(os.getenv("TZKT_MIRROR_CONFIRMATIONS", "2"))
+TOKEN_METADATA_DB = os.getenv("TOKEN_METADATA_DB", ".token-metadata.sqlite3")
+POOL_REGISTRY_PATH = os.getenv("POOL_REGISTRY_PATH", "pool-registry.pkl.gz")
+POOL_REFRESH_INTERVAL = float(os.getenv("POOL_REFRESH_INTERVAL", "300"))
+RESERVE_HISTORY_DIR = os.getenv("RESERVE_HISTORY_DIR", ".reserve-history")
+PRICE_HISTORY_DIR = os.getenv("PRICE_HISTORY_DIR", ".price-history")
+PRICE_HISTORY_MAX_AGE = float(os.getenv("PRICE_HISTORY_MAX_AGE", "3600"))
+HISTORY_CACHE_MAX_BYTES = int(os.getenv("HISTORY_CACHE_MAX_BYTES", str(256 * 2 ** 20)))
+HISTORY_CACHE_TTL = float(os.getenv("HISTORY_CACHE_TTL", "600"))
+TOKEN_LIST_REFRESH_INTERVAL = float(os.getenv("TOKEN_LIST_REFRESH_INTERVAL", "3600"))
 
 LOGGING_LEVEL = os.getenv("LOGGING_LEVEL", "DEBUG")
 DEBUG = os.getenv("DEBUG", False)
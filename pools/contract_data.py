@@ -1,29 +1,65 @@
+import asyncio
+import threading
+
 import config
 from pools.known_pools import QUIPI_DATA
-from tzktpy import bigmap
+from tzktpy import bigmap, decoders
+from tzktpy.mirror import BigMapMirror
 
+# portfolios bigmaps mirrored locally, by (domain, contract address)
+PORTFOLIO_MIRRORS = dict()
+PORTFOLIO_MIRRORS_LOCK = threading.Lock()
 
-def get_etf_portfolio(owner, contract_address):
-    domain = QUIPI_DATA[config.TZKT_ENDPOINT]['endpoint']
-    # contract_storage = json.loads(contract.Contract.storage())
-    result = bigmap.BigMap.by_contract(contract_address, domain=domain)
+
+def find_portfolios_ptr(bigmaps, contract_address):
     portfolio_ptr = None
-    for bm in result:
+    for bm in bigmaps:
         if bm.path == 'portfolios':
             portfolio_ptr = bm.ptr
 
     if portfolio_ptr is None:
         raise ValueError(f"can't find portfolios path in {contract_address}")
+    return portfolio_ptr
 
-    bigmap_data = bigmap.BigMapKey.by_bigmap(portfolio_ptr, domain=domain, key=owner)
-    if len(bigmap_data) == 0:
-        return None
 
-    if len(bigmap_data) > 1:
-        raise ValueError(f"multiple bigmap entries for owner = {owner}")
+def portfolio_mirror(contract_address):
+    domain = QUIPI_DATA[config.TZKT_ENDPOINT]['endpoint']
+    with PORTFOLIO_MIRRORS_LOCK:
+        mirror = PORTFOLIO_MIRRORS.get((domain, contract_address))
+        if mirror is None:
+            result = bigmap.BigMap.by_contract(contract_address, domain=domain)
+            portfolio_ptr = find_portfolios_ptr(result, contract_address)
+            mirror = BigMapMirror(
+                portfolio_ptr,
+                domain=domain,
+                path=config.TZKT_MIRROR_DB,
+                min_sync_interval=config.TZKT_MIRROR_SYNC_INTERVAL,
+                # levels that may still be reorganized are not mirrored, their updates would never be rolled back
+                confirmations=config.TZKT_MIRROR_CONFIRMATIONS,
+            )
+            PORTFOLIO_MIRRORS[(domain, contract_address)] = mirror
+    # at most one delta sync per interval, lookups in between are local
+    return mirror.refresh()
+
 
-    return bigmap_data[0].value
+def get_etf_portfolio(owner, contract_address, level=None, decoded=False):
+    mirror = portfolio_mirror(contract_address)
+    portfolio = mirror.get(owner, level=level)
+    if decoded and portfolio is not None:
+        # typed record (assets, tokens, weights), the decoder is compiled once per bigmap
+        return decoders.bigmap_decoder(mirror.ptr, mirror.domain).value(portfolio)
+    return portfolio
+
+
+async def get_etf_portfolio_async(owner, contract_address, level=None, decoded=False):
+    return await asyncio.to_thread(get_etf_portfolio, owner, contract_address, level, decoded)
+
+
+def token_address(token):
+    if token is None:
+        return None
+    return token.value if token.kind == 'fa12' else token.value.address
 
 
 if __name__ == '__main__':
-    print(get_etf_portfolio('tz1LQjdKgiAsHkYMzBH2HFDcynf7QSd5Z4Eg'))
+    print(get_etf_portfolio('tz1LQjdKgiAsHkYMzBH2HFDcynf7QSd5Z4Eg', config.CONTRACT_ADDRESS[config.TZKT_ENDPOINT]))
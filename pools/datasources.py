@@ -1,4 +1,4 @@
-import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import json
 import logging
@@ -9,6 +9,10 @@ import urllib.request
 
 import pandas as pd
 
+from pools.symbols import SymbolResolver
+from portfolios.price_matrix import PriceMatrix
+from tzktpy.cache import CachedResponse
+from tzktpy.singleflight import SingleFlight
 
 # known sources
 # https://blog.rmotr.com/top-5-free-apis-to-access-historical-cryptocurrencies-data-2438adc8b62
@@ -20,33 +24,79 @@ import pandas as pd
 # https://spicya.sdaotools.xyz/api/rest/TokenDailyMetrics?_ilike=KT1KRvNVubq64ttPbQarxec5XdS6ZQU4DVD2:0
 
 
+class UrllibTransport:
+    """Default transport of get_json. Any object with a tzktpy-style request(method, url, **kwargs) can replace it."""
+
+    def __init__(self, timeout=10):
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        request = urllib.request.Request(url, method=method)
+        with urllib.request.urlopen(request, timeout=kwargs.get('timeout', self.timeout)) as response:
+            return CachedResponse(response.status, response.read(), url)
+
+
+# concurrent requests for the same url share one download
+JSON_FLIGHT = SingleFlight()
+JSON_TRANSPORT = UrllibTransport()
+# maximum number of symbol histories fetched at once by get_history
+HISTORY_MAX_WORKERS = 8
+
+
+def set_json_transport(transport):
+    """Replaces the transport of get_json (e.g. with a tzktpy.replay transport) and returns the previous one."""
+    global JSON_TRANSPORT
+    previous, JSON_TRANSPORT = JSON_TRANSPORT, transport
+    return previous
+
+
 def get_json(json_url, error_msg=""):
+    return JSON_FLIGHT.do(json_url, _get_json, json_url, error_msg)
+
+
+def _get_json(json_url, error_msg=""):
     for attemp in range(5):
         try:
             logging.info(json_url)
-            with urllib.request.urlopen(json_url, timeout=10) as url:
-                parsed = json.loads(url.read().decode())
-                return parsed
+            response = JSON_TRANSPORT.request('GET', json_url)
+            if response.status_code != 200:
+                raise ValueError(f"unexpected status {response.status_code}")
+            return response.json()
         except Exception:
             time.sleep(1)
             logging.exception(f"attempt {attemp}: {error_msg} for {json_url}")
 
 
-def swap_symbols(symbol, possible_tokens):
-    m = hashlib.md5()
-    m.update(symbol.encode())
-    digest = m.hexdigest()
-    token_idx = int(digest, 16) % len(possible_tokens)
-    res_symbol = possible_tokens[token_idx]
-    logging.info(f'swapping symbol {symbol}->{res_symbol}')
-    return res_symbol
+class HistoryFetchError(Exception):
+    """
+    Raised by get_history when some symbols failed. Holds the error of every failed symbol and the history of the
+    others.
+    """
+
+    def __init__(self, errors, history):
+        self.errors = errors
+        self.history = history
+        details = ', '.join(f'{symbol}: {error}' for symbol, error in errors.items())
+        super().__init__(f"can't load the history of {len(errors)} symbols ({details})")
 
 
 class SpicyaDataSource:
     REST_URL = "https://spicya.sdaotools.xyz/api/rest/"
 
-    def __init__(self):
-        self.tokens = self.get_tokens_data()
+    def __init__(self, store=None, cache=None):
+        """
+        :param store: PriceHistoryStore keeping the daily metrics between requests, they are downloaded every time
+            without it
+        :param cache: FrameCache of the processed histories of tokens
+        """
+        self.store = store
+        self.cache = cache
+        self.set_tokens(self.get_tokens_data())
+
+    def set_tokens(self, tokens):
+        # the resolver index is rebuilt once per TokenList
+        self.resolver = SymbolResolver(tokens)
+        self.tokens = tokens
 
     def symbols(self):
         return list(self.tokens)
@@ -55,13 +105,11 @@ class SpicyaDataSource:
         pass
 
     def get_hash(self, symbol: str):
-        symbol = symbol.lower()
-        if symbol not in self.tokens:
-            symbol = swap_symbols(symbol, self.symbols())
-
-        if symbol not in self.tokens:
-            raise ValueError(f"symbol {symbol} not found. available symbols = {self.tokens.keys()}")
-        return self.tokens[symbol]['tag']
+        """
+        :param symbol: token symbol, name or tag
+        :return: tag of the token
+        """
+        return self.resolver.resolve(symbol)
 
     def get_tokens_data(self):
         json_data = get_json(f"{self.REST_URL}/TokenList")
@@ -71,23 +119,51 @@ class SpicyaDataSource:
         logging.info(f'loaded {result.keys()} symbols from spicya data')
         return result
 
-    def get_symbol_history(self, symbol):
-        symbol = symbol.lower()
-
-        if symbol not in self.tokens:
-            symbol = swap_symbols(symbol, self.symbols())
+    def refresh_tokens(self):
+        """
+        Reloads the TokenList, keeping the current tokens if it can't be loaded.
 
-        if symbol not in self.tokens:
-            raise ValueError(f"can't find symbol {symbol} in tokens registry")
-
-        symbol_data = self.tokens[symbol]
-        tag_value = symbol_data["tag"]
-
-        token_daily_metrics = get_json(f"{self.REST_URL}/TokenDailyMetrics?_ilike={tag_value}")
+        :return: symbols added since the last load
+        """
+        try:
+            tokens = self.get_tokens_data()
+        except Exception:
+            logging.exception("can't refresh the spicya token list")
+            return []
+        added = [symbol for symbol in tokens if symbol not in self.tokens]
+        self.set_tokens(tokens)
+        return added
+
+    def fetch_daily_metrics(self, tag):
+        """
+        :return: DataFrame of the downloaded daily metrics of a token, with a datetime day column
+        """
+        token_daily_metrics = get_json(f"{self.REST_URL}/TokenDailyMetrics?_ilike={tag}")
+        if token_daily_metrics is None:
+            raise ValueError(f"can't load daily metrics of {tag}")
         day_data = token_daily_metrics["token_day_data"]
 
         result_df = pd.DataFrame(day_data)
-        result_df["day"] = pd.to_datetime(result_df["day"])
+        if len(result_df) > 0:
+            result_df["day"] = pd.to_datetime(result_df["day"])
+        return result_df
+
+    def get_symbol_history(self, symbol):
+        tag_value = self.get_hash(symbol)
+
+        if self.cache is not None:
+            return self.cache.get_or_load(tag_value, lambda: self.token_history(tag_value))
+        return self.token_history(tag_value)
+
+    def token_history(self, tag_value):
+        """
+        :return: DataFrame of the daily prices of a token, from the store if there is one
+        """
+        if self.store is not None:
+            result_df = self.store.get(tag_value, self.fetch_daily_metrics)
+        else:
+            result_df = self.fetch_daily_metrics(tag_value)
+        result_df = result_df.copy()
         result_df['token'] = result_df['tag']
         if len(result_df)>0 and set(result_df['derivedxtz_low'].unique())=={0}:
             result_df['derivedxtz_low'] = 1
@@ -97,7 +173,7 @@ class SpicyaDataSource:
 
         result_df = result_df[result_df['derivedxtz_low']>0]
         if len(result_df)==0:
-            logging.info(f'no data for {symbol}')
+            logging.info(f'no data for {tag_value}')
         result_df.sort_values("day", inplace=True)
 
         result_df.rename(
@@ -114,13 +190,42 @@ class SpicyaDataSource:
 
         return result_df
 
-    def get_history(self, symbols):
-        dfs = list()
-        for symbol in symbols:
-            symbol_history = self.get_symbol_history(symbol)
-            dfs.append(symbol_history)
-
-        return pd.concat(dfs).sort_values('day').copy()
+    def get_history(self, symbols, max_workers=None):
+        """
+        Fetches the histories of the symbols concurrently, at most max_workers (default HISTORY_MAX_WORKERS) at once.
+
+        :return: the histories of all symbols, combined once every symbol has arrived
+        :raises HistoryFetchError: if any symbol failed, with the error of each failed symbol
+        """
+        symbols = list(symbols)
+        workers = max(1, min(max_workers or HISTORY_MAX_WORKERS, len(symbols)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(self.get_symbol_history, symbol) for symbol in symbols]
+
+        dfs, errors = list(), dict()
+        for symbol, future in zip(symbols, futures):
+            error = future.exception()
+            if error is not None:
+                logging.error(f"can't load the history of {symbol}: {error}")
+                errors[symbol] = error
+            else:
+                dfs.append(future.result())
+
+        history = pd.concat(dfs).sort_values('day').copy() if dfs else pd.DataFrame()
+        if errors:
+            raise HistoryFetchError(errors, history)
+        return history
+
+    def get_price_matrix(self, symbols, max_workers=None):
+        """
+        :return: PriceMatrix of the close prices of the symbols, built once per token set while the cache keeps it
+        """
+        tags = tuple(sorted({self.get_hash(symbol) for symbol in symbols}))
+        if self.cache is None:
+            return PriceMatrix.from_history(self.get_history(symbols, max_workers))
+        return self.cache.get_or_load(
+            ('matrix', ) + tags, lambda: PriceMatrix.from_history(self.get_history(symbols, max_workers)),
+        )
 
 
 class YahooDataSource:
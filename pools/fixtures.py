@@ -0,0 +1,208 @@
+import contextlib
+import hashlib
+import json
+import os
+import random
+
+import config
+from pools import datasources
+from pools.known_pools import POOL_CONTRACT_FIELDS, QUIPI_DATA
+from tzktpy import bigmap, contract, head, transport
+from tzktpy.replay import FixtureStore, ReplayTransport
+
+# offline fixtures for the TzKT and Spicya requests of the app, seeded from the sample shapes in resources/examples:
+#   python -m pools.fixtures resources/fixtures/hangzhou.json.gz --serve --latency 0.05 --error-rate 0.01
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'resources', 'examples')
+EXAMPLE_OWNER = 'tz1LQjdKgiAsHkYMzBH2HFDcynf7QSd5Z4Eg'
+HEAD_LEVEL = 500000
+PORTFOLIOS_PTR = 1000
+TOKEN_METADATA_PTR = 2000
+PORTFOLIOS_TYPE = {'prim': 'big_map', 'args': [
+    {'prim': 'address'},
+    {'prim': 'pair', 'args': [
+        {'prim': 'map', 'args': [{'prim': 'string'}, {'prim': 'nat'}], 'annots': ['%assets']},
+        {'prim': 'map', 'args': [{'prim': 'string'}, {'prim': 'or', 'args': [
+            {'prim': 'address', 'annots': ['%fa12']},
+            {'prim': 'pair', 'args': [
+                {'prim': 'address', 'annots': ['%address']}, {'prim': 'nat', 'annots': ['%token_id']},
+            ], 'annots': ['%fa2']},
+        ]}], 'annots': ['%tokens']},
+        {'prim': 'map', 'args': [{'prim': 'string'}, {'prim': 'nat'}], 'annots': ['%weights']},
+    ]},
+]}
+
+
+def load_example(name):
+    with open(os.path.join(EXAMPLES_DIR, f'{name}.json')) as example_file:
+        return json.load(example_file)
+
+
+def _hex(value):
+    return str(value).encode().hex()
+
+
+def _bigmap_key(index, key, value):
+    key_hash = 'expr' + hashlib.sha1(json.dumps(key).encode()).hexdigest()[:50]
+    return {
+        'id': index, 'active': True, 'hash': key_hash, 'key': key, 'value': value, 'firstLevel': 1, 'lastLevel': 1,
+        'updates': 1,
+    }
+
+
+def pool_contract(pool, index):
+    return {
+        'address': pool['pool_address'],
+        'firstActivity': 1000 + index,
+        'lastActivity': HEAD_LEVEL - index,
+        'lastActivityTime': f"{pool['lastActivityTime']}Z",
+        'tzips': [pool['tzips']],
+        'storage': {'storage': {
+            'token_address': pool['token_address'],
+            'token_id': pool['token_id'],
+            'tez_pool': str(pool['tez_pool']),
+            'token_pool': str(pool['token_pool']),
+        }},
+    }
+
+
+def seed_pools(store, endpoint, pools):
+    domain = QUIPI_DATA[endpoint]['endpoint']
+    page_size = contract.Contract.page_size
+    for factory in QUIPI_DATA[endpoint]['factory'].values():
+        rows = [
+            [pool_contract(pool, index)[field] for field in POOL_CONTRACT_FIELDS]
+            for index, pool in enumerate(pools) if pool['factory'] == factory
+        ]
+        store.add_query(
+            rows, contract.Contract.get,
+            creator=factory, domain=domain, includeStorage=True, fields=POOL_CONTRACT_FIELDS, limit=page_size, offset=0,
+        )
+
+    token_infos = {pool['token_address']: pool for pool in pools}
+    for index, (token_address, pool) in enumerate(sorted(token_infos.items())):
+        ptr = TOKEN_METADATA_PTR + index
+        token_info = {
+            'name': _hex(pool['token_name']), 'symbol': _hex(pool['token_symbol']), 'decimals': _hex(pool['decimals']),
+        }
+        store.add_query({'token_metadata': ptr}, contract.Contract.storage, token_address, domain=domain)
+        keys = [_bigmap_key(ptr, '0', {'token_id': '0', 'token_info': token_info})]
+        store.add_query(keys, bigmap.BigMapKey.by_keys, ptr, ['0'], domain=domain)
+
+
+def seed_head(store, endpoint, level=HEAD_LEVEL):
+    domain = QUIPI_DATA[endpoint]['endpoint']
+    store.add_query({
+        'cycle': level // 4096, 'level': level, 'hash': 'B' + 'L' * 50,
+        'protocol': 'PtHangz2aRngywmSRGGvrcTyMbbdpWdpFKuS4uMWxg2RaH9i1qx', 'timestamp': '2022-05-05T15:47:35Z',
+        'votingEpoch': 0, 'votingPeriod': 0, 'knownLevel': level, 'lastSync': '2022-05-05T15:47:35Z', 'synced': True,
+        'quoteLevel': level, 'quoteBtc': 0, 'quoteEur': 0, 'quoteUsd': 0, 'quoteCny': 0, 'quoteJpy': 0, 'quoteKrw': 0,
+        'quoteEth': 0,
+    }, head.Head.get, domain=domain)
+
+
+def seed_portfolio(store, endpoint, portfolio, owner=EXAMPLE_OWNER, level=HEAD_LEVEL):
+    domain = QUIPI_DATA[endpoint]['endpoint']
+    contract_address = config.CONTRACT_ADDRESS[endpoint]
+    bigmaps = [{
+        'ptr': PORTFOLIOS_PTR, 'contract': {'address': contract_address}, 'path': 'portfolios', 'tags': None,
+        'active': True, 'firstLevel': 1, 'lastLevel': 1, 'totalKeys': 1, 'activeKeys': 1, 'updates': 1,
+        'keyType': None, 'valueType': None,
+    }]
+    value = {
+        'assets': {token['symbol']: token['asset'] for token in portfolio['result']},
+        'weights': {token['symbol']: token['weight'] for token in portfolio['result']},
+        'tokens': {token['symbol']: {'fa12': token['token']} for token in portfolio['result']},
+    }
+    store.add_query(bigmaps, bigmap.BigMap.by_contract, contract_address, domain=domain)
+    store.add_query(PORTFOLIOS_TYPE, bigmap.BigMapType.get, PORTFOLIOS_PTR, domain=domain)
+    # the bootstrap page of the portfolios mirror
+    page_size = bigmap.BigMapKey.page_size
+    store.add_query(
+        [_bigmap_key(1, owner, value)], bigmap.BigMapKey.by_bigmap, PORTFOLIOS_PTR,
+        level=level, limit=page_size, offset=0, domain=domain,
+    )
+
+
+def seed_spicya(store, tokens, days):
+    rest_url = datasources.SpicyaDataSource.REST_URL
+    token_list = [{'symbol': symbol, 'tag': tag, 'name': symbol} for symbol, tag in tokens.items()]
+    store.add_json('GET', f"{rest_url}/TokenList", None, {'tokens': token_list})
+
+    for tag in tokens.values():
+        # a reproducible random walk per token
+        walk = random.Random(tag)
+        price = walk.uniform(0.1, 10)
+        day_data = list()
+        for day in days:
+            open_price = price
+            price = max(price * (1 + walk.gauss(0, 0.03)), 1e-6)
+            day_data.append({
+                'day': day,
+                'tag': tag,
+                'dailyvolumextz': round(walk.uniform(100, 10000), 2),
+                'totalliquidityxtz': round(walk.uniform(1e4, 1e6), 2),
+                'derivedxtz_open': open_price,
+                'derivedxtz_close': price,
+                'derivedxtz_high': max(open_price, price) * 1.01,
+                'derivedxtz_low': min(open_price, price) * 0.99,
+            })
+        store.add_json('GET', f"{rest_url}/TokenDailyMetrics?_ilike={tag}", None, {'token_day_data': day_data})
+
+
+def seed_fixtures(store=None, endpoint='hangzhou'):
+    store = store if store is not None else FixtureStore()
+    pools = load_example('pool')
+    portfolio = load_example('portfolio')
+
+    seed_head(store, endpoint)
+    seed_pools(store, endpoint, pools)
+    # the portfolios mirror bootstraps below the head, at the last confirmed level
+    seed_portfolio(store, endpoint, portfolio, level=HEAD_LEVEL - config.TZKT_MIRROR_CONFIRMATIONS)
+
+    tokens = {pool['token_symbol']: f"{pool['token_address']}:{pool['token_id'] or 0}" for pool in pools}
+    tokens.update({token['symbol']: f"{token['token']}:0" for token in portfolio['result']})
+    for weights in load_example('markovitz')['result'][:1]:
+        for tag in weights['weights']:
+            tokens.setdefault(tag.split(':')[0][-6:].upper(), tag)
+    days = sorted({day['day'] for day in load_example('emulation')['result']})
+    seed_spicya(store, tokens, days)
+    return store
+
+
+@contextlib.contextmanager
+def replaying(store):
+    # routes every tzktpy query and get_json call of the process to the fixtures
+    previous_transport = transport.set_transport(ReplayTransport(store))
+    previous_json_transport = datasources.set_json_transport(ReplayTransport(store))
+    try:
+        yield store
+    finally:
+        transport.set_transport(previous_transport)
+        datasources.set_json_transport(previous_json_transport)
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    from tzktpy.standin import StandinServer
+
+    parser = argparse.ArgumentParser(description='Seed offline fixtures from resources/examples.')
+    parser.add_argument('path', help='gzipped JSON fixture file to write')
+    parser.add_argument('--endpoint', default=config.TZKT_ENDPOINT)
+    parser.add_argument('--serve', action='store_true', help='serve the fixtures with the local stand-in server')
+    parser.add_argument('--port', type=int, default=5080)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    fixture_store = seed_fixtures(FixtureStore(args.path), args.endpoint)
+    fixture_store.save()
+    print(f'wrote {len(fixture_store)} fixtures to {args.path}')
+
+    if args.serve:
+        with StandinServer(fixture_store, port=args.port, latency=args.latency, error_rate=args.error_rate) as server:
+            print(f'serving on {server.url}')
+            while True:
+                time.sleep(3600)
@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+def frame_size(frame):
+    # DataFrames, or arrays and structures of arrays exposing nbytes
+    if hasattr(frame, 'memory_usage'):
+        return int(frame.memory_usage(index=True, deep=True).sum())
+    return int(frame.nbytes)
+
+
+class FrameCache:
+    """
+    Thread-safe cache of DataFrames (or PriceMatrix), expiring entries after ttl seconds and evicting the least
+    recently used ones when the frames take more than max_bytes.
+
+    Cached frames are shared between callers and must not be modified.
+    """
+
+    def __init__(self, max_bytes=256 * 2 ** 20, ttl=600):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f'<FrameCache entries={len(self._entries)} size={self.size} hits={self.hits} misses={self.misses}>'
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _drop(self, key):
+        frame, size, expires_at = self._entries.pop(key)
+        self.size -= size
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] <= time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, frame):
+        size = frame_size(frame)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            # a frame larger than the whole cache is not kept
+            if size > self.max_bytes:
+                return frame
+            self._entries[key] = (frame, size, time.monotonic() + self.ttl)
+            self.size += size
+            while self.size > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+        return frame
+
+    def get_or_load(self, key, load):
+        """
+        :param load: function computing the frame on a miss
+        """
+        frame = self.get(key)
+        if frame is None:
+            frame = self.set(key, load())
+        return frame
+
+    def discard(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                entries=len(self._entries), size=self.size, max_bytes=self.max_bytes, hits=self.hits,
+                misses=self.misses, evictions=self.evictions, expirations=self.expirations,
+            )
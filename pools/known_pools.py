@@ -1,8 +1,7 @@
 import pandas as pd
-import json
-import logging
 
-from tzktpy import contract, bigmap
+from pools import token_metadata
+from tzktpy import contract
 
 # https://madfish.crunch.help/quipu-swap/quipu-swap-for-developers
 
@@ -24,9 +23,14 @@ QUIPI_DATA = {
 }
 
 
-def find_contracts_by_address(endpoint, factory):
+POOL_CONTRACT_FIELDS = ['address', 'firstActivity', 'lastActivity', 'lastActivityTime', 'tzips', 'storage']
+
+
+def find_contracts_by_address(endpoint, factory, **filters):
     domain = QUIPI_DATA[endpoint]['endpoint']
-    result_contracts = contract.Contract.get(creator=factory, domain=domain, includeStorage=True)
+    result_contracts = list(contract.Contract.iter_get(
+        creator=factory, domain=domain, includeStorage=True, fields=POOL_CONTRACT_FIELDS, **filters
+    ))
 
     return result_contracts
 
@@ -78,18 +82,32 @@ def find_available_pools_for_factory(endpoint, factory):
 
     # https://github.com/madfish-solutions/quipuswap-sdk/blob/4c38ce4a44d7c15da197ecb28e6521f3ac8ff527/src/estimates.ts#L21
 
-    cntrs = find_contracts_by_address(endpoint, factory)
-    for cntr in cntrs:
-        cntr_storage = cntr.storage_data
+    return pool_records(endpoint, factory, find_contracts_by_address(endpoint, factory))
 
-        if cntr_storage:
-            cntr_storage = cntr_storage.get('storage')
+
+def pool_records(endpoint, factory, cntrs, failed=None):
+    """
+    :param failed: optional list receiving the contracts skipped because their token metadata lookup failed
+    """
+    cntrs = [cntr for cntr in cntrs if cntr.storage and cntr.storage.get('storage')]
+    # metadata of every pool token in one batch instead of two requests per pool
+    failed_keys = set()
+    token_infos = resolve_token_infos(endpoint, [
+        (cntr.storage['storage'].get('token_address'), cntr.storage['storage'].get('token_id')) for cntr in cntrs
+    ], failed_keys)
+    for cntr in cntrs:
+        cntr_storage = cntr.storage.get('storage')
         if cntr_storage:
             token_address = cntr_storage.get('token_address')
             token_id = cntr_storage.get('token_id')
             pool_address = cntr.address
 
-            token_info = get_token_info(endpoint, token_address)
+            key = token_metadata.token_key(token_address, token_id)
+            if key in failed_keys:
+                if failed is not None:
+                    failed.append(cntr)
+                continue
+            token_info = token_infos.get(key)
             tez_pool = int(cntr_storage['tez_pool'])
             token_pool = int(cntr_storage['token_pool'])
             if token_info:
@@ -104,7 +122,7 @@ def find_available_pools_for_factory(endpoint, factory):
                         'token_id': token_id,
                         'pool_address': pool_address,
                         'lastActivityTime': cntr.last_activity_time,
-                        'tzips': cntr.full_data['tzips'][0],
+                        'tzips': cntr.tzips[0],
                         # 'token_info': token_info,
                         'token_name': token_name,
                         'token_symbol': token_symbol,
@@ -124,32 +142,25 @@ def _find_pools(endpoint):
         yield from find_available_pools_for_factory(endpoint, f_addr)
 
 
-def find_pools(endpoint):
-    all_pools = list(_find_pools(endpoint))
-
+def select_pools(all_pools):
+    if not all_pools:
+        return []
     pools = pd.DataFrame(all_pools)
     pools = pools.sort_values('lastActivityTime', ascending = False).drop_duplicates('token_symbol')
     return pools.to_dict(orient = 'records')
 
-def get_token_info(endpoint, addr):
+
+def find_pools(endpoint):
+    return select_pools(list(_find_pools(endpoint)))
+
+
+def resolve_token_infos(endpoint, tokens, failed=None):
     domain = QUIPI_DATA[endpoint]['endpoint']
-    contract_storage = json.loads(contract.Contract.storage(addr, domain=domain))
-
-    bigmap_id = (
-        None
-        # or contract_storage.get('assets', {}).get('token_metadata')
-        or contract_storage.get('token_metadata')
-    )
-    if not bigmap_id:
-        return
-
-    try:
-        bigmap_data = bigmap.BigMapKey.by_bigmap(bigmap_id, domain=domain)
-        token_info = bigmap_data[0].value.get('token_info')
-        if token_info:
-            return {k: bytes.fromhex(v).decode() for k, v in token_info.items()}
-    except:
-        logging.exception(f"can't get token info for {endpoint}, {addr}")
+    return token_metadata.get_resolver(endpoint, domain).resolve(tokens, failed)
+
+
+def get_token_info(endpoint, addr, token_id=None):
+    return resolve_token_infos(endpoint, [(addr, token_id)]).get(token_metadata.token_key(addr, token_id))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,151 @@
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# local copy of the Spicya daily metrics of every token, so requests don't download and parse full histories:
+#
+#   <directory>/<tag>/<first day>-<last day>.parquet   daily metrics rows, one part per refresh
+#   <directory>/state.json                              watermark (last stored day) and refresh time of every tag
+#
+# parts are only appended: a refresh stores the days from the watermark on, the watermark day included since the
+# current day is still changing, and reads keep the last version of every day. parts are merged once there are many.
+
+
+def tag_directory(tag):
+    return tag.replace(':', '_').replace('/', '_')
+
+
+class PriceHistoryStore:
+    """
+    Daily metrics of tokens kept in parquet files, refreshed when older than max_age seconds.
+    """
+
+    def __init__(self, directory, max_age=3600, compact_after=32):
+        self.directory = directory
+        self.max_age = max_age
+        self.compact_after = compact_after
+        self._lock = threading.Lock()
+        self._tag_locks = dict()
+        self.state = self._load_state()
+
+    def __repr__(self):
+        return f'<PriceHistoryStore directory={self.directory!r} tokens={len(self.state)}>'
+
+    def _path(self, *parts):
+        return os.path.join(self.directory, *parts)
+
+    def _load_state(self):
+        try:
+            with open(self._path('state.json')) as state_file:
+                return json.load(state_file)
+        except FileNotFoundError:
+            return dict()
+
+    def _save_state(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            state = json.dumps(self.state, sort_keys=True)
+            file_descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(file_descriptor, 'w') as state_file:
+                state_file.write(state)
+            os.replace(temp_path, self._path('state.json'))
+
+    def _tag_lock(self, tag):
+        with self._lock:
+            return self._tag_locks.setdefault(tag, threading.Lock())
+
+    def _parts(self, tag):
+        return sorted(glob.glob(self._path(tag_directory(tag), '*.parquet')))
+
+    def watermark(self, tag):
+        """
+        :return: last stored day of a token, None if nothing is stored
+        """
+        with self._lock:
+            watermark = self.state.get(tag, {}).get('watermark')
+        return pd.Timestamp(watermark) if watermark else None
+
+    def is_stale(self, tag):
+        with self._lock:
+            refreshed_at = self.state.get(tag, {}).get('refreshed_at')
+        return refreshed_at is None or time.time() - refreshed_at >= self.max_age
+
+    def read(self, tag):
+        """
+        :return: DataFrame of the stored daily metrics of a token, one row per day, sorted by day
+        """
+        # parts are read one by one, their column types may differ between refreshes
+        frames = [pd.read_parquet(path) for path in self._parts(tag)]
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return pd.DataFrame()
+        rows = pd.concat(frames, ignore_index=True)
+        return rows.drop_duplicates('day', keep='last').sort_values('day').reset_index(drop=True)
+
+    def append(self, tag, rows):
+        """
+        Stores the days of rows from the watermark on.
+
+        :param rows: DataFrame of daily metrics with a datetime day column, e.g. a full downloaded history
+        :return: number of days after the previous watermark
+        """
+        watermark = self.watermark(tag)
+        if not rows.empty and watermark is not None:
+            rows = rows[rows['day'] >= watermark]
+        new_days = 0
+        if not rows.empty:
+            rows = rows.sort_values('day')
+            first_day, last_day = rows['day'].iloc[0], rows['day'].iloc[-1]
+            new_days = int((rows['day'] > watermark).sum()) if watermark is not None else len(rows)
+            os.makedirs(self._path(tag_directory(tag)), exist_ok=True)
+            name = f"{first_day:%Y%m%d}-{last_day:%Y%m%d}-{time.time_ns()}.parquet"
+            rows.to_parquet(self._path(tag_directory(tag), name), index=False)
+            watermark = max(watermark, last_day) if watermark is not None else last_day
+            if len(self._parts(tag)) > self.compact_after:
+                self.compact(tag)
+
+        with self._lock:
+            stored_watermark = watermark.isoformat() if watermark is not None else None
+            self.state[tag] = dict(watermark=stored_watermark, refreshed_at=time.time())
+        self._save_state()
+        return new_days
+
+    def compact(self, tag):
+        """
+        Merges the parts of a token into one.
+        """
+        parts = self._parts(tag)
+        rows = self.read(tag)
+        if rows.empty:
+            return
+        name = f"{rows['day'].iloc[0]:%Y%m%d}-{rows['day'].iloc[-1]:%Y%m%d}-{time.time_ns()}.parquet"
+        rows.to_parquet(self._path(tag_directory(tag), name), index=False)
+        for path in parts:
+            os.remove(path)
+
+    def get(self, tag, fetch):
+        """
+        Returns the daily metrics of a token, refreshing them first if they are stale.
+
+        :param fetch: function of the tag returning the downloaded daily metrics
+        :return: DataFrame of daily metrics; stale ones if the refresh fails but some days are stored
+        """
+        with self._tag_lock(tag):
+            if self.is_stale(tag):
+                try:
+                    new_days = self.append(tag, fetch(tag))
+                    logger.info(f'{tag}: {new_days} new days')
+                except Exception:
+                    if self.watermark(tag) is None:
+                        raise
+                    watermark = self.watermark(tag)
+                    logger.warning(f"can't refresh {tag}, using the stored days up to {watermark}", exc_info=True)
+            return self.read(tag)
@@ -0,0 +1,119 @@
+import collections
+
+import numpy as np
+
+from pools.known_pools import FEE_FACTOR
+
+# vectorized version of the quipuswap-sdk estimates:
+# https://github.com/madfish-solutions/quipuswap-sdk/blob/4c38ce4a44d7c15da197ecb28e6521f3ac8ff527/src/estimates.ts#L21
+#
+#   amount_out = (amount_in * fee_factor * out_pool) idiv (in_pool * 1000 + amount_in * fee_factor)
+#
+# amounts and reserves broadcast against each other like any numpy operands, e.g. trade sizes of shape (n,) against
+# reserves of shape (m, 1) give (m, n) quotes. The arithmetic is exact: int64 while the products fit, python ints
+# (object arrays) otherwise.
+
+# products are bounded with float64 estimates, so keep a margin below 2 ** 63
+INT64_LIMIT = 2 ** 62
+
+Quote = collections.namedtuple('Quote', ['amount_out', 'effective_rate', 'spot_rate', 'price_impact'])
+
+
+def _as_nat(values, name):
+    values = np.asarray(values)
+    if values.dtype.kind == 'f':
+        if not np.all(np.isfinite(values)) or np.any(values != np.floor(values)):
+            raise ValueError(f'{name} must be whole numbers of the smallest token units')
+        values = values.astype(np.float64)
+    elif values.dtype.kind not in 'iuO':
+        raise ValueError(f'{name} must be integers, got {values.dtype}')
+    if values.size and np.any(values < 0):
+        raise ValueError(f'{name} must not be negative')
+    return values
+
+
+def _fits_int64(*bounds):
+    return all(float(np.max(bound, initial=0)) < INT64_LIMIT for bound in bounds)
+
+
+def _to_ints(values, dtype):
+    if dtype is object:
+        return np.vectorize(int, otypes=[object])(values) if values.size else values.astype(object)
+    return values.astype(np.int64)
+
+
+def estimate_swap(amount_in, in_pool, out_pool, fee_factor=FEE_FACTOR):
+    """
+    Exact output amounts of swaps of amount_in into pools holding in_pool / out_pool, with the integer division of the
+    sdk.
+    """
+    amount_in = _as_nat(amount_in, 'amount_in')
+    in_pool = _as_nat(in_pool, 'in_pool')
+    out_pool = _as_nat(out_pool, 'out_pool')
+
+    in_with_fee_bound = amount_in.astype(np.float64) * fee_factor
+    numerator_bound = in_with_fee_bound * out_pool.astype(np.float64)
+    denominator_bound = in_pool.astype(np.float64) * 1000 + in_with_fee_bound
+    dtype = np.int64 if _fits_int64(numerator_bound, denominator_bound) else object
+
+    amount_in, in_pool, out_pool = (_to_ints(values, dtype) for values in (amount_in, in_pool, out_pool))
+    in_with_fee = amount_in * fee_factor
+    numerator = in_with_fee * out_pool
+    denominator = in_pool * 1000 + in_with_fee
+    # an empty pool, or nothing swapped into one, gives nothing
+    empty = denominator == 0
+    return np.where(empty, 0, numerator // np.where(empty, 1, denominator))
+
+
+def quote(amount_in, in_pool, out_pool, fee_factor=FEE_FACTOR):
+    """
+    :return: Quote of exact output amounts, effective rates (out per in), spot rates before the swap, and price impacts,
+        the relative loss of the effective rate to the spot rate (fee included)
+    """
+    amount_out = estimate_swap(amount_in, in_pool, out_pool, fee_factor)
+    amount_in = np.asarray(amount_in, dtype=np.float64)
+    in_pool = np.asarray(in_pool, dtype=np.float64)
+    out_pool = np.asarray(out_pool, dtype=np.float64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        spot_rate = np.where(in_pool > 0, out_pool / in_pool, np.nan)
+        effective_rate = np.where(amount_in > 0, np.asarray(amount_out, dtype=np.float64) / amount_in, np.nan)
+        price_impact = 1 - effective_rate / spot_rate
+    return Quote(amount_out, effective_rate, spot_rate, price_impact)
+
+
+def quote_tez_to_token(tez_value, tez_pool, token_pool, fee_factor=FEE_FACTOR):
+    return quote(tez_value, tez_pool, token_pool, fee_factor)
+
+
+def quote_token_to_tez(token_value, tez_pool, token_pool, fee_factor=FEE_FACTOR):
+    return quote(token_value, token_pool, tez_pool, fee_factor)
+
+
+def pool_reserves(pools):
+    """
+    :param pools: pool records as returned by find_pools, or a DataFrame of them
+    :return: tez_pool and token_pool column arrays of the pools, exact python ints when they don't fit int64
+    """
+    records = pools.to_dict(orient='records') if hasattr(pools, 'to_dict') else list(pools)
+    reserves = list()
+    for column in ('tez_pool', 'token_pool'):
+        values = [int(pool[column]) for pool in records]
+        dtype = np.int64 if all(value < INT64_LIMIT for value in values) else object
+        reserves.append(np.array(values, dtype=dtype))
+    return tuple(reserves)
+
+
+def quote_pools(pools, amounts, tez_to_token=True):
+    """
+    Prices every amount on every pool in one call.
+
+    :param pools: pool records, see pool_reserves
+    :param amounts: trade sizes in the smallest units of the input token (mutez when tez_to_token)
+    :return: Quote of arrays shaped (len(pools), len(amounts))
+    """
+    tez_pool, token_pool = pool_reserves(pools)
+    amounts = np.asarray(amounts)[np.newaxis, :]
+    if tez_to_token:
+        return quote_tez_to_token(amounts, tez_pool[:, np.newaxis], token_pool[:, np.newaxis])
+    return quote_token_to_tez(amounts, tez_pool[:, np.newaxis], token_pool[:, np.newaxis])
@@ -0,0 +1,128 @@
+import gzip
+import logging
+import os
+import pickle
+import tempfile
+import threading
+
+import pandas as pd
+
+from pools.known_pools import QUIPI_DATA, find_contracts_by_address, pool_records, select_pools
+
+logger = logging.getLogger(__name__)
+
+
+class PoolRegistry:
+    """
+    Known QuipuSwap pools of a network, refreshed incrementally.
+
+    Every factory remembers the highest lastActivity level seen among its pool contracts, kept below the pools whose
+    token metadata couldn't be fetched. A refresh only asks TzKT for the pool contracts active after it (new ones have
+    a firstActivity after it too), and merges them into the registry. The registry version increases with every
+    refresh that changes something, and every pool records the version it last changed in.
+    """
+
+    def __init__(self, endpoint, path=None):
+        self.endpoint = endpoint
+        self.path = path
+        self.version = 0
+        self.levels = dict()
+        self.pools = dict()
+        self.pool_versions = dict()
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self.load()
+
+    def __repr__(self):
+        return (
+            f'<PoolRegistry endpoint={self.endpoint!r} version={self.version} pools={len(self.pools)} '
+            f'levels={self.levels}>'
+        )
+
+    def seed(self, records):
+        """
+        Adds pools known from elsewhere (e.g. an old snapshot) without marking any factory level as seen,
+        so the next refresh still rescans everything.
+        """
+        with self._lock:
+            self.version += 1
+            for record in records:
+                self.pools[record['pool_address']] = record
+                self.pool_versions[record['pool_address']] = self.version
+
+    def refresh(self):
+        """
+        :return: dict of pool address to record of the pools added or changed by this refresh
+        """
+        changed = dict()
+        levels = dict(self.levels)
+        for factory in QUIPI_DATA[self.endpoint]['factory'].values():
+            level = self.levels.get(factory)
+            filters = dict() if level is None else dict(lastActivity__gt=level)
+            cntrs = find_contracts_by_address(self.endpoint, factory, **filters)
+            if not cntrs:
+                continue
+
+            new_pools = sum(1 for cntr in cntrs if level is None or cntr.first_activity > level)
+            logger.info(f'{factory}: {len(cntrs)} pool contracts active since level {level}, {new_pools} new')
+            failed = []
+            for record in pool_records(self.endpoint, factory, cntrs, failed):
+                changed[record['pool_address']] = record
+            levels[factory] = max(cntr.last_activity for cntr in cntrs)
+            if failed:
+                # pools whose token metadata couldn't be fetched stay above the level, the next refresh retries them
+                levels[factory] = min(levels[factory], min(cntr.last_activity for cntr in failed) - 1)
+                logger.warning(f'{factory}: token metadata of {len(failed)} pools unavailable, retried next refresh')
+
+        with self._lock:
+            if changed:
+                self.version += 1
+                for pool_address, record in changed.items():
+                    self.pools[pool_address] = record
+                    self.pool_versions[pool_address] = self.version
+            self.levels = levels
+        if self.path:
+            self.save()
+        return changed
+
+    def known_pools(self):
+        with self._lock:
+            records = list(self.pools.values())
+        return select_pools(records)
+
+    def changed_since(self, version):
+        with self._lock:
+            return [
+                self.pools[address] for address, pool_version in self.pool_versions.items() if pool_version > version
+            ]
+
+    def load(self, path=None):
+        with gzip.open(path or self.path, 'rb') as registry_file:
+            state = pickle.load(registry_file)
+        with self._lock:
+            self.version = state['version']
+            self.levels = state['levels']
+            self.pools = state['pools']
+            self.pool_versions = state['pool_versions']
+
+    def save(self, path=None):
+        path = path or self.path
+        with self._lock:
+            state = dict(
+                version=self.version, levels=dict(self.levels), pools=dict(self.pools),
+                pool_versions=dict(self.pool_versions),
+            )
+        directory = os.path.dirname(os.path.abspath(path))
+        file_descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(file_descriptor, 'wb') as raw_file, gzip.GzipFile(fileobj=raw_file, mode='wb') as registry_file:
+            pickle.dump(state, registry_file)
+        os.replace(temp_path, path)
+
+
+def load_snapshot(path):
+    # pools of the legacy cached-pools.pkl.gz snapshot
+    try:
+        return pd.read_pickle(path).to_dict(orient='records')
+    except Exception:
+        logger.warning(f"can't load pool snapshot {path}")
+        return []
@@ -0,0 +1,234 @@
+import contextvars
+import json
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from pools.known_pools import QUIPI_DATA
+from tzktpy import head, operation
+
+logger = logging.getLogger(__name__)
+
+# price history straight from the AMM state of the pools: the storage of every applied transaction to a pool holds
+# its reserves after the transaction, the last one of a block gives the reserves of the block.
+#
+#   <directory>/blocks/<pool_address>/<first level>-<last level>.parquet   reserves per block, one part per sync
+#   <directory>/daily/<pool_address>.parquet                               daily OHLC of the token price in tez
+#   <directory>/state.json                                                 last synced level of every pool
+#
+# a sync only fetches the transactions after the last synced level, and only recomputes the days they touch. it stops
+# a few levels below the head, so blocks that may still be orphaned are never stored.
+
+RESERVE_FIELDS = ['id', 'level', 'timestamp', 'storage']
+BLOCK_COLUMNS = ['level', 'timestamp', 'tez_pool', 'token_pool']
+DAILY_COLUMNS = ['day', 'token', 'open', 'high', 'low', 'close', 'liquidity']
+
+
+def block_reserves(transactions):
+    """
+    :param transactions: projections of RESERVE_FIELDS, in operation order
+    :return: DataFrame of the reserves after the last transaction of every block
+    """
+    rows = dict()
+    for transaction in transactions:
+        storage = (transaction.storage or {}).get('storage') or {}
+        if 'tez_pool' in storage and 'token_pool' in storage:
+            rows[transaction.level] = (
+                transaction.level, transaction.timestamp, int(storage['tez_pool']), int(storage['token_pool']),
+            )
+    blocks = pd.DataFrame(list(rows.values()), columns=BLOCK_COLUMNS)
+    blocks['timestamp'] = pd.to_datetime(blocks['timestamp'], utc=True)
+    # reserves of 18-decimal tokens don't fit int64
+    for column in ('tez_pool', 'token_pool'):
+        blocks[column] = blocks[column].astype(str)
+    return blocks
+
+
+def daily_ohlc(blocks, decimals, token, previous_close=None):
+    """
+    Resamples reserves per block into the daily OHLC of the token price in tez, the shape of the Spicya history.
+
+    :param previous_close: price at the start of the first day, it opens the day instead of its first block
+    """
+    if blocks.empty:
+        return pd.DataFrame(columns=DAILY_COLUMNS)
+
+    tez = blocks['tez_pool'].astype(float) / 10 ** 6
+    tokens = blocks['token_pool'].astype(float) / 10 ** int(decimals)
+    series = pd.DataFrame({
+        'price': (tez / tokens.where(tokens > 0)).values,
+        'liquidity': (2 * tez).values,
+    }, index=pd.DatetimeIndex(blocks['timestamp']))
+
+    days = series['price'].resample('D').ohlc()
+    days['liquidity'] = series['liquidity'].resample('D').last()
+    # days without blocks keep the last state
+    days['close'] = days['close'].ffill()
+    days['liquidity'] = days['liquidity'].ffill()
+    opens = days['close'].shift(1)
+    if previous_close is not None:
+        opens.iloc[0] = previous_close
+    days['open'] = opens.fillna(days['open']).fillna(days['close'])
+    days['high'] = days[['high', 'open', 'close']].max(axis=1)
+    days['low'] = days[['low', 'open', 'close']].min(axis=1)
+
+    days = days.reset_index().rename(columns={'timestamp': 'day'})
+    days['day'] = days['day'].dt.tz_localize(None)
+    days['token'] = token
+    return days[DAILY_COLUMNS]
+
+
+class ReserveHistory:
+    """
+    Per block reserves and daily prices of pools, rebuilt from their transactions and kept in parquet files.
+    """
+
+    def __init__(self, directory, endpoint, max_workers=4, confirmations=2):
+        self.directory = directory
+        self.endpoint = endpoint
+        self.domain = QUIPI_DATA[endpoint]['endpoint']
+        self.max_workers = max_workers
+        self.confirmations = confirmations
+        self._lock = threading.Lock()
+        self.levels = self._load_state()
+
+    def __repr__(self):
+        return f'<ReserveHistory directory={self.directory!r} endpoint={self.endpoint!r} pools={len(self.levels)}>'
+
+    def _path(self, *parts):
+        return os.path.join(self.directory, *parts)
+
+    def _load_state(self):
+        try:
+            with open(self._path('state.json')) as state_file:
+                return json.load(state_file)
+        except FileNotFoundError:
+            return dict()
+
+    def _save_state(self):
+        os.makedirs(self.directory, exist_ok=True)
+        # held while writing, so an older snapshot never replaces a newer one
+        with self._lock:
+            file_descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(file_descriptor, 'w') as state_file:
+                json.dump(self.levels, state_file, sort_keys=True)
+            os.replace(temp_path, self._path('state.json'))
+
+    def target_level(self):
+        return head.Head.get(domain=self.domain).level - self.confirmations
+
+    def fetch_blocks(self, pool_address, after_level=None, to_level=None):
+        filters = dict() if after_level is None else dict(level__gt=after_level)
+        if to_level is not None:
+            filters['level__le'] = to_level
+        transactions = operation.Transaction.iter_get(
+            target=pool_address, status='applied', fields=RESERVE_FIELDS, domain=self.domain, **filters,
+        )
+        return block_reserves(transactions)
+
+    def blocks(self, pool_address, since=None):
+        """
+        :param since: only the blocks from this timestamp on
+        :return: DataFrame of the stored reserves per block of a pool
+        """
+        directory = self._path('blocks', pool_address)
+        if not os.path.isdir(directory) or not os.listdir(directory):
+            return pd.DataFrame(columns=BLOCK_COLUMNS)
+        filters = [('timestamp', '>=', pd.Timestamp(since, tz='UTC'))] if since is not None else None
+        blocks = pd.read_parquet(directory, filters=filters).sort_values('level', kind='stable')
+        # parts of an interrupted sync may overlap the next one
+        return blocks.drop_duplicates('level', keep='last').reset_index(drop=True)
+
+    def daily(self, pool_address):
+        path = self._path('daily', f'{pool_address}.parquet')
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=DAILY_COLUMNS)
+        return pd.read_parquet(path)
+
+    def sync_pool(self, pool, to_level=None):
+        """
+        Appends the blocks of a pool since its last synced level and updates the days they fall in.
+
+        :param pool: pool record, as returned by find_pools
+        :param to_level: last level to sync, defaults to target_level()
+        :return: number of new blocks
+        """
+        pool_address = pool['pool_address']
+        to_level = to_level if to_level is not None else self.target_level()
+        with self._lock:
+            after_level = self.levels.get(pool_address)
+        new_blocks = self.fetch_blocks(pool_address, after_level, to_level)
+        if new_blocks.empty:
+            return 0
+
+        first_level, last_level = int(new_blocks['level'].iloc[0]), int(new_blocks['level'].iloc[-1])
+        os.makedirs(self._path('blocks', pool_address), exist_ok=True)
+        name = f'{first_level:010d}-{last_level:010d}.parquet'
+        new_blocks.to_parquet(self._path('blocks', pool_address, name), index=False)
+
+        # the days from the first new block on are recomputed, the earlier ones are kept
+        first_day = new_blocks['timestamp'].iloc[0].floor('D').tz_localize(None)
+        daily = self.daily(pool_address)
+        kept = daily[daily['day'] < first_day] if not daily.empty else daily
+        previous_close = kept['close'].iloc[-1] if not kept.empty else None
+        token = f"{pool['token_address']}:{pool['token_id'] or 0}"
+        recomputed = daily_ohlc(self.blocks(pool_address, since=first_day), pool['decimals'], token, previous_close)
+        os.makedirs(self._path('daily'), exist_ok=True)
+        frames = [frame for frame in (kept, recomputed) if not frame.empty]
+        pd.concat(frames, ignore_index=True).to_parquet(self._path('daily', f'{pool_address}.parquet'), index=False)
+
+        with self._lock:
+            self.levels[pool_address] = last_level
+        # saved with every pool, the parts of the pools already synced stay consistent if another one fails
+        self._save_state()
+        logger.info(f'{pool_address}: {len(new_blocks)} new blocks up to level {last_level}')
+        return len(new_blocks)
+
+    def sync(self, pools):
+        """
+        Syncs pools concurrently.
+
+        :return: dict of pool address to number of new blocks
+        """
+        pools = list(pools)
+        to_level = self.target_level()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # every sync runs in a copy of the caller's context, so an active tzktpy transport override applies
+            futures = [
+                executor.submit(contextvars.copy_context().run, self.sync_pool, pool, to_level) for pool in pools
+            ]
+            counts = {pool['pool_address']: future.result() for pool, future in zip(pools, futures)}
+        return counts
+
+    def history(self, pools):
+        """
+        :return: daily history of the pools, with the day, token, open, high, low, close columns of
+            SpicyaDataSource.get_history
+        """
+        frames = [self.daily(pool['pool_address']) for pool in pools]
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return pd.DataFrame(columns=DAILY_COLUMNS)
+        return pd.concat(frames, ignore_index=True).sort_values('day').reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    import config
+    from pools.known_pools import find_pools
+
+    parser = argparse.ArgumentParser(description='Rebuild the reserve history of the known pools from TzKT.')
+    parser.add_argument('--endpoint', default=config.TZKT_ENDPOINT)
+    parser.add_argument('--directory', default=config.RESERVE_HISTORY_DIR)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    known_pools = find_pools(args.endpoint)
+    reserve_history = ReserveHistory(args.directory, args.endpoint)
+    print(reserve_history.sync(known_pools))
+    print(reserve_history.history(known_pools).tail())
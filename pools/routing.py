@@ -0,0 +1,186 @@
+import collections
+import math
+
+from pools import quotes
+from pools.known_pools import FEE_FACTOR
+
+# routing of swaps over every known pool, not only the most recent pool of each token symbol:
+# a route is a sequence of hops between tokens (direct, or through XTZ), and every hop splits its amount across the
+# parallel pools of its token pair so that their marginal rates are equal, which minimizes the slippage of the hop.
+
+XTZ = 'XTZ'
+
+Edge = collections.namedtuple(
+    'Edge', ['pool_address', 'token_in', 'token_out', 'reserve_in', 'reserve_out', 'fee_factor'],
+)
+Split = collections.namedtuple('Split', ['pool_address', 'amount_in', 'amount_out'])
+Hop = collections.namedtuple('Hop', ['token_in', 'token_out', 'amount_in', 'amount_out', 'splits'])
+Route = collections.namedtuple(
+    'Route',
+    ['token_in', 'token_out', 'amount_in', 'amount_out', 'hops', 'effective_rate', 'spot_rate', 'price_impact'],
+)
+
+
+def token_tag(token_address, token_id):
+    return f'{token_address}:{token_id or 0}'
+
+
+def pool_edges(pool):
+    token = token_tag(pool['token_address'], pool['token_id'])
+    fee_factor = int(pool.get('fee_factor') or FEE_FACTOR)
+    tez_pool, token_pool = int(pool['tez_pool']), int(pool['token_pool'])
+    return [
+        Edge(pool['pool_address'], XTZ, token, tez_pool, token_pool, fee_factor),
+        Edge(pool['pool_address'], token, XTZ, token_pool, tez_pool, fee_factor),
+    ]
+
+
+def split_amount(edges, amount):
+    """
+    Splits an input amount across parallel pools so that their marginal rates after the swap are equal.
+
+    With g = fee_factor / 1000, a pool gives g * x * out / (in + g * x) for x, with a marginal rate of
+    g * in * out / (in + g * x) ** 2. The pools worth using are the ones whose initial marginal rate beats the common
+    final one, and for them x = (sqrt(g * in * out / rate) - in) / g.
+
+    :return: list of amounts, one per edge, summing to amount
+    """
+    usable = [i for i, edge in enumerate(edges) if edge.reserve_in > 0 and edge.reserve_out > 0]
+    if not usable or amount <= 0:
+        return [0] * len(edges)
+
+    def gamma(edge):
+        return edge.fee_factor / 1000
+
+    # pools by decreasing initial marginal rate, add them while they beat the common rate of the active ones
+    usable.sort(key=lambda i: gamma(edges[i]) * edges[i].reserve_out / edges[i].reserve_in, reverse=True)
+    active = list()
+    inverse_sqrt_rate = None
+    for i in usable:
+        candidate = active + [i]
+        offsets = sum(edges[j].reserve_in / gamma(edges[j]) for j in candidate)
+        scales = sum(
+            math.sqrt(gamma(edges[j]) * edges[j].reserve_in * edges[j].reserve_out) / gamma(edges[j]) for j in candidate
+        )
+        candidate_inverse_sqrt_rate = (amount + offsets) / scales
+        edge = edges[i]
+        initial_rate = gamma(edge) * edge.reserve_out / edge.reserve_in
+        if active and initial_rate * candidate_inverse_sqrt_rate ** 2 <= 1:
+            break
+        active, inverse_sqrt_rate = candidate, candidate_inverse_sqrt_rate
+
+    amounts = [0] * len(edges)
+    for i in active:
+        edge = edges[i]
+        scale = math.sqrt(gamma(edge) * edge.reserve_in * edge.reserve_out)
+        x = (scale * inverse_sqrt_rate - edge.reserve_in) / gamma(edge)
+        amounts[i] = max(int(x), 0)
+    # whole units lost to rounding go to the deepest pool
+    amounts[active[0]] += amount - sum(amounts)
+    return amounts
+
+
+class Router:
+    """
+    Swap routes over a set of pools, e.g. PoolRegistry.pools.values().
+
+    Every pool is a pair of edges, XTZ -> token and token -> XTZ. Tokens are identified by their 'address:id' tag,
+    or looked up by symbol (the symbol of the deepest pools wins when several tokens share one).
+    """
+
+    def __init__(self, pools, max_hops=2):
+        self.max_hops = max_hops
+        self.edges = collections.defaultdict(list)
+        self.symbols = dict()
+        liquidity = collections.Counter()
+        for pool in pools:
+            for edge in pool_edges(pool):
+                self.edges[(edge.token_in, edge.token_out)].append(edge)
+            tag = token_tag(pool['token_address'], pool['token_id'])
+            liquidity[(pool['token_symbol'], tag)] += int(pool['tez_pool'])
+        for (symbol, tag), _ in sorted(liquidity.items(), key=lambda item: item[1]):
+            self.symbols[symbol] = tag
+        self.neighbours = collections.defaultdict(set)
+        for token_in, token_out in self.edges:
+            self.neighbours[token_in].add(token_out)
+
+    def __repr__(self):
+        return f'<Router tokens={len(self.neighbours)} edges={sum(len(edges) for edges in self.edges.values())}>'
+
+    def resolve(self, token):
+        if token.upper() in (XTZ, 'TEZ'):
+            return XTZ
+        if token in self.neighbours:
+            return token
+        if f'{token}:0' in self.neighbours:
+            return f'{token}:0'
+        if token in self.symbols:
+            return self.symbols[token]
+        raise KeyError(f'unknown token {token}')
+
+    def paths(self, token_in, token_out):
+        paths, frontier = list(), [[token_in]]
+        for _ in range(self.max_hops):
+            next_frontier = list()
+            for path in frontier:
+                for token in self.neighbours[path[-1]]:
+                    if token in path:
+                        continue
+                    if token == token_out:
+                        paths.append(path + [token])
+                    else:
+                        next_frontier.append(path + [token])
+            frontier = next_frontier
+        return paths
+
+    def swap_hop(self, token_in, token_out, amount):
+        edges = self.edges[(token_in, token_out)]
+        amounts = split_amount(edges, amount)
+        outs = quotes.estimate_swap(
+            amounts,
+            [edge.reserve_in for edge in edges],
+            [edge.reserve_out for edge in edges],
+            [edge.fee_factor for edge in edges],
+        )
+        splits = [
+            Split(edge.pool_address, amount_in, int(out))
+            for edge, amount_in, out in zip(edges, amounts, outs)
+            if amount_in
+        ]
+        return Hop(token_in, token_out, amount, sum(split.amount_out for split in splits), splits)
+
+    def spot_rate(self, path):
+        rate = 1.0
+        for token_in, token_out in zip(path, path[1:]):
+            edges = self.edges[(token_in, token_out)]
+            rate *= max(edge.reserve_out / edge.reserve_in for edge in edges if edge.reserve_in)
+        return rate
+
+    def route(self, token_in, token_out, amount):
+        """
+        :param amount: amount of token_in in its smallest units (mutez for XTZ)
+        :return: the Route giving the most token_out, with the split of every hop across parallel pools
+        """
+        token_in, token_out = self.resolve(token_in), self.resolve(token_out)
+        best = None
+        for path in self.paths(token_in, token_out):
+            hops, hop_amount = list(), amount
+            for hop_in, hop_out in zip(path, path[1:]):
+                hop = self.swap_hop(hop_in, hop_out, hop_amount)
+                hops.append(hop)
+                hop_amount = hop.amount_out
+            if best is None or hop_amount > best.amount_out:
+                spot_rate = self.spot_rate(path)
+                effective_rate = hop_amount / amount if amount else math.nan
+                price_impact = 1 - effective_rate / spot_rate if spot_rate else math.nan
+                best = Route(token_in, token_out, amount, hop_amount, hops, effective_rate, spot_rate, price_impact)
+        if best is None:
+            raise KeyError(f'no route from {token_in} to {token_out}')
+        return best
+
+    def best_routes(self, token_in, amounts):
+        """
+        :param amounts: dict of token to the amount of token_in to swap into it, e.g. the tez of each rebalanced token
+        :return: dict of token to its Route
+        """
+        return {token: self.route(token_in, token, amount) for token, amount in amounts.items()}
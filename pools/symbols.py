@@ -0,0 +1,86 @@
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def fallback_index(symbol, size):
+    """
+    Deterministic position of an unknown symbol among size tokens, the md5 of the symbol modulo size.
+    """
+    return int(hashlib.md5(symbol.encode()).hexdigest(), 16) % size
+
+
+class SymbolResolver:
+    """
+    Index of the tags of the Spicya tokens, built once per TokenList.
+
+    Resolves, case-insensitively, token symbols, aliases (token names), tags (KT1...:id) and contract addresses of
+    single-token contracts. Other symbols are mapped to a deterministic token when fallback is set; these mappings are
+    computed once per symbol.
+    """
+
+    def __init__(self, tokens, fallback=True, max_fallbacks=4096):
+        """
+        :param tokens: dict of lower-cased symbol to TokenList record, in TokenList order
+        """
+        self.tokens = tokens
+        self.fallback = fallback
+        self.max_fallbacks = max_fallbacks
+        self.symbols = list(tokens)
+        self.tags = [token['tag'] for token in tokens.values()]
+        self.symbol_of = {token['tag']: symbol for symbol, token in tokens.items()}
+
+        index = dict()
+        addresses = dict()
+        for symbol, token in tokens.items():
+            addresses.setdefault(token['tag'].split(':')[0].lower(), set()).add(token['tag'])
+        for address, tags in addresses.items():
+            if len(tags) == 1:
+                index[address] = next(iter(tags))
+        # names never shadow symbols, symbols never shadow tags
+        for symbol, token in tokens.items():
+            name = (token.get('name') or '').lower()
+            if name:
+                index[name] = token['tag']
+        for symbol, token in tokens.items():
+            index[symbol] = token['tag']
+        for tag in self.tags:
+            index[tag.lower()] = tag
+        self.index = index
+
+        self._fallbacks = dict()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f'<SymbolResolver tokens={len(self.tokens)} keys={len(self.index)} fallbacks={len(self._fallbacks)}>'
+
+    def __contains__(self, symbol):
+        return symbol.lower() in self.index
+
+    def resolve(self, symbol):
+        """
+        :return: tag of a symbol, alias, tag or contract address
+        :raises ValueError: if the symbol is unknown and there is no fallback
+        """
+        key = symbol.lower()
+        tag = self.index.get(key) or self._fallbacks.get(key)
+        if tag is not None:
+            return tag
+        if not self.fallback or not self.tags:
+            raise ValueError(f"symbol {symbol} not found. available symbols = {self.symbols}")
+
+        tag = self.tags[fallback_index(key, len(self.tags))]
+        with self._lock:
+            if len(self._fallbacks) >= self.max_fallbacks:
+                self._fallbacks.clear()
+            self._fallbacks[key] = tag
+        logger.info(f'swapping symbol {key}->{self.symbol_of[tag]}')
+        return tag
+
+    def token(self, symbol):
+        """
+        :return: TokenList record of a symbol, alias, tag or contract address
+        """
+        return self.tokens[self.symbol_of[self.resolve(symbol)]]
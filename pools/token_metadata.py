@@ -0,0 +1,177 @@
+import contextvars
+import json
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from tzktpy import bigmap, contract
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS token_metadata (
+    network TEXT NOT NULL,
+    address TEXT NOT NULL,
+    token_id TEXT NOT NULL,
+    info TEXT,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (network, address, token_id)
+);
+"""
+
+
+# result of a lookup that failed (timeout, server error...), as opposed to a token confirmed to have no metadata
+FETCH_FAILED = object()
+
+
+def token_key(address, token_id):
+    # FA1.2 tokens have no token id, their metadata lives under key 0 like FA2 token 0
+    return address, str(token_id or 0)
+
+
+def _map(executor, fn, items):
+    # every call runs in a copy of the caller's context, so an active tzktpy transport override applies
+    futures = [executor.submit(contextvars.copy_context().run, fn, item) for item in items]
+    return [future.result() for future in futures]
+
+
+def decode_token_info(token_info):
+    return {k: bytes.fromhex(v).decode() for k, v in token_info.items()}
+
+
+class TokenMetadataCache:
+    """
+    Persistent token metadata keyed by (network, token address, token id).
+
+    Tokens without metadata are remembered too, and looked up again after missing_ttl seconds.
+    """
+
+    def __init__(self, path=':memory:', missing_ttl=24 * 3600):
+        self.missing_ttl = missing_ttl
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(SCHEMA)
+
+    def get_many(self, network, keys):
+        found = dict()
+        with self._lock:
+            for address, token_id in keys:
+                row = self._connection.execute(
+                    'SELECT info, fetched_at FROM token_metadata WHERE network = ? AND address = ? AND token_id = ?',
+                    (network, address, token_id),
+                ).fetchone()
+                if row is None:
+                    continue
+                info, fetched_at = row
+                if info is None and time.time() - fetched_at >= self.missing_ttl:
+                    continue
+                found[(address, token_id)] = json.loads(info) if info is not None else None
+        return found
+
+    def put_many(self, network, infos):
+        now = time.time()
+        rows = [
+            (network, address, token_id, json.dumps(info) if info is not None else None, now)
+            for (address, token_id), info in infos.items()
+        ]
+        with self._lock, self._connection:
+            self._connection.executemany('INSERT OR REPLACE INTO token_metadata VALUES (?, ?, ?, ?, ?)', rows)
+
+    def close(self):
+        self._connection.close()
+
+
+class TokenMetadataResolver:
+    """
+    Resolves the TZIP-12 token_info of many tokens at once.
+
+    Uncached token contracts have their storage fetched concurrently, then the token_metadata bigmaps are queried
+    with one batched key lookup per contract, also concurrently.
+    """
+
+    def __init__(self, endpoint, domain, cache=None, max_workers=8):
+        self.endpoint = endpoint
+        self.domain = domain
+        self.cache = cache if cache is not None else TokenMetadataCache()
+        self.max_workers = max_workers
+
+    def resolve(self, tokens, failed=None):
+        """
+        :param tokens: (token address, token id) pairs, token id being None for FA1.2 tokens
+        :param failed: optional set receiving the keys whose lookup failed, they map to None too
+        :return: dict of (token address, token id as str) to decoded token_info, None when the token has none
+        """
+        keys = {token_key(address, token_id) for address, token_id in tokens}
+        result = self.cache.get_many(self.endpoint, keys)
+        missing = keys - set(result)
+        if missing:
+            fetched = self._fetch(missing)
+            # failed lookups are not cached, they are tried again on the next call
+            self.cache.put_many(self.endpoint, {key: info for key, info in fetched.items() if info is not FETCH_FAILED})
+            result.update({key: None if info is FETCH_FAILED else info for key, info in fetched.items()})
+            if failed is not None:
+                failed.update(key for key, info in fetched.items() if info is FETCH_FAILED)
+        logger.info(f'resolved metadata of {len(keys)} tokens, {len(missing)} fetched from {self.domain}')
+        return result
+
+    def _fetch(self, keys):
+        token_ids = dict()
+        for address, token_id in keys:
+            token_ids.setdefault(address, set()).add(token_id)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            addresses = sorted(token_ids)
+            ptrs = dict(zip(addresses, _map(executor, self._metadata_ptr, addresses)))
+            with_metadata = [address for address in addresses if ptrs[address] and ptrs[address] is not FETCH_FAILED]
+            values = _map(executor, lambda address: self._token_infos(ptrs[address], token_ids[address]), with_metadata)
+            infos = dict(zip(with_metadata, values))
+
+        result = dict()
+        for address, token_id in keys:
+            if ptrs[address] is FETCH_FAILED or infos.get(address) is FETCH_FAILED:
+                result[(address, token_id)] = FETCH_FAILED
+                continue
+            token_info = infos.get(address, {}).get(token_id)
+            try:
+                result[(address, token_id)] = decode_token_info(token_info) if token_info else None
+            except ValueError:
+                logger.exception(f"can't decode token info for {self.endpoint}, {address}")
+                result[(address, token_id)] = None
+        return result
+
+    def _metadata_ptr(self, address):
+        try:
+            contract_storage = json.loads(contract.Contract.storage(address, domain=self.domain))
+            return isinstance(contract_storage, dict) and contract_storage.get('token_metadata')
+        except Exception:
+            logger.exception(f"can't get storage of {self.endpoint}, {address}")
+            return FETCH_FAILED
+
+    def _token_infos(self, ptr, token_ids):
+        try:
+            found, missing = bigmap.BigMapKey.by_keys(ptr, sorted(token_ids), domain=self.domain)
+            if missing:
+                # some contracts keep the metadata of their only token under another id
+                first_keys = bigmap.BigMapKey.by_bigmap(ptr, limit=1, domain=self.domain)
+                for token_id in missing:
+                    found[token_id] = first_keys[0].value if first_keys else None
+            return {token_id: (value or {}).get('token_info') for token_id, value in found.items()}
+        except Exception:
+            logger.exception(f"can't get token metadata from bigmap {ptr}")
+            return FETCH_FAILED
+
+
+_RESOLVERS = dict()
+_RESOLVERS_LOCK = threading.Lock()
+
+
+def get_resolver(endpoint, domain):
+    with _RESOLVERS_LOCK:
+        resolver = _RESOLVERS.get(endpoint)
+        if resolver is None:
+            cache = TokenMetadataCache(config.TOKEN_METADATA_DB)
+            resolver = _RESOLVERS[endpoint] = TokenMetadataResolver(endpoint, domain, cache)
+        return resolver
@@ -4,23 +4,44 @@ from optimization.mocma import Optimizer, is_pareto_efficient
 import json
 import logging
 
+from portfolios.price_matrix import PriceMatrix
+
 
 
 class RebalancedPortfolioModel:
-    def __init__(self, tokens_data: pd.DataFrame, rebalance_period=1):
-        self.tokens_data = tokens_data
+    def __init__(self, tokens_data, rebalance_period=1):
+        """
+        :param tokens_data: PriceMatrix of the tokens, or the long history frame it is built from
+        """
+        if not isinstance(tokens_data, PriceMatrix):
+            tokens_data = PriceMatrix.from_history(tokens_data)
+        self.prices = tokens_data
         self.rebalance_period = rebalance_period
 
+    def rebalance_days(self):
+        """
+        :return: indexes of the days the portfolio is rebalanced on, from the first day all tokens have a price
+        """
+        day_numbers = self.prices.day_numbers()
+        rebalance_days = list()
+        rebalance_day = None
+        for i in range(self.prices.start, len(day_numbers)):
+            if rebalance_day is None or day_numbers[i] - rebalance_day > self.rebalance_period:
+                rebalance_days.append(i)
+                rebalance_day = day_numbers[i]
+        return np.asarray(rebalance_days, dtype=np.intp)
+
     def emulate(self, portfolio_weights: dict):
-        if set(portfolio_weights.keys()) != set(self.tokens_data.token.unique()):
+        if set(portfolio_weights.keys()) != set(self.prices.tokens):
             raise ValueError(
                 f"can't emulate portfolio: "
                 f"required tokens = {portfolio_weights.keys()}, "
-                f"dataset tokens = {self.tokens_data.token.unique()}"
+                f"dataset tokens = {self.prices.tokens}"
             )
 
         total_weights = sum(portfolio_weights.values())
         portfolio_weights = {k: w / total_weights for k, w in portfolio_weights.items()}
+        weights = np.array([portfolio_weights[token] for token in self.prices.tokens])
 
         emulation_state = {
             'portfolio': dict(),
@@ -31,52 +52,28 @@ class RebalancedPortfolioModel:
             'weights': portfolio_weights,
             'portfolio-totals': [],
         }
+        if len(self.prices):
+            emulation_state['day'] = self.prices.days[-1]
+            last_prices = self.prices.prices[-1]
+            emulation_state['current-prices'] = {
+                token: price for token, price in zip(self.prices.tokens, last_prices) if not np.isnan(price)
+            }
 
-        for day, token, price in self.tokens_data[['day', 'token', 'close']].values:
-            if price > 0:
-                emulation_state['current-prices'][token] = price
-            emulation_state['day'] = day
-            if len(emulation_state['current-prices']) == len(portfolio_weights):
-                rebalanced = self.do_rebalance(emulation_state)
-                if rebalanced:
-                    emulation_state['start-day'] = emulation_state['start-day'] or day
-
-        return emulation_state
-
-    def do_rebalance(self, emulation_result):
-        rebalance_day = emulation_result['rebalance-day']
-        day = emulation_result['day']
-        portfolio = emulation_result['portfolio']
-        current_prices = emulation_result['current-prices']
-        weights = emulation_result['weights']
-
-        need_rebalance = rebalance_day is None or (day - rebalance_day).days > self.rebalance_period
-
-        if need_rebalance:
-            if portfolio:
-                total = sum(v * current_prices[k] for k, v in portfolio.items())
-            else:
-                total = 1
-
-            new_portfolio = dict()
-
-            for token, token_weight in weights.items():
-                token_sum = total * token_weight
-                tokens_count = token_sum / current_prices[token]
-
-                new_portfolio[token] = tokens_count
-
-            emulation_result['portfolio'] = new_portfolio
-
-            emulation_result['portfolio-totals'].append({
-                'day': day,
-                'price': total,
-            })
-            emulation_result['rebalance-day'] = day
+        rebalance_days = self.rebalance_days()
+        if not len(rebalance_days):
+            return emulation_state
 
-            return True
+        # the holdings bought at a rebalance are worth sum(w * p_next / p) of the total at the next one
+        prices = self.prices.prices[rebalance_days]
+        growth = (prices[1:] / prices[:-1]) @ weights
+        totals = np.concatenate([[1.0], np.cumprod(growth)])
 
-        return False
+        days = self.prices.days[rebalance_days]
+        emulation_state['portfolio'] = dict(zip(self.prices.tokens, totals[-1] * weights / prices[-1]))
+        emulation_state['portfolio-totals'] = [{'day': day, 'price': total} for day, total in zip(days, totals)]
+        emulation_state['rebalance-day'] = days[-1]
+        emulation_state['start-day'] = days[0]
+        return emulation_state
 
 
 def volatility(day_prices, full_period_len=252):
@@ -102,7 +99,7 @@ def volatility(day_prices, full_period_len=252):
 class MarkovitzOptimization:
     def __init__(self, tokens_data: pd.DataFrame, rebalance_period=1, num_steps=10, population_size=10, num_samples = 10):
         self.portfolio_model = RebalancedPortfolioModel(tokens_data, rebalance_period)
-        self.tokens = sorted(self.portfolio_model.tokens_data.token.unique())
+        self.tokens = self.portfolio_model.prices.tokens
         self.num_steps = num_steps
         self.population_size = population_size
         self.num_samples = num_samples
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+
+class PriceMatrix:
+    """
+    Daily prices of a set of tokens as a dense day x token float64 array.
+
+    raw holds the observed prices (NaN for days without a positive price), prices the last observed price of every
+    day, NaN before the first valid day of the token.
+    """
+
+    def __init__(self, days, tokens, raw):
+        self.days = pd.DatetimeIndex(days)
+        self.tokens = list(tokens)
+        self.token_index = {token: i for i, token in enumerate(self.tokens)}
+        self.raw = np.asarray(raw, dtype=np.float64)
+        self.observed = ~np.isnan(self.raw)
+
+        # forward fill: every cell takes the row of the last observation of its column
+        rows = np.where(self.observed, np.arange(len(self.days))[:, None], 0)
+        np.maximum.accumulate(rows, axis=0, out=rows)
+        self.valid = np.maximum.accumulate(self.observed, axis=0)
+        self.prices = np.where(self.valid, self.raw[rows, np.arange(len(self.tokens))], np.nan)
+
+        # first day of every token, len(days) for tokens without any price
+        self.first_valid = np.where(self.valid.any(axis=0), self.valid.argmax(axis=0), len(self.days))
+
+    def __repr__(self):
+        return f'<PriceMatrix days={len(self.days)} tokens={len(self.tokens)}>'
+
+    def __len__(self):
+        return len(self.days)
+
+    @classmethod
+    def from_history(cls, history, column='close'):
+        """
+        :param history: long frame with day, token and price columns, as returned by SpicyaDataSource.get_history
+        """
+        prices = history[column].where(history[column] > 0)
+        table = pd.DataFrame({'day': history['day'], 'token': history['token'], 'price': prices})
+        table = table.pivot_table(index='day', columns='token', values='price', aggfunc='last', dropna=False)
+        tokens = sorted(history['token'].unique())
+        table = table.reindex(index=pd.DatetimeIndex(sorted(history['day'].unique())), columns=tokens)
+        return cls(table.index, tokens, table.to_numpy(dtype=np.float64))
+
+    @property
+    def nbytes(self):
+        return self.raw.nbytes + self.prices.nbytes + self.observed.nbytes + self.valid.nbytes
+
+    @property
+    def start(self):
+        """
+        :return: index of the first day all tokens have a price, len(days) if there is none
+        """
+        return int(self.first_valid.max()) if self.tokens else 0
+
+    def columns(self, tokens):
+        return np.array([self.token_index[token] for token in tokens], dtype=np.intp)
+
+    def select(self, tokens):
+        """
+        :return: PriceMatrix of a subset of the tokens
+        """
+        return PriceMatrix(self.days, tokens, self.raw[:, self.columns(tokens)])
+
+    def day_numbers(self):
+        return self.days.values.astype('datetime64[D]').astype(np.int64)
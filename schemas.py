@@ -40,6 +40,31 @@ class PoolSpec(BaseModel):
     token_to_tez_dbg: float
 
 
+class RouteSplit(BaseModel):
+    pool_address: str
+    amount_in: int
+    amount_out: int
+
+
+class RouteHop(BaseModel):
+    token_in: str
+    token_out: str
+    amount_in: int
+    amount_out: int
+    splits: List[RouteSplit]
+
+
+class RouteResult(BaseModel):
+    token_in: str
+    token_out: str
+    amount_in: int
+    amount_out: int
+    hops: List[RouteHop]
+    effective_rate: float
+    spot_rate: float
+    price_impact: float
+
+
 class TokenSpec(BaseModel):
     symbol: str
     asset: str
@@ -1,8 +1,44 @@
+import json
 import pathlib
 
 import pytest
 
+from tzktpy import transport
+
 
 @pytest.fixture(scope='session')
 def resources():
     return pathlib.Path(__file__).parent.parent / 'resources'
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200, url=''):
+        self.payload = payload
+        self.status_code = status_code
+        self.url = url
+
+    def json(self):
+        return self.payload
+
+    @property
+    def content(self):
+        return json.dumps(self.payload).encode()
+
+
+class FakeTransport:
+    def __init__(self):
+        self.calls = []
+        self.handler = lambda method, url, params: []
+
+    def request(self, method, url, **kwargs):
+        params = dict(kwargs.get('params') or {})
+        self.calls.append((method, url, params))
+        return FakeResponse(self.handler(method, url, params), url=url)
+
+
+@pytest.fixture
+def fake_transport():
+    fake = FakeTransport()
+    previous = transport.set_transport(fake)
+    yield fake
+    transport.set_transport(previous)
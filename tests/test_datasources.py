@@ -0,0 +1,82 @@
+import json
+import threading
+import time
+
+import pytest
+
+from pools import datasources
+from pools.frame_cache import FrameCache
+from tzktpy.cache import CachedResponse
+
+TOKENS = [{'symbol': symbol, 'tag': f'KT1{symbol}:0'} for symbol in ('AAA', 'BBB', 'CCC')]
+
+
+def day(tag, date, price):
+    return {
+        'day': date, 'tag': tag, 'dailyvolumextz': 1, 'totalliquidityxtz': 10, 'derivedxtz_high': price,
+        'derivedxtz_low': price, 'derivedxtz_open': price, 'derivedxtz_close': price,
+    }
+
+
+class SlowTransport:
+    def __init__(self, broken=()):
+        self.broken = broken
+        self.active = self.peak = 0
+        self.lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        if url.endswith('/TokenList'):
+            return CachedResponse(200, json.dumps({'tokens': TOKENS}).encode(), url)
+        tag = url.rsplit('=', 1)[1]
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.05)
+        with self.lock:
+            self.active -= 1
+        days = [day(tag, '2022-05-02', 2), day(tag, '2022-05-01', 1)]
+        payload = {} if tag in self.broken else {'token_day_data': days}
+        return CachedResponse(200, json.dumps(payload).encode(), url)
+
+
+@pytest.fixture
+def json_transport():
+    def install(transport):
+        previous.append(datasources.set_json_transport(transport))
+        return transport
+    previous = []
+    yield install
+    datasources.set_json_transport(previous[0])
+
+
+def test_history_fetches_symbols_concurrently(json_transport):
+    transport = json_transport(SlowTransport())
+    history = datasources.SpicyaDataSource().get_history(['AAA', 'BBB', 'CCC'])
+    assert transport.peak == 3
+    assert len(history) == 6 and list(history['day'].dt.day) == [1, 1, 1, 2, 2, 2]
+    assert set(history['token']) == {'KT1AAA:0', 'KT1BBB:0', 'KT1CCC:0'}
+
+    transport.peak = 0
+    datasources.SpicyaDataSource().get_history(['AAA', 'BBB', 'CCC'], max_workers=1)
+    assert transport.peak == 1
+
+
+def test_history_reports_failures_per_symbol(json_transport):
+    json_transport(SlowTransport(broken=('KT1BBB:0', )))
+    with pytest.raises(datasources.HistoryFetchError) as error:
+        datasources.SpicyaDataSource().get_history(['AAA', 'BBB', 'CCC'])
+    assert list(error.value.errors) == ['BBB'] and isinstance(error.value.errors['BBB'], KeyError)
+    assert set(error.value.history['token']) == {'KT1AAA:0', 'KT1CCC:0'}
+
+
+def test_cached_histories_skip_the_network(json_transport):
+    transport = json_transport(SlowTransport())
+    calls = []
+    request = transport.request
+    transport.request = lambda method, url, **kwargs: calls.append(url) or request(method, url, **kwargs)
+    source = datasources.SpicyaDataSource(cache=FrameCache())
+    first = source.get_history(['AAA', 'BBB'])
+    requests = len(calls)
+    second = source.get_history(['AAA', 'BBB'])
+    assert len(calls) == requests and source.cache.hits == 2
+    assert second.reset_index(drop=True).equals(first.reset_index(drop=True))
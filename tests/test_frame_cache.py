@@ -0,0 +1,41 @@
+import pandas as pd
+
+from pools import frame_cache
+from pools.frame_cache import FrameCache
+
+
+def frame(rows):
+    return pd.DataFrame({'close': [1.0] * rows})
+
+
+def test_cache_evicts_least_recently_used_frames_by_size():
+    size = frame_cache.frame_size(frame(100))
+    cache = FrameCache(max_bytes=2 * size, ttl=60)
+    cache.set('a', frame(100))
+    cache.set('b', frame(100))
+    assert cache.get('a') is not None
+    cache.set('c', frame(100))
+    assert cache.get('b') is None and cache.get('a') is not None and cache.get('c') is not None
+    assert cache.size == 2 * size
+    assert cache.stats()['evictions'] == 1
+    cache.set('huge', frame(1000))
+    assert cache.get('huge') is None and len(cache) == 2
+
+
+def test_cache_expires_entries_and_counts_hits(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(frame_cache.time, 'monotonic', lambda: now[0])
+    cache = FrameCache(ttl=10)
+    loads = []
+
+    def load():
+        loads.append(1)
+        return frame(3)
+
+    cache.get_or_load('a', load)
+    cache.get_or_load('a', load)
+    now[0] += 10
+    cache.get_or_load('a', load)
+    assert len(loads) == 2
+    stats = cache.stats()
+    assert {key: stats[key] for key in ('hits', 'misses', 'expirations')} == {'hits': 1, 'misses': 2, 'expirations': 1}
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from pools import fixtures, quotes
+from pools.known_pools import FEE_FACTOR
+
+
+def sdk_estimate(amount_in, in_pool, out_pool):
+    in_with_fee = amount_in * FEE_FACTOR
+    return in_with_fee * out_pool // (in_pool * 1000 + in_with_fee)
+
+
+def test_quotes_match_sdk_integer_division():
+    pools = fixtures.load_example('pool')
+    amounts = [0, 1, 999, 10 ** 6, 123456789]
+    result = quotes.quote_pools(pools, amounts)
+
+    assert result.amount_out.shape == (len(pools), len(amounts))
+    for row, pool in zip(result.amount_out, pools):
+        assert list(row) == [sdk_estimate(amount, pool['tez_pool'], pool['token_pool']) for amount in amounts]
+
+    back = quotes.quote_pools(pools, amounts, tez_to_token=False)
+    pool = pools[0]
+    expected = [sdk_estimate(amount, pool['token_pool'], pool['tez_pool']) for amount in amounts]
+    assert list(back.amount_out[0]) == expected
+
+
+def test_quotes_fall_back_to_exact_ints_on_overflow():
+    amounts = np.array([10 ** 18, 5], dtype=object)
+    result = quotes.estimate_swap(amounts, 10 ** 20, 10 ** 21)
+
+    assert result.dtype == object
+    assert list(result) == [sdk_estimate(10 ** 18, 10 ** 20, 10 ** 21), sdk_estimate(5, 10 ** 20, 10 ** 21)]
+
+
+def test_quote_rates_and_impact():
+    result = quotes.quote_tez_to_token([10 ** 4, 10 ** 5, 10 ** 6], 10 ** 9, 2 * 10 ** 9)
+
+    assert np.allclose(result.spot_rate, 2)
+    assert result.amount_out.dtype == np.int64
+    assert np.allclose(result.effective_rate, result.amount_out / np.array([10 ** 4, 10 ** 5, 10 ** 6]))
+    # the fee alone for small trades, growing with the trade size
+    assert result.price_impact[0] == pytest.approx(1 - FEE_FACTOR / 1000, abs=1e-3)
+    assert np.all(np.diff(result.price_impact) > 0)
+    assert quotes.quote(0, 0, 0).amount_out == 0
+
+    with pytest.raises(ValueError):
+        quotes.estimate_swap(-1, 10, 10)
@@ -0,0 +1,70 @@
+from pools import fixtures, token_metadata
+from pools.known_pools import POOL_CONTRACT_FIELDS
+from pools.registry import PoolRegistry
+from tzktpy.replay import FixtureStore
+
+
+def test_registry_refreshes_only_changed_pools(fake_transport, monkeypatch, tmp_path):
+    monkeypatch.setattr(token_metadata, '_RESOLVERS', dict())
+    monkeypatch.setattr(token_metadata.config, 'TOKEN_METADATA_DB', ':memory:')
+    pools = fixtures.load_example('pool')
+    store = FixtureStore()
+    fixtures.seed_pools(store, 'hangzhou', pools)
+    changed_pool = dict(pools[0], tez_pool=1000, token_pool=2000)
+
+    def handler(method, url, params):
+        if url.endswith('/v1/contracts') and 'lastActivity.gt' in params:
+            if params['creator'] != changed_pool['factory']:
+                return []
+            return [[fixtures.pool_contract(changed_pool, -1)[field] for field in POOL_CONTRACT_FIELDS]]
+        return store.lookup(method, url, params).json()
+
+    fake_transport.handler = handler
+    path = str(tmp_path / 'registry.pkl.gz')
+    registry = PoolRegistry('hangzhou', path)
+    assert len(registry.refresh()) == len(pools)
+    assert registry.version == 1
+    levels = dict(registry.levels)
+
+    reloaded = PoolRegistry('hangzhou', path)
+    changed = reloaded.refresh()
+    contract_calls = [params for _, url, params in fake_transport.calls if url.endswith('/v1/contracts')]
+    assert sorted(params.get('lastActivity.gt') for params in contract_calls[-2:]) == sorted(levels.values())
+    assert list(changed) == [changed_pool['pool_address']]
+    assert reloaded.version == 2
+    assert reloaded.pools[changed_pool['pool_address']]['tez_pool'] == 1000
+    assert reloaded.levels[changed_pool['factory']] == fixtures.HEAD_LEVEL + 1
+    assert reloaded.changed_since(1) == [reloaded.pools[changed_pool['pool_address']]]
+    assert len(reloaded.known_pools()) == len({pool['token_symbol'] for pool in pools})
+
+
+def test_registry_retries_pools_whose_metadata_failed(fake_transport, monkeypatch):
+    monkeypatch.setattr(token_metadata, '_RESOLVERS', dict())
+    monkeypatch.setattr(token_metadata.config, 'TOKEN_METADATA_DB', ':memory:')
+    pools = fixtures.load_example('pool')
+    store = FixtureStore()
+    fixtures.seed_pools(store, 'hangzhou', pools)
+    failing = pools[5]
+    state = {'down': True}
+
+    def handler(method, url, params):
+        if state['down'] and url.endswith(f"/v1/contracts/{failing['token_address']}/storage"):
+            raise TimeoutError(url)
+        if url.endswith('/v1/contracts') and 'lastActivity.gt' in params:
+            return [
+                [fixtures.pool_contract(pool, index)[field] for field in POOL_CONTRACT_FIELDS]
+                for index, pool in enumerate(pools)
+                if pool['factory'] == params['creator'] and fixtures.HEAD_LEVEL - index > params['lastActivity.gt']
+            ]
+        return store.lookup(method, url, params).json()
+
+    fake_transport.handler = handler
+    registry = PoolRegistry('hangzhou')
+    assert len(registry.refresh()) == len(pools) - 1
+    assert failing['pool_address'] not in registry.pools
+    assert registry.levels[failing['factory']] == fixtures.HEAD_LEVEL - 6
+
+    state['down'] = False
+    assert failing['pool_address'] in registry.refresh()
+    assert failing['pool_address'] in registry.pools
+    assert registry.levels[failing['factory']] == fixtures.HEAD_LEVEL
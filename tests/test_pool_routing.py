@@ -0,0 +1,51 @@
+import pytest
+
+from pools import quotes, routing
+
+
+def pool(pool_address, token_address, symbol, tez_pool, token_pool):
+    return {
+        'pool_address': pool_address, 'token_address': token_address, 'token_id': None, 'token_symbol': symbol,
+        'tez_pool': tez_pool, 'token_pool': token_pool, 'fee_factor': 997,
+    }
+
+
+POOLS = [
+    pool('KT1deep', 'KT1token', 'TKN', 10 ** 10, 5 * 10 ** 10),
+    pool('KT1shallow', 'KT1token', 'TKN', 2 * 10 ** 9, 10 ** 10),
+    pool('KT1other', 'KT1other', 'OTH', 10 ** 10, 10 ** 8),
+]
+
+
+def test_split_equalizes_parallel_pools():
+    router = routing.Router(POOLS)
+    amount = 10 ** 9
+    route = router.route('XTZ', 'TKN', amount)
+
+    assert [len(hop.splits) for hop in route.hops] == [2]
+    splits = {split.pool_address: split for split in route.hops[0].splits}
+    assert sum(split.amount_in for split in splits.values()) == amount
+    # the same tez_pool / token_pool ratio, so the split follows the pool depths
+    assert splits['KT1deep'].amount_in == pytest.approx(5 * splits['KT1shallow'].amount_in, rel=1e-6)
+
+    def output(deep_amount):
+        legs = [(deep_amount, 10 ** 10, 5 * 10 ** 10), (amount - deep_amount, 2 * 10 ** 9, 10 ** 10)]
+        return sum(int(quotes.estimate_swap(x, tez, tkn)) for x, tez, tkn in legs)
+
+    best_brute_force = max(output(amount * share // 100) for share in range(101))
+    assert route.amount_out >= best_brute_force
+    assert route.amount_out > output(amount)
+
+
+def test_route_through_xtz():
+    router = routing.Router(POOLS)
+    route = router.route('OTH', 'KT1token:0', 10 ** 6)
+
+    assert [(hop.token_in, hop.token_out) for hop in route.hops] == [('KT1other:0', 'XTZ'), ('XTZ', 'KT1token:0')]
+    assert route.hops[1].amount_in == route.hops[0].amount_out
+    assert route.amount_out == route.hops[1].amount_out
+    assert 0 < route.price_impact < 0.05
+    assert route.spot_rate == pytest.approx(100 * 5)
+
+    with pytest.raises(KeyError):
+        router.route('XTZ', 'NOPE', 1)
@@ -1,6 +1,8 @@
+import numpy as np
 import pytest
 import pandas as pd
 from portfolios.portfolio import RebalancedPortfolioModel, MarkovitzOptimization
+from portfolios.price_matrix import PriceMatrix
 
 
 
@@ -27,4 +29,30 @@ def test_markovitz(full_history: pd.DataFrame):
     optimization = MarkovitzOptimization(full_history)
 
     pareto_df = optimization.do_optimize()
-    print(pareto_df.to_markdown())
\ No newline at end of file
+    print(pareto_df.to_markdown())
+
+
+def test_price_matrix_forward_fills_from_first_valid_day():
+    history = pd.DataFrame({
+        'day': pd.to_datetime(['2022-05-01', '2022-05-02', '2022-05-02', '2022-05-03', '2022-05-04', '2022-05-04']),
+        'token': ['a', 'a', 'b', 'b', 'a', 'b'],
+        'close': [1.0, 2.0, 10.0, 0.0, 4.0, 20.0],
+    })
+    matrix = PriceMatrix.from_history(history)
+    assert matrix.tokens == ['a', 'b']
+    np.testing.assert_array_equal(matrix.prices, [[1, np.nan], [2, 10], [2, 10], [4, 20]])
+    assert list(matrix.first_valid) == [0, 1] and matrix.start == 1
+    assert matrix.observed[:, 1].tolist() == [False, True, False, True]
+
+    emulation = RebalancedPortfolioModel(matrix, rebalance_period=0).emulate({'a': 1, 'b': 1})
+    assert [total['price'] for total in emulation['portfolio-totals']] == pytest.approx([1.0, 1.0, 2.0])
+    assert emulation['start-day'] == pd.Timestamp('2022-05-02')
+    assert emulation['portfolio'] == pytest.approx({'a': 0.25, 'b': 0.05})
+
+
+def test_emulation_accepts_history_or_matrix(full_history: pd.DataFrame):
+    weights = {token: 1 for token in full_history['token'].unique()}
+    from_history = RebalancedPortfolioModel(full_history).emulate(weights)
+    from_matrix = RebalancedPortfolioModel(PriceMatrix.from_history(full_history)).emulate(weights)
+    assert from_history['portfolio-totals'] == from_matrix['portfolio-totals']
+    assert len(from_history['portfolio-totals']) == 30
@@ -0,0 +1,50 @@
+import pandas as pd
+
+from pools.price_store import PriceHistoryStore
+
+TAG = 'KT1token:0'
+
+
+def days(*values):
+    return pd.DataFrame({
+        'day': pd.to_datetime([day for day, _ in values]),
+        'tag': TAG,
+        'derivedxtz_close': [close for _, close in values],
+    })
+
+
+def test_store_appends_days_after_watermark_and_refreshes_when_stale(tmp_path):
+    downloads = [days(('2022-05-01', 1.0), ('2022-05-02', 2.0))]
+
+    def fetch(tag):
+        assert tag == TAG
+        return downloads[-1]
+
+    store = PriceHistoryStore(str(tmp_path), max_age=3600)
+    assert list(store.get(TAG, fetch)['derivedxtz_close']) == [1.0, 2.0]
+    assert store.watermark(TAG) == pd.Timestamp('2022-05-02')
+
+    # fresh: served from the store without downloading
+    downloads.append(None)
+    assert len(store.get(TAG, fetch)) == 2
+
+    # the watermark day is updated and the next days appended
+    downloads[-1] = days(('2022-05-01', 1.0), ('2022-05-02', 2.5), ('2022-05-03', 3.0))
+    reopened = PriceHistoryStore(str(tmp_path), max_age=0)
+    assert reopened.append(TAG, downloads[-1]) == 1
+    assert list(reopened.read(TAG)['derivedxtz_close']) == [1.0, 2.5, 3.0]
+    assert len(reopened._parts(TAG)) == 2
+
+    reopened.compact(TAG)
+    assert len(reopened._parts(TAG)) == 1
+    assert list(reopened.read(TAG)['day'].dt.day) == [1, 2, 3]
+
+
+def test_store_serves_stale_days_when_refresh_fails(tmp_path):
+    store = PriceHistoryStore(str(tmp_path), max_age=0)
+    store.append(TAG, days(('2022-05-01', 1.0)))
+
+    def fail(tag):
+        raise ValueError('down')
+
+    assert list(store.get(TAG, fail)['derivedxtz_close']) == [1.0]
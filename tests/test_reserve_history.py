@@ -0,0 +1,81 @@
+import pytest
+
+from pools.reserve_history import ReserveHistory
+
+POOL = {'pool_address': 'KT1pool', 'token_address': 'KT1token', 'token_id': None, 'decimals': '6'}
+HEAD = {
+    'level': 100, 'cycle': 1, 'hash': 'B', 'protocol': 'P', 'timestamp': None, 'votingEpoch': 0, 'votingPeriod': 0,
+    'knownLevel': 0, 'lastSync': None, 'synced': True, 'quoteLevel': 0, 'quoteBtc': 0, 'quoteEur': 0, 'quoteUsd': 0,
+    'quoteCny': 0, 'quoteJpy': 0, 'quoteKrw': 0, 'quoteEth': 0,
+}
+
+
+def transaction(id, level, timestamp, tez_pool, token_pool):
+    return [id, level, timestamp, {'storage': {'tez_pool': str(tez_pool), 'token_pool': str(token_pool)}}]
+
+
+def test_sync_appends_new_blocks_and_updates_touched_days(fake_transport, tmp_path):
+    transactions = [
+        transaction(1, 10, '2022-05-01T10:00:00Z', 100, 100),
+        transaction(2, 11, '2022-05-01T12:00:00Z', 200, 100),
+        transaction(3, 11, '2022-05-01T12:00:00Z', 300, 100),
+        transaction(4, 12, '2022-05-02T08:00:00Z', 150, 100),
+    ]
+
+    def handler(method, url, params):
+        if url.endswith('/v1/head'):
+            return HEAD
+        assert url.endswith('/v1/operations/transactions/')
+        assert params['select.values'] == 'id,level,timestamp,storage'
+        assert params['level.le'] == 98
+        after = int(params.get('level.gt', 0))
+        rows = [row for row in transactions if row[1] > after]
+        offset = int(params['offset'])
+        return rows[offset:offset + int(params['limit'])]
+
+    fake_transport.handler = handler
+    history = ReserveHistory(str(tmp_path), 'hangzhou')
+    assert history.sync([POOL]) == {'KT1pool': 3}
+    blocks = history.blocks('KT1pool')
+    assert list(blocks['level']) == [10, 11, 12]
+    assert list(blocks['tez_pool']) == ['100', '300', '150']
+
+    transactions += [
+        transaction(5, 13, '2022-05-02T20:00:00Z', 400, 100), transaction(6, 14, '2022-05-04T01:00:00Z', 50, 100),
+    ]
+    reloaded = ReserveHistory(str(tmp_path), 'hangzhou')
+    assert reloaded.sync([POOL]) == {'KT1pool': 2}
+    assert fake_transport.calls[-1][2]['level.gt'] == 12
+
+    daily = reloaded.history([POOL])
+    assert [day.strftime('%m-%d') for day in daily['day']] == ['05-01', '05-02', '05-03', '05-04']
+    assert list(daily['close']) == pytest.approx([3.0, 4.0, 4.0, 0.5])
+    assert list(daily['open']) == pytest.approx([1.0, 3.0, 4.0, 4.0])
+    assert list(daily['high']) == pytest.approx([3.0, 4.0, 4.0, 4.0])
+    assert list(daily['low']) == pytest.approx([1.0, 1.5, 4.0, 0.5])
+    assert daily['liquidity'].iloc[-1] == pytest.approx(2 * 50 / 10 ** 6)
+    assert set(daily['token']) == {'KT1token:0'}
+
+
+def test_failed_pool_keeps_synced_pools_consistent(fake_transport, tmp_path):
+    broken = dict(POOL, pool_address='KT1broken')
+
+    def handler(method, url, params):
+        if url.endswith('/v1/head'):
+            return HEAD
+        if params['target'] == 'KT1broken':
+            raise ConnectionError(url)
+        rows = [
+            transaction(1, 10, '2022-05-01T10:00:00Z', 100, 100), transaction(2, 11, '2022-05-01T12:00:00Z', 200, 100),
+        ]
+        return [row for row in rows if row[1] > int(params.get('level.gt', 0))][int(params['offset']):]
+
+    fake_transport.handler = handler
+    history = ReserveHistory(str(tmp_path), 'hangzhou')
+    with pytest.raises(ConnectionError):
+        history.sync([POOL, broken])
+    assert ReserveHistory(str(tmp_path), 'hangzhou').levels == {'KT1pool': 11}
+
+    # a part overlapping the stored blocks doesn't duplicate levels
+    history.fetch_blocks('KT1pool').to_parquet(str(tmp_path / 'blocks' / 'KT1pool' / 'overlap.parquet'), index=False)
+    assert list(history.blocks('KT1pool')['level']) == [10, 11]
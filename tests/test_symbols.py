@@ -0,0 +1,31 @@
+import pytest
+
+from pools.symbols import SymbolResolver, fallback_index
+
+TOKENS = {
+    'spi': {'symbol': 'SPI', 'name': 'Spice Token', 'tag': 'KT1spi:0'},
+    'wtz': {'symbol': 'WTZ', 'name': 'Wrapped Tezos', 'tag': 'KT1wtz:0'},
+    'fa2': {'symbol': 'FA2', 'name': 'wtz', 'tag': 'KT1multi:1'},
+    'fa2b': {'symbol': 'FA2B', 'name': None, 'tag': 'KT1multi:2'},
+}
+
+
+def test_resolver_maps_symbols_names_tags_and_addresses():
+    resolver = SymbolResolver(TOKENS)
+    assert resolver.resolve('SPI') == resolver.resolve('spi') == 'KT1spi:0'
+    assert resolver.resolve('Spice Token') == 'KT1spi:0'
+    # symbols win over names
+    assert resolver.resolve('WTZ') == 'KT1wtz:0'
+    assert resolver.resolve('KT1multi:2') == resolver.resolve('kt1MULTI:2') == 'KT1multi:2'
+    assert resolver.resolve('KT1spi') == 'KT1spi:0'
+    assert 'KT1multi' not in resolver
+    assert resolver.token('kt1wtz:0')['symbol'] == 'WTZ'
+
+
+def test_resolver_falls_back_deterministically_once_per_symbol():
+    resolver = SymbolResolver(TOKENS)
+    tag = resolver.resolve('ETH')
+    assert tag == list(TOKENS.values())[fallback_index('eth', len(TOKENS))]['tag']
+    assert resolver.resolve('eth') == tag and len(resolver._fallbacks) == 1
+    with pytest.raises(ValueError):
+        SymbolResolver(TOKENS, fallback=False).resolve('ETH')
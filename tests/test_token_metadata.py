@@ -0,0 +1,57 @@
+from pools.token_metadata import TokenMetadataCache, TokenMetadataResolver
+
+
+def hex_info(**fields):
+    return {name: value.encode().hex() for name, value in fields.items()}
+
+
+def test_resolver_batches_and_caches_per_token(fake_transport, tmp_path):
+    storages = {'KT1a': {'token_metadata': 11}, 'KT1b': {'token_metadata': 12}, 'KT1c': {'ledger': 13}}
+
+    def handler(method, url, params):
+        if url.endswith('/storage'):
+            return storages[url.split('/')[-2]]
+        ptr = int(url.split('/')[-2])
+        return [
+            {
+                'id': 1, 'active': True, 'hash': 'expr', 'key': key,
+                'value': {'token_info': hex_info(symbol='T%s%s' % (ptr, key), decimals='6')},
+            }
+            for key in params['key.in'].split(',')
+        ]
+
+    fake_transport.handler = handler
+    path = str(tmp_path / 'metadata.sqlite3')
+    tokens = [('KT1a', None), ('KT1b', '0'), ('KT1b', 1), ('KT1c', None)]
+    infos = TokenMetadataResolver('hangzhou', 'https://api.example.org', TokenMetadataCache(path)).resolve(tokens)
+
+    assert infos == {
+        ('KT1a', '0'): {'symbol': 'T110', 'decimals': '6'},
+        ('KT1b', '0'): {'symbol': 'T120', 'decimals': '6'},
+        ('KT1b', '1'): {'symbol': 'T121', 'decimals': '6'},
+        ('KT1c', '0'): None,
+    }
+    bigmap_calls = [params for _, url, params in fake_transport.calls if '/bigmaps/' in url]
+    assert sorted(params['key.in'] for params in bigmap_calls) == ['0', '0,1']
+
+    requests = len(fake_transport.calls)
+    reopened = TokenMetadataResolver('hangzhou', 'https://api.example.org', TokenMetadataCache(path))
+    assert reopened.resolve(tokens) == infos
+    assert len(fake_transport.calls) == requests
+
+
+def test_failed_lookups_are_not_cached(fake_transport):
+    state = {'down': True}
+
+    def handler(method, url, params):
+        if state['down']:
+            raise TimeoutError(url)
+        if url.endswith('/storage'):
+            return {'token_metadata': 11}
+        return [{'id': 1, 'active': True, 'hash': 'expr', 'key': '0', 'value': {'token_info': hex_info(symbol='T')}}]
+
+    fake_transport.handler = handler
+    resolver = TokenMetadataResolver('hangzhou', 'https://api.example.org', TokenMetadataCache())
+    assert resolver.resolve([('KT1a', None)]) == {('KT1a', '0'): None}
+    state['down'] = False
+    assert resolver.resolve([('KT1a', None)]) == {('KT1a', '0'): {'symbol': 'T'}}
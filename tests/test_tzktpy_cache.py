@@ -0,0 +1,99 @@
+import asyncio
+
+from tzktpy import aio, cache, transport
+from tzktpy.bigmap import BigMapKey
+from tzktpy.head import Head
+from tzktpy.quote import Quote
+
+DOMAIN = 'https://api.example.org'
+HEAD = {
+    'cycle': 1, 'level': 100, 'hash': 'B', 'protocol': 'P', 'timestamp': '2022-03-10T00:00:00Z', 'votingEpoch': 1,
+    'votingPeriod': 1, 'knownLevel': 100, 'lastSync': None, 'synced': True, 'quoteLevel': 100, 'quoteBtc': 0,
+    'quoteEur': 0, 'quoteUsd': 0, 'quoteCny': 0, 'quoteJpy': 0, 'quoteKrw': 0, 'quoteEth': 0,
+}
+
+
+def install_cache(fake_transport, **kwargs):
+    response_cache = cache.ResponseCache(**kwargs)
+    transport.set_transport(cache.CachingTransport(fake_transport, response_cache))
+    return response_cache
+
+
+def handler(method, url, params):
+    if url.endswith('/v1/head'):
+        return dict(HEAD)
+    if '/keys' in url:
+        return [{'id': 1, 'active': True, 'hash': 'expr', 'key': 'tz1', 'value': '1'}]
+    return [{'level': params.get('level', 1), 'timestamp': None}]
+
+
+def test_latest_state_entries_expire_on_new_head(fake_transport):
+    fake_transport.handler = handler
+    response_cache = install_cache(fake_transport)
+
+    Head.get(domain=DOMAIN)
+    BigMapKey.by_bigmap(1, key='tz1', domain=DOMAIN)
+    BigMapKey.by_bigmap(1, key='tz1', domain=DOMAIN)
+    assert len(fake_transport.calls) == 2
+
+    HEAD['level'] = 101
+    try:
+        Head.get(domain=DOMAIN)
+    finally:
+        HEAD['level'] = 100
+    BigMapKey.by_bigmap(1, key='tz1', domain=DOMAIN)
+    assert len(fake_transport.calls) == 4
+    assert response_cache.hits == 1
+
+
+def test_historical_entries_survive_new_heads(fake_transport, tmp_path):
+    fake_transport.handler = handler
+    response_cache = install_cache(fake_transport, directory=str(tmp_path))
+
+    Head.get(domain=DOMAIN)
+    Quote.get(level=50, domain=DOMAIN)
+    response_cache.observe_head(DOMAIN, 200)
+    response_cache.memory.clear()
+    quotes = Quote.get(level=50, domain=DOMAIN)
+
+    assert quotes[0].level == 50
+    assert len(fake_transport.calls) == 2
+    assert response_cache.pinned_level(DOMAIN + '/v1/bigmaps/5/historical_keys/42') == 42
+    assert response_cache.pinned_level(DOMAIN + '/v1/quotes', {'level.lt': 42}) == 41
+    assert response_cache.pinned_level(DOMAIN + '/v1/quotes', {'level.gt': 42}) is None
+
+
+def test_latest_state_is_not_cached_before_a_head_is_known(fake_transport):
+    fake_transport.handler = handler
+    response_cache = install_cache(fake_transport)
+    BigMapKey.by_bigmap(1, key='tz1', domain=DOMAIN)
+    BigMapKey.by_bigmap(1, key='tz1', domain=DOMAIN)
+    assert len(fake_transport.calls) == 2 and len(response_cache.memory) == 0
+
+
+def test_enable_replaces_the_installed_cache(fake_transport):
+    previous_async = aio.get_async_transport()
+    try:
+        first = cache.enable()
+        second = cache.enable()
+        installed = transport.get_transport()
+        assert installed.cache is second and installed.inner is fake_transport and first is not second
+        assert aio.get_async_transport().inner is previous_async
+    finally:
+        aio.set_async_transport(previous_async)
+
+
+def test_shutdown_closes_the_wrapped_async_transport(fake_transport):
+    closed = []
+
+    class ClosingAsyncTransport:
+        async def aclose(self):
+            closed.append(True)
+
+    previous_async = aio.set_async_transport(ClosingAsyncTransport())
+    try:
+        cache.enable()
+        asyncio.run(aio.get_async_transport().aclose())
+    finally:
+        aio.set_async_transport(previous_async)
+    assert closed == [True]
@@ -0,0 +1,59 @@
+import datetime
+
+import numpy as np
+
+from tzktpy import decoders
+from tzktpy.bigmap import BigMapType
+
+LEDGER_TYPE = {'prim': 'big_map', 'args': [
+    {'prim': 'pair', 'args': [{'prim': 'address'}, {'prim': 'nat'}]},
+    {'prim': 'pair', 'args': [
+        {'prim': 'nat', 'annots': ['%balance']},
+        {'prim': 'pair', 'args': [
+            {'prim': 'timestamp', 'annots': ['%lastUpdate']},
+            {'prim': 'option', 'args': [{'prim': 'or', 'args': [
+                {'prim': 'unit', 'annots': ['%frozen']},
+                {'prim': 'mutez', 'annots': ['%limit']},
+            ]}], 'annots': ['%state']},
+        ]},
+        {'prim': 'map', 'args': [
+            {'prim': 'pair', 'args': [{'prim': 'address'}, {'prim': 'nat'}]},
+            {'prim': 'bool'},
+        ], 'annots': ['%operators']},
+    ]},
+]}
+
+
+def test_compiled_decoder_types_values(fake_transport):
+    fake_transport.handler = lambda method, url, params: LEDGER_TYPE
+    decoders.bigmap_decoder.cache_clear()
+    decoder = decoders.bigmap_decoder(42, domain='https://api.example.org')
+    assert decoders.bigmap_decoder(42, domain='https://api.example.org') is decoder
+    assert len(fake_transport.calls) == 1
+    assert fake_transport.calls[0][1] == 'https://api.example.org/v1/bigmaps/42/type'
+
+    key = decoder.key({'address': 'tz1a', 'nat': '7'})
+    assert (key.address, key.nat) == ('tz1a', 7)
+
+    value = decoder.value({
+        'balance': '100000000000000000000000', 'lastUpdate': '2022-05-01T10:00:00Z', 'state': {'limit': '5'},
+        'operators': [{'key': {'address': 'tz1b', 'nat': '0'}, 'value': True}],
+    })
+    assert value.balance == 10 ** 23
+    assert value.last_update == datetime.datetime(2022, 5, 1, 10)
+    assert value.state == decoders.Variant('limit', 5)
+    assert list(value.operators.items()) == [((('tz1b', 0)), True)]
+    empty = decoder.value({'balance': '1', 'lastUpdate': '2022-05-01T10:00:00Z', 'state': None, 'operators': {}})
+    assert empty.state is None
+
+
+def test_decoder_records_are_columnar():
+    decoder = decoders.BigMapDecoder.from_type(1, BigMapType.from_api(LEDGER_TYPE | {'annots': None}))
+    values = [
+        {'balance': str(balance), 'lastUpdate': '2022-05-0%sT00:00:00Z' % day, 'state': None, 'operators': {}}
+        for day, balance in [(1, 5), (2, 7)]
+    ]
+    records = decoder.records(values)
+    assert records.balance.dtype == np.int64
+    assert list(records.balance) == [5, 7]
+    assert records.last_update.dtype == np.dtype('datetime64[s]')
@@ -0,0 +1,96 @@
+import asyncio
+import time
+
+from tzktpy import cache, events
+from tzktpy.standin import StandinHub
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def test_subscriber_fans_out_and_resubscribes_after_drop():
+    hub = StandinHub(level=100)
+    subscriber = events.EventSubscriber('https://api.example.org', connection_factory=hub.connect, min_backoff=0.01)
+    heads, updates = [], []
+    subscriber.subscribe_head(heads.append)
+    subscriber.subscribe_bigmaps(7, updates.append)
+    subscriber.start()
+    try:
+        wait_for(lambda: len(hub.open_connections()) == 1)
+        hub.publish('bigmaps', [{'bigmap': 7, 'action': 'update_key'}, {'bigmap': 8, 'action': 'add_key'}], level=101)
+
+        hub.drop()
+        wait_for(lambda: subscriber.connections == 2 and len(hub.open_connections()) == 1)
+        hub.publish('head', {'level': 102}, level=102)
+    finally:
+        subscriber.stop()
+
+    assert [event.state for event in heads] == [100, 101, 102]
+    assert [event.type for event in updates] == [events.STATE, events.DATA, events.STATE]
+    assert updates[1].data == [{'bigmap': 7, 'action': 'update_key'}]
+    assert hub.connections[1].subscriptions == [('head', None), ('bigmaps', {'ptr': 7})]
+
+
+def test_subscriber_feeds_queues_and_cache():
+    hub = StandinHub(level=100)
+    response_cache = cache.ResponseCache()
+    subscriber = events.EventSubscriber('https://api.example.org', connection_factory=hub.connect)
+    subscriber.feed_cache(response_cache)
+
+    async def run():
+        heads = subscriber.queue('head')
+        subscriber.start()
+        first = await asyncio.wait_for(heads.get(), 5)
+        hub.publish('head', {'level': 101}, level=101)
+        second = await asyncio.wait_for(heads.get(), 5)
+        return first, second
+
+    try:
+        first, second = asyncio.run(run())
+    finally:
+        subscriber.stop()
+
+    assert (first.state, second.state, second.data) == (100, 101, {'level': 101})
+    assert response_cache.head_level('https://api.example.org') == 101
+
+
+def test_subscription_queues_only_receive_their_data():
+    hub = StandinHub(level=100)
+    subscriber = events.EventSubscriber('https://api.example.org', connection_factory=hub.connect)
+
+    async def run():
+        seven = subscriber.queue(subscriber.subscribe_bigmaps(7))
+        subscriber.subscribe_bigmaps(8)
+        subscriber.start()
+        wait_for(lambda: len(hub.open_connections()) == 1)
+        hub.publish('bigmaps', [{'bigmap': 7, 'action': 'update_key'}, {'bigmap': 8, 'action': 'add_key'}], level=101)
+        while True:
+            event = await asyncio.wait_for(seven.get(), 5)
+            if event.type == events.DATA:
+                return [event]
+
+    try:
+        data_events = asyncio.run(run())
+    finally:
+        subscriber.stop()
+
+    assert [event.data for event in data_events] == [[{'bigmap': 7, 'action': 'update_key'}]]
+    assert events.Event.from_message('head', {'type': 0, 'state': 5}).state == 5
+    assert not hasattr(events.Event, 'from_message_async')
+
+
+def test_full_queues_drop_their_oldest_event():
+    subscriber = events.EventSubscriber('https://api.example.org')
+
+    async def run():
+        heads = subscriber.queue('head', maxsize=2)
+        for level in (101, 102, 103):
+            subscriber.dispatch('head', {'type': events.DATA, 'state': level, 'data': {'level': level}})
+        await asyncio.sleep(0)
+        return [heads.get_nowait().state for _ in range(heads.qsize())]
+
+    assert asyncio.run(run()) == [102, 103]
@@ -0,0 +1,120 @@
+import threading
+
+import pytest
+from tzktpy.mirror import BigMapMirror
+
+
+def bigmap_key(key, value, active=True):
+    return {
+        'id': 1, 'active': active, 'hash': 'expr', 'key': key, 'value': value, 'firstLevel': 1, 'lastLevel': 1,
+        'updates': 1,
+    }
+
+
+def bigmap_update(id, level, action, key, value=None):
+    return {
+        'id': id, 'level': level, 'timestamp': '2022-03-10T00:00:00Z', 'bigmap': 7, 'contract': {'address': 'KT1'},
+        'path': 'portfolios', 'action': action, 'content': {'hash': 'expr', 'key': key, 'value': value},
+    }
+
+
+def head(level):
+    return {
+        'level': level, 'cycle': 1, 'hash': 'B', 'protocol': 'P', 'timestamp': None, 'votingEpoch': 0,
+        'votingPeriod': 0, 'knownLevel': 0, 'lastSync': None, 'synced': True, 'quoteLevel': 0, 'quoteBtc': 0,
+        'quoteEur': 0, 'quoteUsd': 0, 'quoteCny': 0, 'quoteJpy': 0, 'quoteKrw': 0, 'quoteEth': 0,
+    }
+
+
+def test_mirror_bootstraps_then_applies_deltas(fake_transport, tmp_path):
+    state = {'head': 100}
+
+    def handler(method, url, params):
+        if url.endswith('/v1/head'):
+            return head(state['head'])
+        if url.endswith('/v1/bigmaps/7/historical_keys/100'):
+            return [
+                bigmap_key('tz1a', {'assets': 1}), bigmap_key('tz1b', {'assets': 2}),
+                bigmap_key('tz1c', {'assets': 3}, active=False),
+            ]
+        if url.endswith('/v1/bigmaps/updates'):
+            assert (params['bigmap'], params['level.gt'], params['level.le']) == (7, 100, 110)
+            return [
+                bigmap_update(1, 105, 'update_key', 'tz1a', {'assets': 10}),
+                bigmap_update(2, 108, 'remove_key', 'tz1b'),
+                bigmap_update(3, 109, 'add_key', 'tz1d', {'assets': 4}),
+            ]
+        raise AssertionError(url)
+
+    fake_transport.handler = handler
+    path = str(tmp_path / 'mirror.sqlite3')
+    mirror = BigMapMirror(7, domain='https://api.example.org', path=path)
+    assert mirror.sync() == 2
+    state['head'] = 110
+    assert mirror.sync() == 3
+
+    requests = len(fake_transport.calls)
+    assert mirror.get('tz1a') == {'assets': 10}
+    assert mirror.get('tz1a', level=104) == {'assets': 1}
+    assert mirror.get('tz1b') is None and mirror.get('tz1b', level=107) == {'assets': 2}
+    assert mirror.get('tz1c') is None
+    assert sorted(mirror.keys()) == ['"tz1a"', '"tz1d"']
+    assert len(fake_transport.calls) == requests
+    with pytest.raises(ValueError):
+        mirror.get('tz1a', level=111)
+
+    reopened = BigMapMirror(7, domain='https://api.example.org', path=path)
+    assert (reopened.bootstrap_level, reopened.synced_level) == (100, 110)
+    assert reopened.get('tz1d') == {'assets': 4}
+
+
+def test_mirrors_of_the_same_ptr_on_two_domains_are_separate(fake_transport, tmp_path):
+    def handler(method, url, params):
+        if url.endswith('/v1/head'):
+            return head(100)
+        network = 'main' if 'mainnet' in url else 'test'
+        return [bigmap_key('tz1a', {'network': network})]
+
+    fake_transport.handler = handler
+    path = str(tmp_path / 'mirror.sqlite3')
+    mainnet = BigMapMirror(7, domain='https://mainnet.example.org', path=path)
+    mainnet.sync()
+    testnet = BigMapMirror(7, domain='https://testnet.example.org', path=path, confirmations=2)
+    assert testnet.synced_level is None
+    testnet.sync()
+    assert testnet.synced_level == 98
+    assert mainnet.get('tz1a') == {'network': 'main'} and testnet.get('tz1a') == {'network': 'test'}
+
+
+def test_sync_fetches_without_blocking_readers_and_removes_keys_added_in_the_batch(fake_transport):
+    state = {'head': 100}
+    read_during_sync = []
+
+    def read():
+        read_during_sync.append(mirror.get('tz1a'))
+
+    def handler(method, url, params):
+        if url.endswith('/v1/head'):
+            return head(state['head'])
+        if url.endswith('/v1/bigmaps/7/historical_keys/100'):
+            return [bigmap_key('tz1a', {'assets': 1})]
+        if url.endswith('/v1/bigmaps/updates'):
+            reader = threading.Thread(target=read)
+            reader.start()
+            reader.join(5)
+            removal = dict(bigmap_update(2, 106, 'remove', None), content=None)
+            return [
+                bigmap_update(1, 105, 'add_key', 'tz1b', {'assets': 2}), removal,
+                bigmap_update(3, 107, 'add_key', 'tz1c', {'assets': 3}),
+            ]
+        raise AssertionError(url)
+
+    fake_transport.handler = handler
+    mirror = BigMapMirror(7, domain='https://api.example.org')
+    mirror.sync()
+    state['head'] = 110
+    assert mirror.sync() == 4
+    assert read_during_sync == [{'assets': 1}]
+    assert mirror.get('tz1b', level=105) == {'assets': 2}
+    assert mirror.get('tz1a') is None and mirror.get('tz1b') is None
+    assert mirror.keys() == ['"tz1c"']
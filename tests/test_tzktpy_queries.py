@@ -0,0 +1,128 @@
+import datetime
+
+from tzktpy.bigmap import BigMap, BigMapKey
+from tzktpy.contract import Contract
+from tzktpy.operation import Transaction
+from tzktpy.quote import Quote
+
+
+def bigmap_keys(count):
+    return [{'id': i, 'active': True, 'hash': 'expr%s' % i, 'key': 'tz%s' % i, 'value': str(i)} for i in range(count)]
+
+
+def test_iter_by_bigmap_pages_by_offset(fake_transport):
+    keys = bigmap_keys(25)
+    fake_transport.handler = lambda method, url, params: keys[params['offset']:params['offset'] + params['limit']]
+
+    result = list(BigMapKey.iter_by_bigmap(1, page_size=10, domain='https://api.example.org'))
+
+    assert [item.id for item in result] == list(range(25))
+    assert [params['offset'] for _, _, params in fake_transport.calls] == [0, 10, 20]
+
+
+def test_iter_respects_total_limit(fake_transport):
+    keys = bigmap_keys(25)
+    fake_transport.handler = lambda method, url, params: keys[params['offset']:params['offset'] + params['limit']]
+
+    result = list(BigMapKey.iter_by_bigmap(1, page_size=10, limit=15, domain='https://api.example.org'))
+
+    assert len(result) == 15
+    assert [params['limit'] for _, _, params in fake_transport.calls] == [10, 5]
+
+
+def test_iter_by_bigmap_filters_active_keys(fake_transport):
+    def handler(method, url, params):
+        return bigmap_keys(3)[params['offset']:params['offset'] + params['limit']]
+
+    fake_transport.handler = handler
+
+    result = list(BigMapKey.iter_by_bigmap(1, active=True, page_size=10, domain='https://api.example.org'))
+
+    assert len(result) == 3
+    assert fake_transport.calls[0][2]['active'] is True
+
+
+def test_iter_by_address_follows_last_id(fake_transport):
+    operations = [
+        {'type': 'transaction', 'id': i * 3, 'level': i, 'timestamp': None, 'block': 'B', 'hash': 'o'}
+        for i in range(1, 8)
+    ]
+
+    def handler(method, url, params):
+        last_id = params.get('lastId', 0)
+        return [op for op in operations if op['id'] > last_id][:params['limit']]
+
+    fake_transport.handler = handler
+    result = list(Transaction.iter_by_address('KT1', page_size=3, domain='https://api.example.org'))
+
+    assert [op.level for op in result] == list(range(1, 8))
+    assert [params.get('lastId') for _, _, params in fake_transport.calls] == [None, 9, 18]
+
+
+def test_get_as_frame_selects_and_types_columns(fake_transport):
+    fake_transport.handler = lambda method, url, params: [
+        [1, '2022-03-10T00:00:00Z', {'address': 'tz1a'}, 1500000],
+        [2, '2022-03-11T00:00:00.123Z', {'address': 'tz1a'}, None],
+    ]
+    columns = ['level', 'timestamp', 'sender', 'amount']
+    frame = Transaction.get(as_frame=True, columns=columns, level__gt=0, domain='https://api.example.org')
+
+    assert fake_transport.calls[0][2] == {'level.gt': 0, 'select.values': 'level,timestamp,sender,amount'}
+    assert list(frame.columns) == columns
+    assert frame['level'].dtype == 'int64'
+    assert str(frame['timestamp'].dtype).startswith('datetime64')
+    assert frame['timestamp'][1].microsecond == 123000
+    assert frame['amount'].isna().tolist() == [False, True]
+
+
+def test_get_as_arrow_builds_dictionary_columns(fake_transport):
+    fake_transport.handler = lambda method, url, params: [[10, 200, 'KT1a', 'ledger']]
+    columns = ['ptr', 'lastLevel', 'contract.address', 'path']
+    table = BigMap.get(as_arrow=True, columns=columns, domain='https://api.example.org')
+
+    assert table.num_rows == 1
+    assert str(table.schema.field('contract.address').type).startswith('dictionary')
+
+
+def test_single_column_select_returns_flat_values(fake_transport):
+    fake_transport.handler = lambda method, url, params: [1, 2, 3]
+    frame = Quote.get(as_frame=True, columns=['level'], domain='https://api.example.org')
+    assert frame['level'].tolist() == [1, 2, 3]
+
+
+def test_fields_return_slim_projections(fake_transport):
+    fake_transport.handler = lambda method, url, params: [['KT1a', '2022-03-10T00:00:00Z', {'tez_pool': '10'}]]
+    fields = ['address', 'lastActivityTime', 'storage']
+    contracts = Contract.get(creator='KT1f', fields=fields, domain='https://api.example.org')
+
+    assert fake_transport.calls[0][2]['select.values'] == 'address,lastActivityTime,storage'
+    contract = contracts[0]
+    assert (contract.address, contract.storage) == ('KT1a', {'tez_pool': '10'})
+    assert contract.last_activity_time == datetime.datetime(2022, 3, 10)
+    assert not hasattr(contract, '__dict__')
+    assert type(contract) is Contract.projection(['address', 'lastActivityTime', 'storage'])
+
+
+def test_to_datetime_parses_millisecond_timestamps():
+    assert Quote.to_datetime('2022-03-10T01:02:03Z') == datetime.datetime(2022, 3, 10, 1, 2, 3)
+    assert Quote.to_datetime('2022-03-10T01:02:03.456Z') == datetime.datetime(2022, 3, 10, 1, 2, 3, 456000)
+    assert Quote.to_datetime('not a timestamp') is None
+    column = Quote.to_datetime64(['2022-03-10T01:02:03.456Z', None])
+    assert str(column[0]) == '2022-03-10T01:02:03.456000'
+
+
+def test_by_keys_fetches_chunks_in_parallel(fake_transport):
+    def handler(method, url, params):
+        return [
+            {'id': 1, 'active': key != 'tz1c', 'hash': 'expr', 'key': key, 'value': {'owner': key}}
+            for key in params['key.in'].split(',') if key != 'tz1e'
+        ]
+
+    fake_transport.handler = handler
+    keys = ['tz1a', 'tz1b', 'tz1c', 'tz1d', 'tz1e', 'tz1a']
+    found, missing = BigMapKey.by_keys(7, keys, chunk_size=2, domain='https://api.example.org')
+
+    assert sorted(params['key.in'] for _, _, params in fake_transport.calls) == ['tz1a,tz1b', 'tz1c,tz1d', 'tz1e']
+    assert all(params['limit'] == len(params['key.in'].split(',')) for _, _, params in fake_transport.calls)
+    assert found == {'tz1a': {'owner': 'tz1a'}, 'tz1b': {'owner': 'tz1b'}, 'tz1d': {'owner': 'tz1d'}}
+    assert missing == {'tz1c', 'tz1e'}
@@ -0,0 +1,60 @@
+import config
+import pytest
+from pools import contract_data, datasources, fixtures, known_pools, token_metadata
+from tzktpy import replay, transport
+from tzktpy.quote import Quote
+from tzktpy.standin import StandinServer
+
+
+def test_recorded_responses_replay_on_any_domain(fake_transport, tmp_path):
+    quotes = [{'level': 10, 'timestamp': '2022-03-10T00:00:00Z', 'usd': 3.5}]
+    fake_transport.handler = lambda method, url, params: quotes
+    store = replay.FixtureStore(str(tmp_path / 'quotes.json.gz'))
+    with transport.use_transport(replay.RecordingTransport(fake_transport, store)):
+        Quote.get(level__gt=5, domain='https://api.example.org')
+    store.save()
+
+    with transport.use_transport(replay.ReplayTransport(replay.FixtureStore(store.path))):
+        quotes = Quote.get(level__gt=5, domain='http://127.0.0.1:5080')
+    assert (quotes[0].level, quotes[0].usd) == (10, 3.5)
+    assert len(fake_transport.calls) == 1
+
+
+def test_seeded_fixtures_run_app_queries_offline(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, 'TZKT_MIRROR_DB', str(tmp_path / 'mirror.sqlite3'))
+    monkeypatch.setattr(contract_data, 'PORTFOLIO_MIRRORS', dict())
+    monkeypatch.setattr(config, 'TOKEN_METADATA_DB', str(tmp_path / 'token-metadata.sqlite3'))
+    monkeypatch.setattr(token_metadata, '_RESOLVERS', dict())
+    with fixtures.replaying(fixtures.seed_fixtures()):
+        pools = known_pools.find_pools('hangzhou')
+        contract = config.CONTRACT_ADDRESS['hangzhou']
+        portfolio = contract_data.get_etf_portfolio(fixtures.EXAMPLE_OWNER, contract)
+        decoded = contract_data.get_etf_portfolio(fixtures.EXAMPLE_OWNER, contract, decoded=True)
+        history = datasources.SpicyaDataSource().get_history(['TS', 'QUIPU'])
+
+    assert {pool['token_symbol'] for pool in pools} >= {'FA12', 'QUIPU', 'MGT'}
+    assert portfolio['assets'] == {'TS': '654', 'RCT': '105', 'FA12': '4'}
+    assert decoded.assets == {'TS': 654, 'RCT': 105, 'FA12': 4}
+    assert contract_data.token_address(decoded.tokens['TS']) == 'KT1CaWSNEnU6RR9ZMSSgD5tQtQDqdpw4sG83'
+    assert set(history['token']) == {'KT1CaWSNEnU6RR9ZMSSgD5tQtQDqdpw4sG83:0', 'KT1VowcKqZFGhdcDZA3UN1vrjBLmxV5bxgfJ:0'}
+
+
+def test_standin_serves_fixtures_and_injects_errors():
+    store = fixtures.seed_fixtures()
+    pooled = transport.Transport(retries=0)
+    try:
+        with StandinServer(store) as server, transport.use_transport(pooled):
+            bigmaps = contract_data.bigmap.BigMap.by_contract(config.CONTRACT_ADDRESS['hangzhou'], domain=server.url)
+            assert bigmaps[0].path == 'portfolios'
+
+        with StandinServer(store, error_rate=1.0, seed=1) as server:
+            response = pooled.request('GET', '%s/api/rest//TokenList' % server.url)
+            assert response.status_code == 503
+            assert server.errors == 1
+    finally:
+        pooled.close()
+
+
+def test_queries_sending_no_request_are_not_recorded():
+    with pytest.raises(ValueError):
+        replay.FixtureStore().add_query([], lambda: None)
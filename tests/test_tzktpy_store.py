@@ -0,0 +1,100 @@
+import datetime
+
+import pytest
+
+from tzktpy.quote import Quote
+from tzktpy.store import EntityStore
+
+
+HEAD = {
+    'level': 9, 'cycle': 1, 'hash': 'B', 'protocol': 'P', 'timestamp': None, 'votingEpoch': 0, 'votingPeriod': 0,
+    'knownLevel': 0, 'lastSync': None, 'synced': True, 'quoteLevel': 0, 'quoteBtc': 0, 'quoteEur': 0, 'quoteUsd': 0,
+    'quoteCny': 0, 'quoteJpy': 0, 'quoteKrw': 0, 'quoteEth': 0,
+}
+
+
+def quote(level):
+    return {
+        'level': level, 'timestamp': '2022-05-%02dT00:00:00Z' % level, 'btc': 0.0001 * level, 'eur': 1.0,
+        'usd': 1.0 + level, 'cny': 1.0, 'jpy': 1.0, 'krw': 1.0, 'eth': 1.0, 'gbp': 1.0,
+    }
+
+
+def operation(id):
+    return {
+        'type': 'transaction', 'id': id, 'level': id, 'timestamp': '2022-05-01T00:00:00Z', 'block': 'B',
+        'hash': 'o%s' % id,
+    }
+
+
+def test_store_syncs_after_watermark_and_queries_locally(fake_transport, tmp_path):
+    quotes = [quote(level) for level in range(1, 6)]
+
+    def handler(method, url, params):
+        if url.endswith('/v1/head'):
+            return HEAD
+        assert url.endswith('/v1/quotes') and params['sort.asc'] == 'level'
+        rows = [row for row in quotes if params.get('level.gt', 0) < row['level'] <= params['level.le']]
+        return rows[params['offset']:params['offset'] + params['limit']]
+
+    fake_transport.handler = handler
+    path = str(tmp_path / 'store.sqlite3')
+    store = EntityStore(path, domain='https://api.example.org')
+    assert store.sync('quotes', page_size=2) == 5
+    assert store.watermark('quotes') == 5
+
+    # levels above head - confirmations wait for the next sync
+    quotes.extend([quote(6), quote(7), quote(8)])
+    reopened = EntityStore(path, domain='https://api.example.org')
+    assert reopened.sync('quotes', page_size=2) == 2
+    assert fake_transport.calls[-1][2]['level.gt'] == 5
+
+    requests = len(fake_transport.calls)
+    assert [item.level for item in reopened.get('quotes', level__ge=3, sort__desc='level', limit=2)] == [7, 6]
+    assert [item.level for item in reopened.get('quotes', usd__lt=4.5)] == [1, 2, 3]
+    assert [item.level for item in reopened.get('quotes', level__in='2,4')] == [2, 4]
+    assert reopened.count('quotes', timestamp__ge=datetime.datetime(2022, 5, 6)) == 2
+    assert isinstance(reopened.get('quotes', level=1)[0], Quote)
+    frame = reopened.to_frame('quotes', columns=['level', 'usd'], level__gt=5)
+    assert list(frame['level']) == [6, 7] and list(frame['usd']) == [7.0, 8.0]
+    assert len(fake_transport.calls) == requests
+
+
+def test_store_follows_last_id_cursor_per_account(fake_transport):
+    operations = [operation(id) for id in (10, 20, 30)]
+
+    def handler(method, url, params):
+        if url.endswith('/v1/head'):
+            return HEAD
+        assert url.endswith('/v1/accounts/tz1a/operations') and 'offset' not in params and params['level.le'] == 7
+        return [row for row in operations if row['id'] > params.get('lastId', 0)][:params['limit']]
+
+    fake_transport.handler = handler
+    store = EntityStore(domain='https://api.example.org')
+    assert store.sync('operations', 'tz1a', page_size=2) == 3
+    assert [call[2].get('lastId') for call in fake_transport.calls if 'operations' in call[1]] == [None, 20]
+    operations.append(operation(40))
+    assert store.sync('operations', 'tz1a') == 1
+    assert fake_transport.calls[-1][2]['lastId'] == 30
+    assert [item.id for item in store.get('operations', 'tz1a')] == [10, 20, 30, 40]
+    assert store.get('operations', 'tz1b') == []
+
+
+def test_store_syncs_cycles_up_to_the_head_cycle(fake_transport):
+    cycles = [{'index': index, 'firstLevel': index * 10, 'lastLevel': index * 10 + 9} for index in range(6)]
+
+    def handler(method, url, params):
+        if url.endswith('/v1/head'):
+            return dict(HEAD, cycle=state['cycle'])
+        return cycles[params['offset']:params['offset'] + params['limit']]
+
+    state = {'cycle': 1}
+    fake_transport.handler = handler
+    store = EntityStore(domain='https://api.example.org')
+    assert store.sync('cycles', page_size=4) == 2
+    assert store.watermark('cycles') == 1
+    state['cycle'] = 3
+    assert store.sync('cycles', page_size=4) == 2
+    assert list(store.to_frame('cycles', columns=['index'])['index']) == [0, 1, 2, 3]
+    with pytest.raises(ValueError):
+        store.sync('quotes', level__gt=3)
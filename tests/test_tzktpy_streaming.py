@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+from tzktpy import streaming, transport
+from tzktpy.balance import Balance
+from tzktpy.quote import Quote
+
+ROWS = [
+    {'level': 10, 'timestamp': '2022-05-01T00:00:00Z', 'usd': 3.5, 'note': 'café [,]'},
+    {'level': 12345, 'timestamp': '2022-05-02T00:00:00Z', 'usd': -1e-05, 'note': None},
+    {'level': 12346, 'timestamp': '2022-05-03T00:00:00Z', 'usd': True, 'note': {'nested': [1, 2, {'x': 'y'}]}},
+]
+
+
+class StreamedResponse:
+    """A streamed response delivering its body in small chunks, counting what was read."""
+
+    def __init__(self, content, chunk_size=7, status_code=200):
+        self.body = content
+        self.chunk_size = chunk_size
+        self.status_code = status_code
+        self.read = 0
+        self.closed = False
+
+    def iter_content(self, chunk_size=None):
+        for start in range(0, len(self.body), self.chunk_size):
+            self.read = start + self.chunk_size
+            yield self.body[start:start + self.chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+class StreamingTransport:
+    def __init__(self, payload, raw=None):
+        self.content = raw if raw is not None else json.dumps(payload).encode()
+        self.calls = []
+        self.responses = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((url, kwargs))
+        response = StreamedResponse(self.content)
+        self.responses.append(response)
+        return response
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 1024])
+def test_json_array_items_are_decoded_across_chunk_boundaries(chunk_size):
+    content = json.dumps(ROWS, indent=1).encode()
+    chunks = [content[start:start + chunk_size] for start in range(0, len(content), chunk_size)]
+    assert list(streaming.iter_json_array(chunks)) == ROWS
+    assert list(streaming.iter_json_array([b' [ ] '])) == []
+
+    with pytest.raises(ValueError):
+        list(streaming.iter_json_array([content[:-5]]))
+
+
+def test_streamed_queries_yield_before_the_body_is_read():
+    streamed = StreamingTransport(ROWS * 50)
+    with transport.use_transport(streamed):
+        quotes = Quote.get(level__gt=5, stream=True)
+        first = next(quotes)
+        response = streamed.responses[0]
+        assert response.read < len(response.body) // 10
+        rest = list(quotes)
+
+    assert streamed.calls[0][1]['stream'] is True
+    assert streamed.calls[0][1]['params']['level.gt'] == 5
+    assert (first.level, first.usd) == (10, 3.5)
+    assert len(rest) == len(ROWS) * 50 - 1
+    assert response.closed
+
+
+def test_streamed_projections_and_frames_come_in_batches():
+    rows = [[level, '2022-05-01T00:00:00Z', level / 10] for level in range(25)]
+    streamed = StreamingTransport(rows)
+    with transport.use_transport(streamed):
+        projections = list(Quote.get(fields=['level', 'timestamp', 'usd'], stream=True))
+        frames = list(Quote.get(columns=['level', 'timestamp', 'usd'], as_frame=True, stream=True, batch_size=10))
+
+    assert streamed.calls[0][1]['params']['select.values'] == 'level,timestamp,usd'
+    assert [projection.level for projection in projections] == list(range(25))
+    assert [len(frame) for frame in frames] == [10, 10, 5]
+    assert list(frames[-1]['level']) == [20, 21, 22, 23, 24]
+
+
+def test_streamed_report_matches_buffered_report(fake_transport):
+    report = b'Date,Balance\r\n2022-05-01,10\r\n2022-05-02,12\r\n\r\n'
+    fake_transport.handler = lambda method, url, params: None
+    buffered_response = type('Response', (), {'content': report, 'status_code': 200})()
+    fake_transport.request = lambda method, url, **kwargs: buffered_response
+    buffered = Balance.report('tz1a')
+
+    with transport.use_transport(StreamingTransport(None, raw=report)):
+        streamed = Balance.report('tz1a', stream=True)
+        assert not isinstance(streamed, list)
+        assert list(streamed) == buffered
+    assert buffered[1] == [b'2022-05-01', b'10\r']
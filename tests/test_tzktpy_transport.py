@@ -0,0 +1,232 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+from tzktpy import aio, cache, singleflight, transport
+from tzktpy.bigmap import BigMap, BigMapKey
+from tzktpy.quote import Quote
+
+
+def test_request_goes_through_transport_once(fake_transport):
+    quotes = [{'level': 10, 'timestamp': '2022-03-10T00:00:00Z', 'usd': 3.5}]
+    fake_transport.handler = lambda method, url, params: quotes
+    quotes = Quote.get(level__gt=5, domain='https://api.example.org')
+
+    assert len(fake_transport.calls) == 1
+    assert fake_transport.calls[0] == ('GET', 'https://api.example.org/v1/quotes', {'level.gt': 5})
+    assert quotes[0].level == 10
+
+
+def test_sessions_are_pooled_per_domain():
+    pooled = transport.Transport(pool_maxsize=4)
+    first = pooled.session('https://api.tzkt.io/v1/head')
+    assert pooled.session('https://api.tzkt.io/v1/quotes') is first
+    assert pooled.session('http://api.hangzhou2net.tzkt.io/v1/head') is not first
+    assert first.get_adapter('https://api.tzkt.io')._pool_maxsize == 4
+    pooled.close()
+
+
+class MockAsyncTransport(aio.AsyncTransport):
+    def __init__(self, handler, **kwargs):
+        super().__init__(**kwargs)
+        self.handler = handler
+
+    def create_client(self):
+        return httpx.AsyncClient(transport=httpx.MockTransport(self.handler))
+
+
+def test_async_twin_returns_same_objects(fake_transport):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json=[{'ptr': 7, 'contract': {'address': 'KT1'}, 'path': 'portfolios'}])
+
+    previous = aio.set_async_transport(MockAsyncTransport(handler))
+    try:
+        bigmaps = asyncio.run(BigMap.by_contract_async('KT1', domain='https://api.example.org'))
+    finally:
+        aio.set_async_transport(previous)
+
+    assert fake_transport.calls == []
+    assert str(requests[0].url) == 'https://api.example.org/v1/contracts/KT1/bigmaps'
+    assert isinstance(bigmaps[0], BigMap)
+    assert (bigmaps[0].ptr, bigmaps[0].path) == (7, 'portfolios')
+
+
+def test_by_keys_async_gathers_chunks(fake_transport):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        keys = request.url.params['key.in'].split(',')
+        found = [{'id': 1, 'active': True, 'hash': 'expr', 'key': key, 'value': 1} for key in keys if key != 'tz1c']
+        return httpx.Response(200, json=found)
+
+    previous = aio.set_async_transport(MockAsyncTransport(handler))
+    try:
+        query = BigMapKey.by_keys_async(7, ['tz1a', 'tz1b', 'tz1c'], chunk_size=2, domain='https://api.example.org')
+        found, missing = asyncio.run(query)
+    finally:
+        aio.set_async_transport(previous)
+
+    assert len(requests) == 2 and fake_transport.calls == []
+    assert (found, missing) == ({'tz1a': 1, 'tz1b': 1}, {'tz1c'})
+
+
+def test_call_rejects_queries_sending_several_requests(fake_transport):
+    def handler(request):
+        return httpx.Response(200, json=[])
+
+    previous = aio.set_async_transport(MockAsyncTransport(handler))
+    try:
+        with pytest.raises(RuntimeError):
+            keys = ['tz1a', 'tz1b', 'tz1c']
+            asyncio.run(aio.call(BigMapKey.by_keys, 7, keys, chunk_size=2, domain='https://api.example.org'))
+    finally:
+        aio.set_async_transport(previous)
+    assert fake_transport.calls == []
+
+
+def test_async_transport_retries_retryable_status():
+    statuses = [503, 200]
+
+    def handler(request):
+        return httpx.Response(statuses.pop(0), json=3)
+
+    async_transport = MockAsyncTransport(handler, backoff_factor=0)
+    response = asyncio.run(async_transport.request('GET', 'https://api.example.org/v1/quotes/count'))
+    assert response.status_code == 200
+    assert statuses == []
+
+
+def test_single_flight_coalesces_concurrent_requests():
+    release = threading.Event()
+    calls = []
+
+    class SlowTransport:
+        def request(self, method, url, **kwargs):
+            calls.append(url)
+            release.wait(5)
+            return 'response'
+
+    flight = singleflight.SingleFlight()
+    coalescing = singleflight.SingleFlightTransport(SlowTransport(), flight)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(coalescing.request('GET', 'https://api.example.org/v1/head')))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    while flight.calls < 5:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == ['response'] * 5
+    assert len(calls) == 1
+    assert flight.stats() == {'calls': 5, 'executions': 1, 'coalesced': 4}
+
+
+def test_single_flight_coalesces_async_requests():
+    calls = []
+
+    class SlowAsyncTransport:
+        async def request(self, method, url, **kwargs):
+            calls.append(url)
+            await asyncio.sleep(0.01)
+            return 'response'
+
+    coalescing = singleflight.AsyncSingleFlightTransport(SlowAsyncTransport())
+
+    async def run():
+        requests = [coalescing.request('GET', 'https://api.example.org/v1/head') for _ in range(5)]
+        return await asyncio.gather(*requests)
+
+    assert asyncio.run(run()) == ['response'] * 5
+    assert len(calls) == 1
+    assert coalescing.flight.coalesced == 4
+
+
+def test_single_flight_cancelled_leader_releases_waiters():
+    flight = singleflight.SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(5)
+
+    async def run():
+        leader = asyncio.ensure_future(flight.do_async('key', slow))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do_async('key', slow))
+        await asyncio.sleep(0)
+        leader.cancel()
+        try:
+            await asyncio.wait_for(follower, 2)
+        except asyncio.CancelledError:
+            return 'cancelled'
+
+    assert asyncio.run(run()) == 'cancelled'
+    assert flight._futures == {}
+
+
+def test_single_flight_interrupted_leader_raises_in_waiters():
+    flight = singleflight.SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    errors = []
+
+    def interrupted():
+        started.set()
+        release.wait(5)
+        raise KeyboardInterrupt
+
+    def leader():
+        try:
+            flight.do('key', interrupted)
+        except KeyboardInterrupt:
+            pass
+
+    def follower():
+        try:
+            errors.append(flight.do('key', lambda: 'unexpected'))
+        except KeyboardInterrupt as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=leader)]
+    threads[0].start()
+    started.wait(5)
+    threads.append(threading.Thread(target=follower))
+    threads[1].start()
+    while flight.coalesced < 1:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 1 and isinstance(errors[0], KeyboardInterrupt)
+
+
+def test_repeated_startups_replace_the_wrappers_and_close_through_them(fake_transport):
+    closed = []
+
+    class ClosingAsyncTransport:
+        async def aclose(self):
+            closed.append(True)
+
+    base = ClosingAsyncTransport()
+    previous_async = aio.set_async_transport(base)
+    try:
+        for _ in range(2):
+            flight = singleflight.enable()
+            cache.enable()
+        installed = aio.get_async_transport()
+        assert isinstance(installed, cache.AsyncCachingTransport)
+        assert isinstance(installed.inner, singleflight.AsyncSingleFlightTransport) and installed.inner.flight is flight
+        assert installed.inner.inner is base
+        assert transport.get_transport().inner.inner is fake_transport
+        asyncio.run(installed.aclose())
+    finally:
+        aio.set_async_transport(previous_async)
+    assert closed == [True]
@@ -1,17 +1,28 @@
+from . import aio
 from . import account
 from . import balance
 from . import bigmap
 from . import block
+from . import cache
 from . import commitment
 from . import contract
 from . import cycle
+from . import decoders
 from . import delegate
+from . import events
 from . import head
+from . import mirror
 from . import operation
 from . import protocol
 from . import quote
+from . import replay
 from . import reward
 from . import right
+from . import singleflight
 from . import software
+from . import standin
 from . import statistics
+from . import store
+from . import streaming
+from . import transport
 from . import voting
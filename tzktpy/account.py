@@ -1,4 +1,4 @@
-from .base import Base
+from .base import Base, list_query
 __all__ = ('AccountMetadata', 'AccountBase', 'Account')
 
 
@@ -109,6 +109,11 @@ class AccountBase(Base):
 
 
 class Account(AccountBase):
+    column_types = {
+        'address': 'address', 'type': 'category', 'balance': 'mutez', 'firstActivity': 'int',
+        'firstActivityTime': 'datetime', 'lastActivity': 'int', 'lastActivityTime': 'datetime',
+        'numTransactions': 'int',
+    }
 
     def __init__(self, type, alias, address, public_Key, revealed, balance, counter, delegation_level, delegation_time, num_contracts, num_activations, num_delegations, num_originations, num_transactions, num_reveals, num_migrations, first_activity, first_activity_time, last_activity, last_activity_time, contracts, operations, metadata):
         super(Account, self).__init__(type, alias, address, public_Key, revealed, balance, counter, delegation_level, delegation_time, num_contracts, num_activations, num_delegations, num_originations, num_transactions, num_reveals, num_migrations, first_activity, first_activity_time, last_activity, last_activity_time, contracts, operations, metadata)
@@ -151,6 +156,7 @@ class Account(AccountBase):
         return cls(type, alias, address, public_key, revealed, balance, counter, delegation_level, delegation_time, num_contracts, num_activations, num_delegations, num_originations, num_transactions, num_reveals, num_migrations, first_activity, first_activity_time, last_activity, last_activity_time, contracts, operations, metadata)
 
     @classmethod
+    @list_query
     def get(cls, **kwargs):
         """
         Returns a list of accounts
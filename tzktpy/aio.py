@@ -0,0 +1,133 @@
+"""
+Native asyncio support for tzktpy.
+
+Every public query classmethod of the entity classes (`get`, `count`, `by_*`, ...) has an awaitable twin with an
+`_async` suffix that sends its request through an `AsyncTransport` built on httpx and returns the same objects as
+the blocking version.
+
+Example:
+    >>> bigmaps = await BigMap.by_contract_async('KT1...', domain='https://api.tzkt.io')
+"""
+import asyncio
+import logging
+import threading
+from urllib.parse import urlsplit
+
+import httpx
+
+from . import transport
+__all__ = ('AsyncTransport', 'call', 'get_async_transport', 'set_async_transport')
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncTransport(object):
+    """
+    Sends requests through one keep-alive `httpx.AsyncClient` per domain.
+
+    Parameters:
+        pool_maxsize (int):  Maximum number of connections kept alive per domain.
+        timeout (float):  Timeout in seconds, passed to every request unless overridden.
+        retries (int):  Number of retries on connection errors and retryable status codes.
+        backoff_factor (float):  Exponential backoff factor between retries.
+        status_forcelist (tuple):  Status codes that trigger a retry.
+    """
+    retry_methods = frozenset(['GET', 'HEAD', 'OPTIONS'])
+
+    def __init__(
+        self, pool_maxsize=10, timeout=30, retries=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+    ):
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.status_forcelist = status_forcelist
+        self._clients = dict()
+
+    def __repr__(self):
+        return '<%s %s pool_maxsize=%r, timeout=%r, retries=%r, domains=%r>' % (
+            self.__class__.__name__, id(self), self.pool_maxsize, self.timeout, self.retries, list(self._clients),
+        )
+
+    def create_client(self):
+        limits = httpx.Limits(max_connections=self.pool_maxsize, max_keepalive_connections=self.pool_maxsize)
+        return httpx.AsyncClient(limits=limits, timeout=self.timeout)
+
+    def client(self, url):
+        parts = urlsplit(url)
+        domain = '%s://%s' % (parts.scheme, parts.netloc)
+        client = self._clients.get(domain)
+        if client is None:
+            client = self._clients[domain] = self.create_client()
+        return client
+
+    async def request(self, method, url, **kwargs):
+        client = self.client(url)
+        retries = self.retries if method in self.retry_methods else 0
+        for attempt in range(retries + 1):
+            try:
+                response = await client.request(method, url, **kwargs)
+            except httpx.TransportError:
+                if attempt == retries:
+                    raise
+                logger.warning('attempt %s: %s %s failed', attempt, method, url, exc_info=True)
+            else:
+                if response.status_code not in self.status_forcelist or attempt == retries:
+                    logger.debug('%s %s -> %s', method, response.url, response.status_code)
+                    return response
+            await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+
+    async def aclose(self):
+        clients, self._clients = self._clients, dict()
+        for client in clients.values():
+            await client.aclose()
+
+
+_async_transport = None
+_async_transport_lock = threading.Lock()
+
+
+def get_async_transport():
+    """
+    Returns the transport used by the `_async` queries, creating a default `AsyncTransport` on first use.
+    """
+    global _async_transport
+    if _async_transport is None:
+        with _async_transport_lock:
+            if _async_transport is None:
+                _async_transport = AsyncTransport()
+    return _async_transport
+
+
+def set_async_transport(async_transport):
+    """
+    Replaces the transport used by the `_async` queries and returns the previous one.
+
+    Parameters:
+        async_transport (object):  Any object with an awaitable `request(method, url, **kwargs)` method.
+    """
+    global _async_transport
+    with _async_transport_lock:
+        previous, _async_transport = _async_transport, async_transport
+    return previous
+
+
+async def call(query, *args, **kwargs):
+    """
+    Awaits a blocking tzktpy query classmethod, performing its HTTP request on the async transport.
+
+    The query runs twice without blocking: once to capture the request it would send, and once to parse the
+    response received asynchronously, so parsing stays identical to the blocking version.  Only queries sending a
+    single request are supported, others raise `RuntimeError` (`by_keys` has its own `by_keys_async`).
+
+    Parameters:
+        query (callable):  A tzktpy query classmethod, e.g. `BigMapKey.by_bigmap`.
+
+    Example:
+        >>> keys = await call(BigMapKey.by_bigmap, 123, key='tz1...')
+    """
+    request = transport.capture(query, *args, **kwargs)
+    if request is None:
+        return query(*args, **kwargs)
+    response = await get_async_transport().request(request.method, request.url, **request.kwargs)
+    return transport.respond(query, response, *args, **kwargs)
@@ -1,4 +1,5 @@
-from .base import Base
+from . import streaming
+from .base import Base, list_query
 __all__ = ('BalanceShort', 'Balance')
 
 
@@ -28,6 +29,7 @@ class BalanceShort(object):
 
 class Balance(Base):
     __slots__ = ('balance', 'level', 'quote', 'timestamp')
+    column_types = {'level': 'int', 'timestamp': 'datetime', 'balance': 'mutez'}
 
     def __init__(self, balance, level, quote, timestamp):
         self.balance = balance
@@ -48,6 +50,7 @@ class Balance(Base):
         return cls(balance, level, quote, timestamp)
 
     @classmethod
+    @list_query
     def history(cls, address, **kwargs):
         """
         Fetches balance history of an account from {@link https://tzkt.io/ | tz_KT }.
@@ -81,6 +84,21 @@ class Balance(Base):
         output = [cls.from_api(item) for item in data]
         return output
 
+    @classmethod
+    def iter_history(cls, address, **kwargs):
+        """
+        Lazily iterates over the full balance history of an account, page by page.
+
+        Keyword Parameters:
+            page_size (int):  Number of balances fetched per request.
+            limit (int):  Maximum number of balances to yield in total.
+            **kwargs:  Any other parameter supported by `history`.
+
+        Returns:
+            generator
+        """
+        return cls._paginate(cls.history, (address, ), kwargs)
+
     @classmethod
     def by_level(cls, address, level, **kwargs):
         """
@@ -145,6 +163,7 @@ class Balance(Base):
             to (date|datetime):  End of the time range to filter by.  Supports standard modifiers.
             currency:  Currency to convert amounts to (btc, eur, usd, cny, jpy, krw, eth).
             historical (bool):  Indicates if you want to use historical prices. Defaults to false.
+            stream (bool):  Returns a generator yielding the rows while the report is received, instead of a list.
             domain (str, optional):  The tzkt.io domain to use.  The domains correspond to the different Tezos networks.  Defaults to https://api.tzkt.io.
 
         Returns:
@@ -156,22 +175,29 @@ class Balance(Base):
         """
         delimiter_lookup = dict(comma=b',', semicolon=b';')
         delimiter = kwargs.pop('delimiter', 'comma')
+        stream = kwargs.pop('stream', False)
         if delimiter not in delimiter_lookup:
             raise ValueError('%r is not a valid delimiter' % delimiter)
         params, _ = cls.prepare_modifiers(kwargs, include=('from', 'to'))
         params['delimiter'] = delimiter
 
         path = 'v1/accounts/%s/report' % address
+        delimiter = delimiter_lookup[delimiter]
+        if stream:
+            response = cls._request(path, params=params, stream=True, **kwargs)
+            return cls._report_rows(streaming.iter_lines(streaming.iter_chunks(response)), delimiter)
+
         response = cls._request(path, params=params, **kwargs)
         raw_csv = response.content
-        delimiter = delimiter_lookup[delimiter]
-        output = []
-        for line in raw_csv.split(b'\n'):
+        return list(cls._report_rows(raw_csv.split(b'\n'), delimiter))
+
+    @staticmethod
+    def _report_rows(lines, delimiter):
+        for line in lines:
             cells = line.split(delimiter)
             if not any(cells):
                 break
-            output.append(cells)
-        return output
+            yield cells
 
 
 if __name__ == '__main__':
@@ -1,7 +1,128 @@
-import requests
+import contextvars
+import threading
+import functools
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from collections import defaultdict
 
+from . import streaming, transport
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=65536)
+def _parse_timestamp(text, formats):
+    # TzKT timestamps are UTC ISO-8601 with a Z suffix, with or without milliseconds.  fromisoformat is an order of
+    # magnitude faster than strptime, which is only kept as a fallback for anything else.
+    try:
+        return datetime.fromisoformat(text[:-1] if text.endswith('Z') else text)
+    except ValueError:
+        pass
+    for format in formats:
+        try:
+            return datetime.strptime(text, format)
+        except ValueError:
+            pass
+    return None
+
+
+def _async_twin(name):
+    def query_async(cls, *args, **kwargs):
+        from . import aio
+        return aio.call(getattr(cls, name), *args, **kwargs)
+    query_async.__name__ = '%s_async' % name
+    query_async.__doc__ = 'Awaitable twin of `%s`, sent through `tzktpy.aio`.  Accepts the same arguments.' % name
+    return query_async
+
+
+def list_query(query):
+    """
+    Adds field projection, the columnar result modes and streaming to a list query classmethod.
+
+    With `fields=[...]` the query only requests those fields through TzKT's `select.values` projection and returns
+    slim `Projection` objects holding just them.  With `as_frame=True` (pandas DataFrame) or `as_arrow=True`
+    (pyarrow Table) the projected rows are decoded straight into typed columns, without building one object per row;
+    the columns default to the keys of the class' `column_types`.
+
+    With `stream=True` the response body is parsed while it is received and a generator is returned instead: of
+    objects (built with `from_api`), of projections with `fields`, or of DataFrames/Tables of at most `batch_size`
+    rows with `as_frame`/`as_arrow`.
+    """
+    @functools.wraps(query)
+    def wrapper(cls, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        as_frame = kwargs.pop('as_frame', False)
+        as_arrow = kwargs.pop('as_arrow', False)
+        stream = kwargs.pop('stream', False)
+        batch_size = kwargs.pop('batch_size', 1000)
+        if not (fields or as_frame or as_arrow or stream):
+            return query(cls, *args, **kwargs)
+
+        bound_query = functools.partial(query, cls)
+        if as_frame or as_arrow:
+            columns = kwargs.pop('columns', None) or fields or list(cls.column_types)
+            if not columns:
+                raise ValueError('%s has no default columns, the columns parameter is required' % cls.__name__)
+            if stream:
+                values = cls._select_values(bound_query, args, kwargs, columns, stream=True)
+                batches = streaming.batched(values, batch_size)
+                return (cls._to_table(rows, columns, as_arrow) for rows in batches)
+            return cls._to_table(cls._select_values(bound_query, args, kwargs, columns), columns, as_arrow)
+
+        if fields:
+            projection = cls.projection(fields)
+            rows = cls._select_values(bound_query, args, kwargs, projection.fields, stream=stream)
+            if stream:
+                return (projection.from_values(row) for row in rows)
+            return [projection.from_values(row) for row in rows]
+
+        return (cls.from_api(item) for item in cls._stream_items(bound_query, args, kwargs))
+    return wrapper
+
+
+class Projection(object):
+    """
+    Base of the slim classes built by `Base.projection`, holding only the selected fields as slots.
+
+    Selected fields are exposed under snake_case attribute names, e.g. `lastActivityTime` as `last_activity_time`
+    and `sender.address` as `sender_address`.
+    """
+    __slots__ = ()
+    fields = ()
+    datetime_slots = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    def __repr__(self):
+        values = ', '.join('%s=%r' % (name, getattr(self, name)) for name in self.__slots__)
+        return '<%s %s %s>' % (self.__class__.__name__, id(self), values)
+
+    @classmethod
+    def from_values(cls, values):
+        output = cls(*values)
+        for name in cls.datetime_slots:
+            value = getattr(output, name)
+            if value:
+                setattr(output, name, Base.to_datetime(value))
+        return output
+
+
+def _attribute_name(field):
+    name = field.replace('.', '_')
+    return re.sub(r'(?<=[a-z0-9])([A-Z])', r'_\1', name).lower()
+
+
+@functools.lru_cache(maxsize=None)
+def _projection(entity, fields):
+    slots = tuple(_attribute_name(field) for field in fields)
+    datetime_slots = tuple(slot for slot, field in zip(slots, fields) if entity.column_types.get(field) == 'datetime')
+    namespace = dict(__slots__=slots, fields=fields, datetime_slots=datetime_slots)
+    return type('%sProjection' % entity.__name__, (Projection, ), namespace)
+
 
 class Base(object):
     domain = 'https://api.tzkt.io'
@@ -15,6 +136,19 @@ class Base(object):
     offset_suffixes = ('el', 'pg', 'cr')
     sort_suffixes = ('asc', 'desc')
     pagination_parameters = ('sort', 'offset', 'limit')
+    page_size = 1000
+    column_types = dict()
+    sync_only = ('from_api', )
+
+    def __init_subclass__(cls, **kwargs):
+        super(Base, cls).__init_subclass__(**kwargs)
+        for name, attribute in list(vars(cls).items()):
+            is_query = (
+                isinstance(attribute, classmethod) and not name.startswith(('_', 'iter_')) and name not in cls.sync_only
+            )
+            twin_name = '%s_async' % name
+            if is_query and not name.endswith('_async') and twin_name not in vars(cls):
+                setattr(cls, twin_name, classmethod(_async_twin(name)))
 
     @classmethod
     def tez(cls, mutez):
@@ -91,7 +225,7 @@ class Base(object):
 
     @classmethod
     def validate_request_parameters(cls, parameters):
-        valid_parameters = set(['domain', 'method', 'params', 'json', 'data'])
+        valid_parameters = set(['domain', 'method', 'params', 'json', 'data', 'stream'])
         included_parameters = set(parameters)
         invalid_parameters = included_parameters - valid_parameters
         if invalid_parameters:
@@ -104,23 +238,199 @@ class Base(object):
         domain = kwargs.pop('domain')
         method = kwargs.pop('method')
         url = '%s/%s' % (domain, path)
-        # print(f'method={method};url={url};args={kwargs}')
-        res_url = requests.get(url, **kwargs)
-        print(res_url.url)
-        response = requests.request(method, url, **kwargs)
-        return response
+        logger.debug('method=%s;url=%s;args=%r', method, url, kwargs)
+        return transport.get_transport().request(method, url, **kwargs)
 
     @classmethod
-    def to_datetime(cls, text):
-        formats = [cls.to_datetime, cls.datetime_format]
-        for format in formats:
+    def _paginate(cls, query, args, kwargs, cursor=None):
+        """
+        Lazily yields the items of every page returned by `query`, fetching the next page in the background
+        while the current one is consumed.
+
+        Parameters:
+            query (callable):  A list query classmethod accepting `limit` and `offset` (or the `cursor` parameter).
+            args (tuple):  Positional arguments of the query.
+            kwargs (dict):  Keyword arguments of the query.  `page_size` sets the number of items per request,
+                `limit` caps the total number of items and `offset` (or `cursor`) sets the starting position.
+            cursor (str, optional):  Name of a parameter taking the `id` of the last received item (e.g. `lastId`),
+                used instead of offset pagination.
+        """
+        page_size = kwargs.pop('page_size', cls.page_size)
+        remaining = kwargs.pop('limit', None)
+        position = kwargs.pop(cursor or 'offset', None)
+        if cursor is None:
+            position = position or 0
+
+        def fetch(position, size):
+            if abandoned.is_set():
+                return []
+            page_kwargs = dict(kwargs, limit=size)
+            if position is not None:
+                page_kwargs[cursor or 'offset'] = position
+            return query(*args, **page_kwargs)
+
+        def submit(position):
+            size = page_size if remaining is None else min(page_size, remaining)
+            return size, executor.submit(contextvars.copy_context().run, fetch, position, size)
+
+        abandoned = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            size, future = submit(position)
+            while future is not None:
+                page = future.result()
+                future = None
+                if remaining is not None:
+                    remaining -= len(page)
+                if page and len(page) == size and (remaining is None or remaining > 0):
+                    position = page[-1].id if cursor else position + len(page)
+                    size, future = submit(position)
+                for item in page:
+                    yield item
+        finally:
+            # an abandoned iteration drops the prefetched page instead of letting it run in the background
+            abandoned.set()
+            if future is not None:
+                future.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @classmethod
+    def iter_get(cls, **kwargs):
+        """
+        Lazily iterates over every item matching the criteria of `get`, page by page.
+
+        Keyword Parameters:
+            page_size (int):  Number of items fetched per request.  Defaults to `page_size` of the class.
+            limit (int):  Maximum number of items to yield in total.
+            offset (int):  Number of items to skip before the first page.
+            **kwargs:  Any other parameter supported by `get`.
+
+        Returns:
+            generator
+
+        Example:
+            >>> for quote in Quote.iter_get(level__gt=150000, page_size=10000):
+            ...     pass
+        """
+        return cls._paginate(cls.get, (), kwargs)
+
+    @classmethod
+    def projection(cls, fields):
+        """
+        Returns the slim `Projection` class holding the given fields of this entity.  Classes are built once per
+        field list.
+
+        Parameters:
+            fields (list|tuple):  TzKT field names, nested fields separated with dots (`sender.address`).
+        """
+        return _projection(cls, tuple(fields))
+
+    @classmethod
+    def _send(cls, query, args, kwargs, params=None, stream=False):
+        request = transport.capture(query, *args, **kwargs)
+        if request is None:
+            raise ValueError('%s sent no request' % query.__name__)
+        request_kwargs = dict(request.kwargs)
+        if params:
+            request_kwargs['params'] = dict(request_kwargs.get('params') or {}, **params)
+        if stream:
+            request_kwargs['stream'] = True
+        return transport.get_transport().request(request.method, request.url, **request_kwargs)
+
+    @classmethod
+    def _stream_items(cls, query, args, kwargs, params=None):
+        response = cls._send(query, args, kwargs, params, stream=True)
+        if response.status_code == 204:
+            return
+        for item in streaming.iter_json_array(streaming.iter_chunks(response)):
+            yield item
+
+    @classmethod
+    def _select_values(cls, query, args, kwargs, columns, stream=False):
+        params = {'select.values': ','.join(columns)}
+        if stream:
+            rows = cls._stream_items(query, args, kwargs, params)
+        else:
+            response = cls._send(query, args, kwargs, params)
+            rows = [] if response.status_code == 204 else response.json()
+        if len(columns) == 1:
+            return ([value] for value in rows) if stream else [[value] for value in rows]
+        return rows
+
+    @classmethod
+    def _to_table(cls, rows, columns, as_arrow=False):
+        frame = cls.to_frame(rows, columns)
+        if as_arrow:
+            import pyarrow
+            return pyarrow.Table.from_pandas(frame, preserve_index=False)
+        return frame
+
+    @classmethod
+    def to_frame(cls, rows, columns):
+        """
+        Decodes rows of values into a DataFrame, typing every column after `column_types`.
+
+        Column types:
+            int, mutez:  int64 (nullable Int64 when values are missing)
+            float:  float64
+            datetime:  datetime64
+            address, category:  categorical
+            bool:  bool (object when values are missing)
+            anything else:  object
+        """
+        import pandas as pd
+
+        values = list(zip(*rows)) if rows else [()] * len(columns)
+        data = {
+            column: cls.decode_column(values[index], cls.column_types.get(column))
+            for index, column in enumerate(columns)
+        }
+        return pd.DataFrame(data, columns=columns)
+
+    @classmethod
+    def decode_column(cls, values, kind):
+        import numpy as np
+        import pandas as pd
+
+        if kind in ('int', 'mutez'):
             try:
-                value = datetime.strptime(text, cls.datetime_format)
-            except Exception:
-                pass
-            else:
-                return value
-        return None
+                return np.array(values, dtype=np.int64)
+            except (TypeError, ValueError):
+                return pd.array(values, dtype='Int64')
+        if kind == 'float':
+            return np.array(values, dtype=np.float64)
+        if kind == 'datetime':
+            return cls.to_datetime64(values)
+        if kind in ('address', 'category'):
+            return pd.Categorical(values)
+        if kind == 'bool' and None not in values:
+            return np.array(values, dtype=bool)
+        output = np.empty(len(values), dtype=object)
+        output[:] = values
+        return output
+
+    @classmethod
+    def to_datetime(cls, text):
+        """
+        Parses a TzKT timestamp (`datetime_format` or `datetime_ms_format`) into a naive UTC datetime.  Results are
+        memoized, as the operations of a block all share its timestamp.
+
+        Returns:
+            datetime:  None if the text is empty or not a timestamp.
+        """
+        if not text:
+            return None
+        return _parse_timestamp(text, (cls.datetime_format, cls.datetime_ms_format))
+
+    @classmethod
+    def to_datetime64(cls, values):
+        """
+        Parses a sequence of TzKT timestamps at once into a `datetime64[us]` numpy array, missing values becoming NaT.
+        """
+        import numpy as np
+
+        values = [value[:-1] if value and value.endswith('Z') else value for value in values]
+        return np.array(values, dtype='datetime64[us]')
 
     @classmethod
     def from_api(cls, data):
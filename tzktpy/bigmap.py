@@ -1,13 +1,22 @@
 """
 
 """
-from .base import Base
+import asyncio
+import contextvars
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from .base import Base, list_query
 from .exception import TZKTException
 __all__ = ('BigMap', 'BigMapType', 'BigMapKey', 'BigMapUpdate')
 
 
 class BigMap(Base):
     __slots__ = ('ptr', 'contract', 'path', 'tags', 'active', 'first_level', 'last_level', 'total_keys', 'active_keys', 'updates', 'key_type', 'value_type')
+    column_types = {
+        'ptr': 'int', 'contract.address': 'address', 'path': 'category', 'active': 'bool', 'firstLevel': 'int',
+        'lastLevel': 'int', 'totalKeys': 'int', 'activeKeys': 'int', 'updates': 'int',
+    }
 
     def __init__(self, ptr, contract, path, tags, active, first_level, last_level, total_keys, active_keys, updates, key_type, value_type):
         self.ptr = ptr
@@ -47,6 +56,7 @@ class BigMap(Base):
         return cls(ptr, contract, path, tags, active, first_level, last_level, total_keys, active_keys, updates, key_type, value_type)
 
     @classmethod
+    @list_query
     def get(cls, **kwargs):
         """
         Fetches BigMaps based on the specified criteria.
@@ -112,6 +122,7 @@ class BigMap(Base):
         return cls.from_api(data)
 
     @classmethod
+    @list_query
     def by_contract(cls, address, **kwargs):
         """
         Returns all active bigmaps allocated in the given contract storage.
@@ -149,6 +160,21 @@ class BigMap(Base):
                 raise TZKTException(errors)
         return [cls.from_api(item) for item in data]
 
+    @classmethod
+    def iter_by_contract(cls, address, **kwargs):
+        """
+        Lazily iterates over all active bigmaps allocated in the given contract storage, page by page.
+
+        Keyword Parameters:
+            page_size (int):  Number of bigmaps fetched per request.
+            limit (int):  Maximum number of bigmaps to yield in total.
+            **kwargs:  Any other parameter supported by `by_contract`.
+
+        Returns:
+            generator
+        """
+        return cls._paginate(cls.by_contract, (address, ), kwargs)
+
     @classmethod
     def by_name(cls, address, name, **kwargs):
         """
@@ -222,6 +248,10 @@ class BigMapType(Base):
 
 class BigMapUpdate(Base):
     __slots__ = ('id', 'level', 'timestamp', 'bigmap', 'contract', 'path', 'action', 'content')
+    column_types = {
+        'id': 'int', 'level': 'int', 'timestamp': 'datetime', 'bigmap': 'int', 'contract.address': 'address',
+        'path': 'category', 'action': 'category', 'content': 'object',
+    }
 
     def __init__(self, id, level, timestamp, bigmap, contract, path, action, content):
         self.id = id
@@ -255,6 +285,7 @@ class BigMapUpdate(Base):
         return cls(id, level, timestamp, bigmap, contract, path, action, content)
 
     @classmethod
+    @list_query
     def get(cls, **kwargs):
         """
         Returns a list of all bigmap key updates.
@@ -293,6 +324,11 @@ class BigMapUpdate(Base):
 
 class BigMapKey(Base):
     __slots__ = ('id', 'active', 'hash', 'key', 'value', 'first_level', 'last_level', 'updates')
+    key_chunk_size = 100
+    column_types = {
+        'id': 'int', 'active': 'bool', 'hash': 'str', 'key': 'object', 'value': 'object', 'firstLevel': 'int',
+        'lastLevel': 'int', 'updates': 'int',
+    }
 
     def __init__(self, id, active, hash, key, value, first_level, last_level, updates):
         self.id = id
@@ -320,6 +356,7 @@ class BigMapKey(Base):
         return cls(id, active, hash, key, value, first_level, last_level, updates)
 
     @classmethod
+    @list_query
     def by_bigmap(cls, id, **kwargs):
         """
         Returns a list of bigmap keys by BigMap id.
@@ -352,7 +389,7 @@ class BigMapKey(Base):
             path = 'v1/bigmaps/%s/historical_keys/%s' % (id, level)
         else:
             path = 'v1/bigmaps/%s/keys' % id
-        optional_base_params = ['key', 'value', 'lastLevel', 'level'] + list(cls.pagination_parameters)
+        optional_base_params = ['active', 'key', 'value', 'lastLevel', 'level'] + list(cls.pagination_parameters)
         params, _ = cls.prepare_modifiers(kwargs, include=optional_base_params)
         response = cls._request(path, params=params, **kwargs)
 
@@ -363,6 +400,28 @@ class BigMapKey(Base):
         data = response.json()
         return [cls.from_api(item) for item in data]
 
+    @classmethod
+    def iter_by_bigmap(cls, id, **kwargs):
+        """
+        Lazily iterates over all keys of a bigmap, page by page, so large bigmaps can be scanned in bounded memory.
+
+        Parameters:
+            id (int):  Bigmap Id.
+
+        Keyword Parameters:
+            page_size (int):  Number of keys fetched per request.
+            limit (int):  Maximum number of keys to yield in total.
+            **kwargs:  Any other parameter supported by `by_bigmap`.
+
+        Returns:
+            generator
+
+        Example:
+            >>> for bigmap_key in BigMapKey.iter_by_bigmap(123, active=True, page_size=10000):
+            ...     pass
+        """
+        return cls._paginate(cls.by_bigmap, (id, ), kwargs)
+
     @classmethod
     def by_key(cls, id, key, **kwargs):
         """
@@ -402,6 +461,100 @@ class BigMapKey(Base):
         data = response.json()
         return cls.from_api(data)
 
+    @classmethod
+    def by_keys(cls, id, keys, **kwargs):
+        """
+        Fetches many keys of a bigmap at once, with `key.in` queries of `chunk_size` keys sent in parallel.
+
+        Parameters:
+            id (int):  Bigmap Id.
+            keys (list|tuple|set):  Plain key values, e.g. addresses.  Complex keys are given as dicts or lists.
+
+        Keyword Parameters:
+            chunk_size (int):  Number of keys per request.  Defaults to `key_chunk_size`.
+            max_workers (int):  Maximum number of requests in flight.
+            level (int):  The level at which to fetch the bigmap keys.
+            micheline (int): Format of the bigmap key and value type: 0 - JSON, 2 - Micheline.
+            domain (str, optional):  The tzkt.io domain to use.  The domains correspond to the different Tezos
+                networks.  Defaults to https://api.tzkt.io.
+
+        Returns:
+            tuple:  A dict of key to value of the active keys found, and the set of the missing keys.  Complex keys
+                are represented by their JSON encoding in both.
+
+        Example:
+            >>> portfolios, missing = BigMapKey.by_keys(5420, ['tz1...', 'tz1...'])
+        """
+        chunk_size = kwargs.pop('chunk_size', cls.key_chunk_size)
+        max_workers = kwargs.pop('max_workers', 4)
+        wanted, chunks = cls._key_chunks(keys, chunk_size)
+
+        def fetch(chunk):
+            return cls.by_bigmap(id, **cls._key_chunk_parameters(chunk, kwargs))
+
+        if len(chunks) <= 1:
+            pages = [fetch(chunk) for chunk in chunks]
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+                futures = [executor.submit(contextvars.copy_context().run, fetch, chunk) for chunk in chunks]
+                pages = [future.result() for future in futures]
+        return cls._collect_keys(wanted, pages)
+
+    @classmethod
+    async def by_keys_async(cls, id, keys, **kwargs):
+        """
+        Awaitable twin of `by_keys`, sending the chunks concurrently through `tzktpy.aio`.  Accepts the same
+        arguments.
+        """
+        chunk_size = kwargs.pop('chunk_size', cls.key_chunk_size)
+        max_workers = kwargs.pop('max_workers', 4)
+        wanted, chunks = cls._key_chunks(keys, chunk_size)
+        semaphore = asyncio.Semaphore(max_workers)
+
+        async def fetch(chunk):
+            async with semaphore:
+                return await cls.by_bigmap_async(id, **cls._key_chunk_parameters(chunk, kwargs))
+
+        pages = await asyncio.gather(*[fetch(chunk) for chunk in chunks])
+        return cls._collect_keys(wanted, pages)
+
+    @staticmethod
+    def encode_key(key):
+        """
+        Returns the string identifying a key in the results of `by_keys`: the key itself for plain keys, its JSON
+        encoding for complex ones.  Numeric keys are returned as strings by TzKT and are matched as such.
+        """
+        if isinstance(key, (dict, list, tuple)):
+            return json.dumps(key, sort_keys=True, separators=(',', ':'))
+        return str(key)
+
+    @classmethod
+    def _key_chunks(cls, keys, chunk_size):
+        wanted = dict()
+        for key in keys:
+            wanted.setdefault(cls.encode_key(key), key)
+        values = list(wanted.values())
+        return wanted, [values[index:index + chunk_size] for index in range(0, len(values), chunk_size)]
+
+    @classmethod
+    def _key_chunk_parameters(cls, chunk, kwargs):
+        is_plain = all(not isinstance(key, (dict, list, tuple)) and ',' not in str(key) for key in chunk)
+        key_filter = ','.join(str(key) for key in chunk) if is_plain else json.dumps(list(chunk), separators=(',', ':'))
+        return dict(kwargs, key__in=key_filter, limit=len(chunk))
+
+    @classmethod
+    def _collect_keys(cls, wanted, pages):
+        found = dict()
+        for page in pages:
+            for bigmap_key in page:
+                if bigmap_key.active is False:
+                    continue
+                encoded = cls.encode_key(bigmap_key.key)
+                if encoded in wanted:
+                    found[encoded] = bigmap_key.value
+        missing = set(wanted) - set(found)
+        return found, missing
+
 
 if __name__ == '__main__':
     import argparse
@@ -1,9 +1,13 @@
-from .base import Base
+from .base import Base, list_query
 __all__ = ('Block', )
 
 
 class Block(Base):
     __slots__ = ('level', 'hash', 'timestamp', 'proto', 'priority', 'validations', 'deposit', 'reward', 'fees', 'nonce_revealed', 'baker', 'software', 'endorsements', 'proposals', 'ballots', 'activations', 'doubleBaking', 'doubleEndorsing', 'nonceRevelations', 'delegations', 'originations', 'transactions', 'reveals', 'quote')
+    column_types = {
+        'level': 'int', 'hash': 'str', 'timestamp': 'datetime', 'proto': 'int', 'baker.address': 'address',
+        'deposit': 'mutez', 'reward': 'mutez', 'fees': 'mutez',
+    }
 
     def __init__(self, level, hash, timestamp, proto, priority, validations, deposit, reward, fees, nonce_revealed, baker, software, endorsements, proposals, ballots, activations, doubleBaking, doubleEndorsing, nonceRevelations, delegations, originations, transactions, reveals, quote):
         self.level = level
@@ -69,6 +73,7 @@ class Block(Base):
         return cls(level, hash, timestamp, proto, priority, validations, deposit, reward, fees, nonceRevealed, baker, software, endorsements, proposals, ballots, activations, doubleBaking, doubleEndorsing, nonceRevelations, delegations, originations, transactions, reveals, quote)
 
     @classmethod
+    @list_query
     def get(cls, **kwargs):
         """
         Returns a list of blocks.
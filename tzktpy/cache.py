@@ -0,0 +1,322 @@
+"""
+Level-aware response cache for tzktpy.
+
+Responses are keyed by method, url and query parameters and kept in an in-memory LRU tier, plus an optional on-disk
+tier.  Queries pinned to a level that is already a few blocks deep ("historical" queries such as
+`BigMapKey.by_bigmap(ptr, level=...)` or `Quote.get(level__le=...)`) never change and are kept forever.  Every other
+query reads "latest state" and is dropped as soon as `Head.get` (or an event subscriber) reports a new level for its
+domain.
+
+Example:
+    >>> from tzktpy import cache
+    >>> response_cache = cache.enable(directory='.tzkt-cache')
+"""
+import gzip
+import hashlib
+import json
+import os
+import pickle
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+from . import aio, transport
+__all__ = (
+    'CachedResponse', 'MemoryTier', 'DiskTier', 'ResponseCache', 'CachingTransport', 'AsyncCachingTransport', 'enable',
+)
+
+HISTORICAL = 'historical'
+
+
+class CachedResponse(object):
+    """
+    A `requests.Response`-like snapshot of a cached response.
+    """
+    __slots__ = ('status_code', 'content', 'url')
+
+    def __init__(self, status_code, content, url):
+        self.status_code = status_code
+        self.content = content
+        self.url = url
+
+    def __repr__(self):
+        return '<%s %s status_code=%r, url=%r>' % (self.__class__.__name__, id(self), self.status_code, self.url)
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    def json(self):
+        return json.loads(self.content)
+
+    @classmethod
+    def from_response(cls, response):
+        return cls(response.status_code, response.content, str(response.url))
+
+
+class MemoryTier(object):
+    """
+    Thread-safe LRU mapping holding at most `max_entries` entries.
+    """
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DiskTier(object):
+    """
+    Stores entries as gzipped pickles in a directory, one file per key.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, '%s.pkl.gz' % digest)
+
+    def get(self, key):
+        try:
+            with gzip.open(self.path(key), 'rb') as cache_file:
+                return pickle.load(cache_file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def set(self, key, entry):
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(file_descriptor, 'wb') as raw_file, gzip.GzipFile(fileobj=raw_file, mode='wb') as cache_file:
+            pickle.dump(entry, cache_file)
+        os.replace(temp_path, self.path(key))
+
+
+class ResponseCache(object):
+    """
+    Two-tier response cache with head-driven invalidation of latest-state entries.
+
+    Parameters:
+        max_entries (int):  Capacity of the in-memory LRU tier.
+        directory (str, optional):  Directory of the on-disk tier.  Historical responses are persisted there.
+        confirmations (int):  Number of blocks a level has to be below the head to be considered immutable.
+        latest_ttl (float, optional):  Maximum age in seconds of a latest-state entry, used as a safety net when
+            no new head is observed.
+    """
+    level_suffixes = {'level': 0, 'level.eq': 0, 'level.le': 0, 'level.lt': -1}
+    level_paths = (
+        re.compile(r'/v1/bigmaps/\d+/historical_keys/(\d+)'),
+        re.compile(r'/v1/blocks/(\d+)$'),
+        re.compile(r'/v1/accounts/[^/]+/balance_history/(\d+)$'),
+    )
+    head_path = re.compile(r'/v1/head$')
+    key = staticmethod(transport.request_key)
+
+    def __init__(self, max_entries=1024, directory=None, confirmations=2, latest_ttl=60):
+        self.memory = MemoryTier(max_entries)
+        self.disk = DiskTier(directory) if directory else None
+        self.confirmations = confirmations
+        self.latest_ttl = latest_ttl
+        self.hits = 0
+        self.misses = 0
+        self._heads = dict()
+
+    def __repr__(self):
+        return '<%s %s entries=%r, hits=%r, misses=%r, heads=%r>' % (
+            self.__class__.__name__, id(self), len(self.memory), self.hits, self.misses, self._heads,
+        )
+
+    @staticmethod
+    def domain_of(url):
+        parts = urlsplit(url)
+        return '%s://%s' % (parts.scheme, parts.netloc)
+
+    def head_level(self, domain):
+        return self._heads.get(domain)
+
+    def observe_head(self, domain, level):
+        """
+        Records the head level of a domain.  Latest-state entries cached at an older level become stale.
+        """
+        current = self._heads.get(domain)
+        if current is None or level > current:
+            self._heads[domain] = level
+
+    def is_head(self, url):
+        return self.head_path.search(urlsplit(url).path) is not None
+
+    def pinned_level(self, url, params=None):
+        """
+        Returns the level a query is pinned to (the highest level it can read), or None for latest-state queries.
+        """
+        path = urlsplit(url).path
+        for pattern in self.level_paths:
+            match = pattern.search(path)
+            if match:
+                return int(match.group(1))
+        for name, shift in self.level_suffixes.items():
+            value = (params or {}).get(name)
+            if isinstance(value, int) or (isinstance(value, str) and value.isdigit()):
+                return int(value) + shift
+        return None
+
+    def is_historical(self, url, params=None):
+        head_level = self.head_level(self.domain_of(url))
+        level = self.pinned_level(url, params)
+        return head_level is not None and level is not None and level <= head_level - self.confirmations
+
+    def get(self, method, url, params=None):
+        key = self.key(method, url, params)
+        entry = self.memory.get(key)
+        if entry is None and self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                self.memory.set(key, entry)
+
+        if entry is not None:
+            response, level, stored_at = entry
+            is_fresh = level == HISTORICAL or (
+                level is not None
+                and level == self.head_level(self.domain_of(url))
+                and (self.latest_ttl is None or time.time() - stored_at < self.latest_ttl)
+            )
+            if is_fresh:
+                self.hits += 1
+                return response
+            self.memory.discard(key)
+
+        self.misses += 1
+        return None
+
+    def put(self, method, url, params, response):
+        key = self.key(method, url, params)
+        cached = CachedResponse.from_response(response)
+        if self.is_historical(url, params):
+            entry = (cached, HISTORICAL, time.time())
+            if self.disk is not None:
+                self.disk.set(key, entry)
+        else:
+            head_level = self.head_level(self.domain_of(url))
+            # without a known head, nothing would ever invalidate a latest-state entry
+            if head_level is None:
+                return cached
+            entry = (cached, head_level, time.time())
+        self.memory.set(key, entry)
+        return cached
+
+    def observe_response(self, url, response):
+        if response.status_code == 200:
+            self.observe_head(self.domain_of(url), response.json()['level'])
+
+    def clear(self):
+        self.memory.clear()
+        self._heads.clear()
+
+
+class CachingTransport(object):
+    """
+    Wraps a transport, answering GET requests from a `ResponseCache` when possible.
+    """
+    cacheable_statuses = (200, 204)
+
+    def __init__(self, inner, cache):
+        self.inner = inner
+        self.cache = cache
+
+    def request(self, method, url, **kwargs):
+        if method != 'GET':
+            return self.inner.request(method, url, **kwargs)
+
+        if self.cache.is_head(url):
+            response = self.inner.request(method, url, **kwargs)
+            self.cache.observe_response(url, response)
+            return response
+
+        params = kwargs.get('params')
+        cached = self.cache.get(method, url, params)
+        if cached is not None:
+            return cached
+
+        response = self.inner.request(method, url, **kwargs)
+        # a streamed body is consumed by the caller, storing it would buffer it whole
+        if response.status_code in self.cacheable_statuses and not kwargs.get('stream'):
+            return self.cache.put(method, url, params, response)
+        return response
+
+    def close(self):
+        self.inner.close()
+
+
+class AsyncCachingTransport(CachingTransport):
+    """
+    Wraps an async transport, answering GET requests from a `ResponseCache` when possible.
+    """
+    async def request(self, method, url, **kwargs):
+        if method != 'GET':
+            return await self.inner.request(method, url, **kwargs)
+
+        if self.cache.is_head(url):
+            response = await self.inner.request(method, url, **kwargs)
+            self.cache.observe_response(url, response)
+            return response
+
+        params = kwargs.get('params')
+        cached = self.cache.get(method, url, params)
+        if cached is not None:
+            return cached
+
+        response = await self.inner.request(method, url, **kwargs)
+        if response.status_code in self.cacheable_statuses:
+            return self.cache.put(method, url, params, response)
+        return response
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+def enable(**kwargs):
+    """
+    Installs a `ResponseCache` in front of both the blocking and the async transports.  Calling it again replaces
+    the installed cache instead of stacking another one.
+
+    Keyword Parameters:
+        max_entries (int):  Capacity of the in-memory LRU tier.
+        directory (str, optional):  Directory of the on-disk tier.
+        confirmations (int):  Number of blocks a level has to be below the head to be considered immutable.
+        latest_ttl (float, optional):  Maximum age in seconds of a latest-state entry.
+
+    Returns:
+        ResponseCache
+    """
+    response_cache = ResponseCache(**kwargs)
+    inner = transport.unwrap(transport.get_transport(), CachingTransport)
+    async_inner = transport.unwrap(aio.get_async_transport(), AsyncCachingTransport)
+    transport.set_transport(CachingTransport(inner, response_cache))
+    aio.set_async_transport(AsyncCachingTransport(async_inner, response_cache))
+    return response_cache
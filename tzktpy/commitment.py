@@ -1,4 +1,4 @@
-from .base import Base
+from .base import Base, list_query
 __all__ = ('Commitment', )
 
 
@@ -30,6 +30,7 @@ class Commitment(Base):
         return cls(address, balance, activated, activation_level, activation_time, activated_account)
 
     @classmethod
+    @list_query
     def get(cls, **kwargs):
         """
         Returns a list of commitments.
@@ -1,4 +1,4 @@
-from .base import Base
+from .base import Base, list_query
 from . import account
 __all__ = ('EntryPoint', 'Contract')
 
@@ -59,9 +59,14 @@ class EntryPoint(Base):
 
 
 class Contract(account.AccountBase):
+    column_types = {
+        'address': 'address', 'kind': 'category', 'alias': 'str', 'balance': 'mutez', 'creator.address': 'address',
+        'firstActivity': 'int', 'firstActivityTime': 'datetime', 'lastActivity': 'int', 'lastActivityTime': 'datetime',
+        'numTransactions': 'int', 'tzips': 'object',
+    }
+
     @classmethod
     def from_api(cls, data):
-        print(data)
         type = data.get('type')
         alias = data.get('alias')
         address = data.get('address')
@@ -132,6 +137,7 @@ class Contract(account.AccountBase):
         return int(data)
 
     @classmethod
+    @list_query
     def get(cls, **kwargs):
         """
         Returns a list of contract accounts.
@@ -141,6 +147,8 @@ class Contract(account.AccountBase):
             creator (str):  Filters contracts by creator.  Supports standard modifiers.
             manager (str):  Filters contracts by manager.  Supports standard modifiers.
             delegate (str):  Filters contracts by delegate.  Supports standard modifiers.
+            firstActivity (int):  Filters contracts by first activity level (where the contract was originated).
+                Supports standard modifiers.
             lastActivity (date|datetime):  Filters contracts by last activity level (where the contract was updated)  Supports standard modifiers.
             typeHash (int):  Filters contracts by 32-bit hash of contract parameter and storage types (helpful for searching similar contracts).  Supports standard modifiers.
             codeHash (int):  Filters contracts by 32-bit hash of contract code (helpful for searching same contracts).  Supports standard modifiers.
@@ -156,7 +164,10 @@ class Contract(account.AccountBase):
             >>> smart_contracts = Contract.get(kind='smart_contract')
         """
         path = 'v1/contracts'
-        optional_base_params = ['kind', 'creator', 'manager', 'delegate', 'lastActivity', 'typeHash', 'codeHash','includeStorage'] + list(cls.pagination_parameters)
+        optional_base_params = [
+            'kind', 'creator', 'manager', 'delegate', 'firstActivity', 'lastActivity', 'typeHash', 'codeHash',
+            'includeStorage',
+        ] + list(cls.pagination_parameters)
         params, _ = cls.prepare_modifiers(kwargs, include=optional_base_params)
 
         response = cls._request(path, params=params, **kwargs)
@@ -165,6 +176,7 @@ class Contract(account.AccountBase):
         return [cls.from_api(item) for item in data]
 
     @classmethod
+    @list_query
     def by_account(cls, address, **kwargs):
         """
         Returns a list of contracts created by (or related to) the specified account.
@@ -188,6 +200,21 @@ class Contract(account.AccountBase):
         data = response.json()
         return [cls.from_api(item) for item in data]
 
+    @classmethod
+    def iter_by_account(cls, address, **kwargs):
+        """
+        Lazily iterates over all contracts created by (or related to) the specified account, page by page.
+
+        Keyword Parameters:
+            page_size (int):  Number of contracts fetched per request.
+            limit (int):  Maximum number of contracts to yield in total.
+            **kwargs:  Any other parameter supported by `by_account`.
+
+        Returns:
+            generator
+        """
+        return cls._paginate(cls.by_account, (address, ), kwargs)
+
     @classmethod
     def by_address(cls, address, **kwargs):
         """
@@ -209,6 +236,7 @@ class Contract(account.AccountBase):
         return Contract.from_api(data)
 
     @classmethod
+    @list_query
     def similar(cls, address, **kwargs):
         path = 'v1/contracts/%s/similar' % address
         params = cls.get_pagination_parameters(kwargs)
@@ -216,6 +244,21 @@ class Contract(account.AccountBase):
         data = response.json()
         return [cls.from_api(item) for item in data]
 
+    @classmethod
+    def iter_similar(cls, address, **kwargs):
+        """
+        Lazily iterates over all contracts similar to the specified contract, page by page.
+
+        Keyword Parameters:
+            page_size (int):  Number of contracts fetched per request.
+            limit (int):  Maximum number of contracts to yield in total.
+            **kwargs:  Any other parameter supported by `similar`.
+
+        Returns:
+            generator
+        """
+        return cls._paginate(cls.similar, (address, ), kwargs)
+
     @classmethod
     def code(cls, address, format, **kwargs):
         path = 'v1/contracts/%s/code' % address
@@ -1,9 +1,14 @@
-from .base import Base
+from .base import Base, list_query
 __all__ = ('Cycle', )
 
 
 class Cycle(Base):
     __slots__ = ('index', 'first_level', 'start_time', 'last_level', 'end_time', 'snapshot_index', 'snapshot_level', 'random_seed', 'total_bakers', 'total_rolls', 'total_staking', 'total_delegators', 'total_delegated', 'quote')
+    column_types = {
+        'index': 'int', 'firstLevel': 'int', 'startTime': 'datetime', 'lastLevel': 'int', 'endTime': 'datetime',
+        'snapshotIndex': 'int', 'snapshotLevel': 'int', 'totalBakers': 'int', 'totalRolls': 'int',
+        'totalStaking': 'mutez', 'totalDelegators': 'int', 'totalDelegated': 'mutez',
+    }
 
     def __init__(self, index, first_level, start_time, last_level, end_time, snapshot_index, snapshot_level, random_seed, total_bakers, total_rolls, total_staking, total_delegators, total_delegated, quote):
         self.index = index
@@ -48,6 +53,7 @@ class Cycle(Base):
         return cls(index, first_level, start_time, last_level, end_time, snapshot_index, snapshot_level, random_seed, total_bakers, total_rolls, total_staking, total_delegators, total_delegated, quote)
 
     @classmethod
+    @list_query
     def get(cls, **kwargs):
         """
         Returns a list of cycles.
@@ -0,0 +1,261 @@
+"""
+Compiled decoders of bigmap keys and values.
+
+TzKT returns bigmap keys and values as JSON where numbers are strings, records are dicts named after the field
+annotations and `or` values are single-key dicts.  A decoder is compiled once from the Micheline type of a bigmap
+(`BigMapType.get`) into a tree of closures, so decoding a value does not inspect its type again: numbers become ints,
+timestamps datetimes, records namedtuples, `or` values `Variant`s, maps dicts and lists lists.
+
+Example:
+    >>> decoder = bigmap_decoder(5420, domain='https://api.tzkt.io')
+    >>> portfolio = decoder.value(BigMapKey.by_key(5420, 'tz1...').value)
+    >>> portfolio.tokens['TS']
+    Variant(kind='fa12', value='KT1...')
+"""
+import collections
+import datetime
+import functools
+import json
+
+import numpy as np
+
+from .base import Base, _attribute_name
+from .bigmap import BigMapType
+__all__ = ('Variant', 'BigMapDecoder', 'compile_type', 'bigmap_decoder')
+
+Variant = collections.namedtuple('Variant', ('kind', 'value'))
+
+INT_PRIMS = ('int', 'nat', 'mutez')
+STRING_PRIMS = (
+    'string', 'address', 'key_hash', 'key', 'signature', 'chain_id', 'contract', 'bytes', 'bls12_381_fr',
+    'bls12_381_g1', 'bls12_381_g2', 'chest', 'chest_key', 'never', 'tx_rollup_l2_address',
+)
+MAP_PRIMS = ('map', 'big_map')
+LIST_PRIMS = ('list', 'set')
+
+
+def _annotation(micheline):
+    for annot in micheline.get('annots') or ():
+        if annot.startswith('%'):
+            return annot[1:]
+    return None
+
+
+def _flatten(micheline, prim):
+    """
+    Yields the fields of nested unannotated pairs (or ors), which TzKT merges into one object.
+    """
+    for arg in micheline.get('args') or ():
+        if arg.get('prim') == prim and _annotation(arg) is None:
+            for field in _flatten(arg, prim):
+                yield field
+        else:
+            yield arg
+
+
+def _field_names(fields):
+    names = [_annotation(field) or field['prim'] for field in fields]
+    counts = collections.Counter(names)
+    seen = collections.Counter()
+    output = []
+    for name in names:
+        if counts[name] > 1:
+            output.append('%s_%s' % (name, seen[name]))
+            seen[name] += 1
+        else:
+            output.append(name)
+    return output
+
+
+def _to_int(value):
+    return int(value)
+
+
+def _to_bool(value):
+    return value if isinstance(value, bool) else value in ('true', 'True', 1)
+
+
+def _to_timestamp(value):
+    # timestamps are ISO strings, or seconds since the epoch in older values
+    if isinstance(value, (int, float)):
+        return datetime.datetime.fromtimestamp(int(value), tz=datetime.timezone.utc).replace(tzinfo=None)
+    return Base.to_datetime(value)
+
+
+def _identity(value):
+    return value
+
+
+def _unit(value):
+    return None
+
+
+def _compile(micheline):
+    prim = micheline.get('prim')
+    args = micheline.get('args') or []
+
+    if prim in INT_PRIMS:
+        return _to_int
+    if prim in STRING_PRIMS:
+        return str
+    if prim == 'bool':
+        return _to_bool
+    if prim == 'timestamp':
+        return _to_timestamp
+    if prim == 'unit':
+        return _unit
+
+    if prim == 'option':
+        decode_some = _compile(args[0])
+
+        def decode_option(value):
+            return None if value is None else decode_some(value)
+        return decode_option
+
+    if prim in LIST_PRIMS:
+        decode_item = _compile(args[0])
+
+        def decode_list(value):
+            return [decode_item(item) for item in value]
+        return decode_list
+
+    if prim in MAP_PRIMS:
+        decode_key, decode_value = _compile(args[0]), _compile(args[1])
+
+        def decode_map(value):
+            # bigmaps nested in values are their ptr
+            if isinstance(value, int):
+                return value
+            # maps with simple keys are objects, the others arrays of key/value objects
+            if isinstance(value, dict):
+                return {decode_key(key): decode_value(item) for key, item in value.items()}
+            return {decode_key(item['key']): decode_value(item['value']) for item in value}
+        return decode_map
+
+    if prim == 'pair':
+        fields = list(_flatten(micheline, 'pair'))
+        names = _field_names(fields)
+        decoders = tuple(_compile(field) for field in fields)
+        record = collections.namedtuple('Record', [_attribute_name(name) for name in names], rename=True)
+        pairs = tuple(zip(names, decoders))
+
+        def decode_pair(value):
+            if isinstance(value, dict):
+                return record(*[decode(value.get(name)) for name, decode in pairs])
+            return record(*[decode(item) for (name, decode), item in zip(pairs, value)])
+        decode_pair.record = record
+        decode_pair.fields = tuple(zip(record._fields, fields))
+        return decode_pair
+
+    if prim == 'or':
+        fields = list(_flatten(micheline, 'or'))
+        decoders = dict(zip(_field_names(fields), (_compile(field) for field in fields)))
+
+        def decode_or(value):
+            (kind, item), = value.items()
+            return Variant(kind, decoders[kind](item))
+        return decode_or
+
+    # lambdas, operations, tickets...: the JSON as is
+    return _identity
+
+
+@functools.lru_cache(maxsize=1024)
+def _compile_cached(type_json):
+    return _compile(json.loads(type_json))
+
+
+def compile_type(micheline):
+    """
+    Returns the decoder of JSON values of a Micheline type.  Decoders are compiled once per type.
+
+    Parameters:
+        micheline (dict):  Micheline type with annotations, e.g. an argument of `BigMapType.args`.
+
+    Returns:
+        function
+    """
+    return _compile_cached(json.dumps(micheline, sort_keys=True))
+
+
+class BigMapDecoder(object):
+    """
+    Decoders of the keys and values of a bigmap.
+
+    Parameters:
+        ptr (int):  Bigmap Id.
+        key_type (dict):  Micheline type of the keys.
+        value_type (dict):  Micheline type of the values.
+    """
+    __slots__ = ('ptr', 'key_type', 'value_type', 'key', 'value')
+
+    def __init__(self, ptr, key_type, value_type):
+        self.ptr = ptr
+        self.key_type = key_type
+        self.value_type = value_type
+        self.key = compile_type(key_type)
+        self.value = compile_type(value_type)
+
+    def __repr__(self):
+        return '<%s %s ptr=%r, key=%r, value=%r>' % (
+            self.__class__.__name__, id(self), self.ptr, self.key_type.get('prim'), self.value_type.get('prim'),
+        )
+
+    @classmethod
+    def from_type(cls, ptr, bigmap_type):
+        key_type, value_type = bigmap_type.args
+        return cls(ptr, key_type, value_type)
+
+    def decode(self, bigmap_key):
+        """
+        Returns the decoded (key, value) of a `BigMapKey`.
+        """
+        return self.key(bigmap_key.key), self.value(bigmap_key.value)
+
+    def records(self, values):
+        """
+        Decodes values of a record type into a NumPy record array, one column per field.  Numbers that do not fit int64
+        stay Python ints in object columns.
+
+        Parameters:
+            values (list):  JSON values, e.g. the `value` of many `BigMapKey`.
+
+        Returns:
+            numpy.recarray
+        """
+        fields = getattr(self.value, 'fields', None)
+        if fields is None:
+            raise ValueError('bigmap %s values are not records' % self.ptr)
+        rows = [self.value(value) for value in values]
+        columns = []
+        for index, (name, micheline) in enumerate(fields):
+            column = [row[index] for row in rows]
+            prim = micheline.get('prim')
+            if prim in INT_PRIMS:
+                try:
+                    array = np.array(column, dtype=np.int64)
+                except OverflowError:
+                    array = np.array(column, dtype=object)
+            elif prim == 'bool':
+                array = np.array(column, dtype=bool)
+            elif prim == 'timestamp':
+                array = np.array(column, dtype='datetime64[s]')
+            else:
+                array = np.array(column, dtype=object)
+            columns.append(array)
+        return np.rec.fromarrays(columns, names=[name for name, _ in fields])
+
+
+@functools.lru_cache(maxsize=256)
+def bigmap_decoder(ptr, domain=Base.domain):
+    """
+    Returns the decoder of a bigmap, reading its type from TzKT once per ptr and domain.
+
+    Parameters:
+        ptr (int):  Bigmap Id.
+        domain (str, optional):  The tzkt.io domain to use.
+
+    Returns:
+        BigMapDecoder
+    """
+    return BigMapDecoder.from_type(ptr, BigMapType.get(ptr, domain=domain))
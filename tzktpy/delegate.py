@@ -1,4 +1,4 @@
-from .base import Base
+from .base import Base, list_query
 from . import account
 
 __all__ = ('ShortSoftware', 'Delegate')
@@ -90,6 +90,7 @@ class Delegate(account.AccountBase):
         return cls(type, alias, address, publicKey, revealed, balance, frozen_deposits, frozen_rewards, frozen_fees, counter, delegate, delegationLevel, delegationTime, staking_balance, numContracts, num_delegators, num_blocks, num_endorsements, num_ballots, num_proposals, numActivations, num_double_baking, num_double_endorsing, num_nonce_revelations, num_relevation_penalties, numDelegations, numOriginations, numTransactions, numReveals, numMigrations, firstActivity, firstActivityTime, lastActivity, lastActivityTime, contracts, operations, metadata, software)
 
     @classmethod
+    @list_query
     def get(cls, **kwargs):
         """
         Returns a list of delegate accounts.
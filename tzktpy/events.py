@@ -0,0 +1,351 @@
+"""
+Real-time TzKT events.
+
+`EventSubscriber` keeps a SignalR connection to the `/v1/events` hub of a TzKT domain, subscribed to new heads,
+bigmap updates of given ptrs and operations of given addresses.  Every message is fanned out as an `Event` to the
+registered callbacks (on the connection thread) and asyncio queues (on their event loop), restricted to the data of
+their subscription.  Dropped connections are re-established with exponential backoff and every subscription is sent
+again, as TzKT forgets them on disconnect.
+
+Example:
+    >>> subscriber = EventSubscriber('https://api.tzkt.io')
+    >>> subscriber.subscribe_head(lambda event: print(event.state))
+    >>> updates = subscriber.queue(subscriber.subscribe_bigmaps(5420))
+    >>> subscriber.start()
+    >>> event = await updates.get()
+"""
+import asyncio
+import logging
+import threading
+
+from .base import Base
+__all__ = ('Event', 'Subscription', 'EventSubscriber', 'signalr_connection')
+
+logger = logging.getLogger(__name__)
+
+STATE = 0
+DATA = 1
+REORG = 2
+
+
+class Event(object):
+    """
+    A message of the events hub.
+
+    Attributes:
+        channel (str):  `head`, `bigmaps` or `operations`.
+        type (int):  0 (state: the subscription is synced up to `state`), 1 (data) or 2 (reorg: data above `state`
+            was rolled back).
+        state (int):  Level the message is consistent with.
+        data (object):  The head, or the list of bigmap updates or operations, matching the subscription.
+    """
+    __slots__ = ('channel', 'type', 'state', 'data')
+
+    def __init__(self, channel, type, state, data):
+        self.channel = channel
+        self.type = type
+        self.state = state
+        self.data = data
+
+    def __repr__(self):
+        return '<%s %s channel=%r, type=%r, state=%r>' % (
+            self.__class__.__name__, id(self), self.channel, self.type, self.state,
+        )
+
+    @classmethod
+    def from_message(cls, channel, message):
+        return cls(channel, message.get('type'), message.get('state'), message.get('data'))
+
+
+class Subscription(object):
+    """
+    A hub subscription with the callbacks receiving its events.
+
+    Parameters:
+        channel (str):  Name of the hub messages, e.g. `bigmaps`.
+        method (str):  Hub method subscribing to them, e.g. `SubscribeToBigMaps`.
+        arguments (dict, optional):  Argument of the hub method, e.g. `{'ptr': 5420}`.
+    """
+    def __init__(self, channel, method, arguments=None):
+        self.channel = channel
+        self.method = method
+        self.arguments = arguments
+        self.callbacks = list()
+
+    def __repr__(self):
+        return '<%s %s channel=%r, arguments=%r>' % (self.__class__.__name__, id(self), self.channel, self.arguments)
+
+    def matches(self, item):
+        if not self.arguments:
+            return True
+        if self.channel == 'bigmaps':
+            return item.get('bigmap') == self.arguments.get('ptr')
+        if self.channel == 'operations':
+            address = self.arguments.get('address')
+            return address is None or address in _addresses(item)
+        return True
+
+    def select(self, event):
+        """
+        Returns the event restricted to the data of this subscription, or None if none of it matches.
+        """
+        if event.type != DATA or not isinstance(event.data, list):
+            return event
+        data = [item for item in event.data if self.matches(item)]
+        if not data:
+            return None
+        return Event(event.channel, event.type, event.state, data)
+
+
+def _select_any(subscriptions, event):
+    """
+    Returns the event restricted to the data of any of the subscriptions, or None if none of it matches.
+    """
+    if event.type != DATA or not isinstance(event.data, list):
+        return event
+    data = [item for item in event.data if any(subscription.matches(item) for subscription in subscriptions)]
+    if not data:
+        return None
+    return Event(event.channel, event.type, event.state, data)
+
+
+def _put_dropping_oldest(queue, event):
+    """
+    Puts an event on a queue, dropping the oldest pending event first if the queue is full.
+    """
+    if queue.full():
+        dropped = queue.get_nowait()
+        logger.warning('queue full, dropping %r', dropped)
+    queue.put_nowait(event)
+
+
+def _addresses(operation):
+    output = set()
+    for value in operation.values():
+        if isinstance(value, dict) and 'address' in value:
+            output.add(value['address'])
+    return output
+
+
+def signalr_connection(url):
+    """
+    Builds a `signalrcore` hub connection, the default connection factory of `EventSubscriber`.
+    """
+    from signalrcore.hub_connection_builder import HubConnectionBuilder
+    return HubConnectionBuilder().with_url(url).build()
+
+
+class EventSubscriber(object):
+    """
+    Subscribes to the events hub of a TzKT domain and fans out its messages.
+
+    Parameters:
+        domain (str):  The tzkt.io domain to use.
+        connection_factory (callable):  Returns a new hub connection for a url.  Connections need the
+            `on_open`, `on_close`, `on`, `send`, `start` and `stop` methods of `signalrcore` connections.
+        min_backoff (float):  Seconds before the first reconnection attempt.
+        max_backoff (float):  Maximum seconds between reconnection attempts.
+
+    Attributes:
+        connections (int):  Number of connections opened.
+    """
+    channels = ('head', 'bigmaps', 'operations')
+    path = 'v1/events'
+
+    def __init__(self, domain=Base.domain, connection_factory=signalr_connection, min_backoff=1.0, max_backoff=60.0):
+        self.domain = domain
+        self.connection_factory = connection_factory
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.subscriptions = list()
+        self.connections = 0
+        self._queues = list()
+        self._connection = None
+        self._closed = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<%s %s domain=%r, subscriptions=%r, connections=%r>' % (
+            self.__class__.__name__, id(self), self.domain, len(self.subscriptions), self.connections,
+        )
+
+    @property
+    def url(self):
+        return '%s/%s' % (self.domain, self.path)
+
+    def subscribe(self, channel, method, arguments=None, callback=None):
+        subscription = Subscription(channel, method, arguments)
+        if callback is not None:
+            subscription.callbacks.append(callback)
+        with self._lock:
+            self.subscriptions.append(subscription)
+            connection = self._connection
+        if connection is not None:
+            self._send(connection, subscription)
+        return subscription
+
+    def subscribe_head(self, callback=None):
+        """
+        Subscribes to new blocks.  The `data` of the events is the new head.
+        """
+        return self.subscribe('head', 'SubscribeToHead', None, callback)
+
+    def subscribe_bigmaps(self, ptr, callback=None):
+        """
+        Subscribes to the updates of a bigmap.  The `data` of the events is a list of bigmap updates.
+
+        Parameters:
+            ptr (int):  Bigmap Id.
+        """
+        return self.subscribe('bigmaps', 'SubscribeToBigMaps', dict(ptr=ptr), callback)
+
+    def subscribe_operations(self, address, types=None, callback=None):
+        """
+        Subscribes to the operations of an account.  The `data` of the events is a list of operations.
+
+        Parameters:
+            address (str):  Account address.
+            types (list|tuple, optional):  Operation types, e.g. `('transaction', 'origination')`.
+        """
+        arguments = dict(address=address)
+        if types:
+            arguments['types'] = ','.join(types)
+        return self.subscribe('operations', 'SubscribeToOperations', arguments, callback)
+
+    def queue(self, source, loop=None, maxsize=0):
+        """
+        Returns an `asyncio.Queue` fed on the given (or running) event loop.
+
+        Parameters:
+            source (Subscription|str):  A subscription, whose events the queue receives like its callbacks, or a
+                channel name, whose queue receives the data of any subscription of the channel.
+            loop (asyncio.AbstractEventLoop, optional):  The loop of the queue.  Defaults to the running loop.
+            maxsize (int):  Maximum number of pending events, 0 for no limit.  The oldest pending event is dropped
+                to make room for a new one.
+        """
+        loop = loop or asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize)
+        with self._lock:
+            self._queues.append((source, loop, queue))
+        return queue
+
+    def feed_cache(self, response_cache):
+        """
+        Reports every new head to a `tzktpy.cache.ResponseCache`, so latest-state entries are dropped without
+        polling `Head.get`.
+        """
+        return self.subscribe_head(lambda event: event.state and response_cache.observe_head(self.domain, event.state))
+
+    def dispatch(self, channel, message):
+        event = Event.from_message(channel, message)
+        with self._lock:
+            subscriptions = [subscription for subscription in self.subscriptions if subscription.channel == channel]
+            queues = [
+                (source, loop, queue) for source, loop, queue in self._queues
+                if source in subscriptions or source == channel
+            ]
+        selections = dict()
+        for subscription in subscriptions:
+            selected = selections[subscription] = subscription.select(event)
+            if selected is None:
+                continue
+            for callback in subscription.callbacks:
+                try:
+                    callback(selected)
+                except Exception:
+                    logger.exception('%s callback failed', channel)
+
+        channel_event = _select_any(subscriptions, event)
+        for source, loop, queue in queues:
+            selected = channel_event if source == channel else selections[source]
+            if selected is not None and not loop.is_closed():
+                loop.call_soon_threadsafe(_put_dropping_oldest, queue, selected)
+
+    def _send(self, connection, subscription):
+        arguments = [subscription.arguments] if subscription.arguments else []
+        connection.send(subscription.method, arguments)
+
+    def _on_open(self, connection):
+        with self._lock:
+            subscriptions = list(self.subscriptions)
+        logger.info('connected to %s, subscribing %s', self.url, len(subscriptions))
+        for subscription in subscriptions:
+            self._send(connection, subscription)
+
+    def _connect(self):
+        connection = self.connection_factory(self.url)
+        self._closed.clear()
+        connection.on_open(lambda *args: self._on_open(connection))
+        connection.on_close(lambda *args: self._closed.set())
+        for channel in self.channels:
+            connection.on(channel, lambda arguments, channel=channel: self.dispatch(channel, arguments[0]))
+        with self._lock:
+            self._connection = connection
+            self.connections += 1
+        if connection.start() is False:
+            raise ConnectionError('%s refused the connection' % self.url)
+        return connection
+
+    def _run(self):
+        backoff = self.min_backoff
+        while not self._stopped.is_set():
+            try:
+                self._connect()
+            except Exception:
+                logger.warning('connecting to %s failed', self.url, exc_info=True)
+            else:
+                backoff = self.min_backoff
+                self._closed.wait()
+            with self._lock:
+                self._connection = None
+            if self._stopped.wait(backoff):
+                break
+            backoff = min(backoff * 2, self.max_backoff)
+            logger.info('reconnecting to %s', self.url)
+
+    def start(self):
+        """
+        Connects in a background thread, reconnecting until `stop` is called.
+        """
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='tzktpy-events', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        with self._lock:
+            connection = self._connection
+        if connection is not None:
+            connection.stop()
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Print TzKT events.')
+    parser.add_argument('--domain', default=Base.domain)
+    parser.add_argument('--bigmap', type=int, action='append', default=[], help='bigmap ptr to follow')
+    parser.add_argument('--address', action='append', default=[], help='account address to follow')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    subscriber = EventSubscriber(args.domain)
+    subscriber.subscribe_head(lambda event: print('head', event.state))
+    for ptr in args.bigmap:
+        subscriber.subscribe_bigmaps(ptr, lambda event: print('bigmaps', event.state, event.data))
+    for address in args.address:
+        subscriber.subscribe_operations(address, callback=lambda event: print('operations', event.state, event.data))
+    subscriber.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        subscriber.stop()
@@ -0,0 +1,255 @@
+"""
+Incremental local mirror of a bigmap.
+
+A `BigMapMirror` bootstraps once from the keys of a bigmap at the current head level and then only applies the
+`BigMapUpdate` deltas produced since its last synced level.  Every key version is kept in an indexed SQLite table, so
+key lookups, at the synced level or at any level since the bootstrap, are answered locally.
+
+Example:
+    >>> mirror = BigMapMirror(5420, domain='https://api.tzkt.io', path='bigmaps.sqlite3')
+    >>> mirror.sync()
+    >>> portfolio = mirror.get('tz1...')
+    >>> portfolio_then = mirror.get('tz1...', level=2100000)
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from .base import Base
+from .bigmap import BigMapKey, BigMapUpdate
+from .head import Head
+__all__ = ('BigMapMirror', )
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bigmap_updates (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    domain TEXT NOT NULL,
+    ptr INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    level INTEGER NOT NULL,
+    action TEXT NOT NULL,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS bigmap_updates_key ON bigmap_updates (domain, ptr, key, level);
+CREATE TABLE IF NOT EXISTS bigmap_mirrors (
+    domain TEXT NOT NULL,
+    ptr INTEGER NOT NULL,
+    bootstrap_level INTEGER NOT NULL,
+    synced_level INTEGER NOT NULL,
+    PRIMARY KEY (domain, ptr)
+);
+"""
+INSERT_UPDATES = 'INSERT INTO bigmap_updates (domain, ptr, key, level, action, value) VALUES (?, ?, ?, ?, ?, ?)'
+
+
+class BigMapMirror(object):
+    """
+    Mirrors the keys of one bigmap into SQLite.
+
+    Parameters:
+        ptr (int):  Bigmap Id.
+        domain (str, optional):  The tzkt.io domain to use.
+        path (str):  SQLite database file, shared by the mirrors of several bigmaps.  Defaults to an in-memory one.
+        min_sync_interval (float):  Minimum seconds between two syncs made by `refresh`.
+        confirmations (int):  Number of blocks to stay below the head, so that synced levels are not reorganized.
+
+    Attributes:
+        bootstrap_level (int):  Level the keys were first fetched at.  Older levels are read from TzKT.
+        synced_level (int):  Level the mirror is consistent with.
+    """
+    removed_actions = ('remove_key', 'remove')
+
+    def __init__(self, ptr, domain=Base.domain, path=':memory:', min_sync_interval=10.0, confirmations=0):
+        self.ptr = ptr
+        self.domain = domain
+        self.path = path
+        self.min_sync_interval = min_sync_interval
+        self.confirmations = confirmations
+        self.bootstrap_level = None
+        self.synced_level = None
+        self.synced_at = None
+        # syncs are serialized by their own lock, the connection lock is only held while reading or writing rows
+        self._sync_lock = threading.RLock()
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._migrate()
+        self._connection.executescript(SCHEMA)
+        row = self._connection.execute(
+            'SELECT bootstrap_level, synced_level FROM bigmap_mirrors WHERE domain = ? AND ptr = ?', (domain, ptr),
+        ).fetchone()
+        if row:
+            self.bootstrap_level, self.synced_level = row
+
+    def __repr__(self):
+        return '<%s %s ptr=%r, domain=%r, bootstrap_level=%r, synced_level=%r>' % (
+            self.__class__.__name__, id(self), self.ptr, self.domain, self.bootstrap_level, self.synced_level,
+        )
+
+    def _migrate(self):
+        # mirrors made before rows were keyed by domain can't tell networks apart, they are bootstrapped again
+        columns = [row[1] for row in self._connection.execute('PRAGMA table_info(bigmap_mirrors)')]
+        if columns and 'domain' not in columns:
+            with self._connection:
+                self._connection.execute('DROP TABLE bigmap_mirrors')
+                self._connection.execute('DROP TABLE IF EXISTS bigmap_updates')
+
+    @staticmethod
+    def encode_key(key):
+        return json.dumps(key, sort_keys=True)
+
+    def target_level(self):
+        return Head.get(domain=self.domain).level - self.confirmations
+
+    def bootstrap(self, level=None):
+        """
+        Replaces the mirrored keys with the active keys of the bigmap at the given (default: head) level.
+        """
+        with self._sync_lock:
+            level = level if level is not None else self.target_level()
+            rows = [
+                (self.domain, self.ptr, self.encode_key(key.key), level, 'bootstrap', json.dumps(key.value))
+                for key in BigMapKey.iter_by_bigmap(self.ptr, level=level, domain=self.domain)
+                if key.active is not False
+            ]
+            with self._lock, self._connection:
+                self._connection.execute(
+                    'DELETE FROM bigmap_updates WHERE domain = ? AND ptr = ?', (self.domain, self.ptr),
+                )
+                self._connection.executemany(INSERT_UPDATES, rows)
+                self._connection.execute(
+                    'INSERT OR REPLACE INTO bigmap_mirrors (domain, ptr, bootstrap_level, synced_level) '
+                    'VALUES (?, ?, ?, ?)', (self.domain, self.ptr, level, level),
+                )
+                self.bootstrap_level = self.synced_level = level
+                self.synced_at = time.time()
+        logger.info('bootstrapped bigmap %s at level %s with %s keys', self.ptr, level, len(rows))
+        return len(rows)
+
+    def sync(self, level=None):
+        """
+        Applies the updates made since the synced level, up to the given (default: head) level.  Bootstraps first if
+        needed.
+
+        Returns:
+            int:  Number of applied updates.
+        """
+        with self._sync_lock:
+            if self.synced_level is None:
+                return self.bootstrap(level)
+
+            level = level if level is not None else self.target_level()
+            if level <= self.synced_level:
+                self.synced_at = time.time()
+                return 0
+
+            # readers keep being answered at the previous synced level while the updates are fetched
+            rows = list()
+            values = dict()
+            stored_keys = None
+            updates = BigMapUpdate.iter_get(
+                bigmap=self.ptr, level__gt=self.synced_level, level__le=level, domain=self.domain,
+            )
+            for update in updates:
+                content = update.content or {}
+                if update.action in self.removed_actions and 'key' not in content:
+                    # the whole bigmap is removed: the stored keys and the keys added earlier in this batch
+                    if stored_keys is None:
+                        stored_keys = self.keys()
+                    present = [key for key in stored_keys if key not in values]
+                    present.extend(key for key, value in values.items() if value is not None)
+                    for key in present:
+                        rows.append((self.domain, self.ptr, key, update.level, update.action, None))
+                        values[key] = None
+                elif 'key' in content:
+                    key = self.encode_key(content['key'])
+                    value = None if update.action in self.removed_actions else json.dumps(content.get('value'))
+                    rows.append((self.domain, self.ptr, key, update.level, update.action, value))
+                    values[key] = value
+
+            with self._lock, self._connection:
+                self._connection.executemany(INSERT_UPDATES, rows)
+                self._connection.execute(
+                    'UPDATE bigmap_mirrors SET synced_level = ? WHERE domain = ? AND ptr = ?',
+                    (level, self.domain, self.ptr),
+                )
+                self.synced_level = level
+                self.synced_at = time.time()
+        logger.debug('applied %s updates of bigmap %s up to level %s', len(rows), self.ptr, level)
+        return len(rows)
+
+    def is_due(self):
+        return self.synced_at is None or time.time() - self.synced_at >= self.min_sync_interval
+
+    def refresh(self):
+        """
+        Syncs the mirror unless it was synced less than `min_sync_interval` seconds ago.
+        """
+        if self.is_due():
+            self.sync()
+        return self
+
+    def rollback(self, level):
+        """
+        Forgets the updates above a level, e.g. after a chain reorganization.
+        """
+        with self._sync_lock, self._lock, self._connection:
+            self._connection.execute(
+                'DELETE FROM bigmap_updates WHERE domain = ? AND ptr = ? AND level > ?', (self.domain, self.ptr, level),
+            )
+            self._connection.execute(
+                'UPDATE bigmap_mirrors SET synced_level = ? WHERE domain = ? AND ptr = ? AND synced_level > ?',
+                (level, self.domain, self.ptr, level),
+            )
+            if self.synced_level is not None and self.synced_level > level:
+                self.synced_level = level
+
+    def get(self, key, level=None):
+        """
+        Returns the value of a key at the synced level, or at an older level.
+
+        Parameters:
+            key (object):  The key, as returned in JSON by TzKT (e.g. an address).
+            level (int, optional):  Level to read the value at.  Levels before the bootstrap are read from TzKT.
+
+        Returns:
+            object:  The value, or None if the key is not in the bigmap.
+        """
+        if self.synced_level is None:
+            raise RuntimeError('bigmap %s is not synced' % self.ptr)
+        if level is not None and level > self.synced_level:
+            raise ValueError('level %s is above the synced level %s' % (level, self.synced_level))
+        if level is not None and level < self.bootstrap_level:
+            keys = BigMapKey.by_bigmap(self.ptr, key=key, level=level, domain=self.domain)
+            return keys[0].value if keys and keys[0].active is not False else None
+
+        level = level if level is not None else self.synced_level
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT value FROM bigmap_updates WHERE domain = ? AND ptr = ? AND key = ? AND level <= ? '
+                'ORDER BY level DESC, id DESC LIMIT 1',
+                (self.domain, self.ptr, self.encode_key(key), level),
+            ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return json.loads(row[0])
+
+    def keys(self, level=None):
+        """
+        Returns the encoded keys present at the synced (or given) level.
+        """
+        level = level if level is not None else self.synced_level
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT key, value FROM bigmap_updates AS updates WHERE domain = ? AND ptr = ? AND level <= ? AND id = '
+                '(SELECT id FROM bigmap_updates WHERE domain = updates.domain AND ptr = updates.ptr '
+                'AND key = updates.key AND level <= ? ORDER BY level DESC, id DESC LIMIT 1)',
+                (self.domain, self.ptr, level, level),
+            ).fetchall()
+        return [key for key, value in rows if value is not None]
+
+    def close(self):
+        self._connection.close()
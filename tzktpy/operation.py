@@ -37,7 +37,7 @@ Baking
     Bakers validating new blocks on the Tezos blockchain.
 """
 
-from .base import Base, Period
+from .base import Base, Period, list_query
 __all__ = ('Operation', 'Endorsement', 'Ballot', 'Proposal', 'Activation', 'DoubleBaking', 'DoubleEndorsing', 'NonceRevelation', 'Delegation', 'Origination', 'Transaction', 'Reveal', 'Migration', 'RevelationPenalty', 'Baking')
 
 
@@ -51,6 +51,9 @@ class OperationBase(Base):
         block (str):  The hash representing the block that stores the operation
     """
     __slots__ = ('type', 'id', 'level', 'timestamp', 'block')
+    column_types = {
+        'type': 'category', 'id': 'int', 'level': 'int', 'timestamp': 'datetime', 'block': 'str', 'hash': 'str',
+    }
 
     def __init__(self, type, id, level, timestamp, block):
         self.type = type
@@ -170,6 +173,7 @@ class OperationBase(Base):
         return output
 
     @classmethod
+    @list_query
     def by_address(cls, address, **kwargs):
         """
         Returns a list of operations related to the specified account. Note: for better flexibility this endpoint accumulates query parameters (filters) of each /operations/{type} endpoint, so a particular filter may affect several operation types containing this filter. For example, if you specify an initiator it will affect all transactions, delegations and originations, because all these types have an initiator field.
@@ -218,6 +222,30 @@ class OperationBase(Base):
         output = [cls.from_api(item) for item in data]
         return output
 
+    @classmethod
+    def iter_by_address(cls, address, **kwargs):
+        """
+        Lazily iterates over the full operation history of the specified account, following the `lastId` cursor.
+
+        Parameters:
+            address (str):  Account address (starting with tz or KT)
+
+        Keyword Parameters:
+            page_size (int):  Number of operations fetched per request.
+            limit (int):  Maximum number of operations to yield in total.
+            lastId (int):  Id of the operation to start after.
+            **kwargs:  Any other parameter supported by `by_address`.
+
+        Returns:
+            generator
+
+        Examples:
+            >>> address = 'KT1...'
+            >>> for operation in Transaction.iter_by_address(address, page_size=1000):
+            ...     pass
+        """
+        return cls._paginate(cls.by_address, (address, ), kwargs, cursor='lastId')
+
     @classmethod
     def _type_by_hash(cls, type, hash, **kwargs):
         path = 'v1/operations/%s/%s' % (type, hash)
@@ -322,6 +350,7 @@ class Endorsement(OperationBase):
         return cls(type, id, level, timestamp, block, hash, delegate, slots, deposit, rewards, quote)
 
     @classmethod
+    @list_query
     def get(cls, **kwargs):
         """
         Returns a list of endorsement operations.
@@ -445,6 +474,7 @@ class Ballot(OperationBase):
         return cls(type, id, level, timestamp, block, hash, period, proposal, delegate, rolls, vote, quote)
 
     @classmethod
+    @list_query
     def get(cls, **kwargs):
         """
         Returns a list of ballot operations.
@@ -573,6 +603,7 @@ class Proposal(OperationBase):
         return cls(type, id, level, timestamp, block, hash, period, proposal, delegate, rolls, duplicated, quote)
 
     @classmethod
+    @list_query
     def get(cls, **kwargs):
         """
         Returns a list of ballot operations.
@@ -689,6 +720,7 @@ class Activation(OperationBase):
         return cls(type, id, level, timestamp, block, hash, account, balance, quote)
 
     @classmethod
+    @list_query
     def get(cls, **kwargs):
         """
         Returns a list of activation operations.
@@ -816,6 +848,7 @@ class DoubleBaking(OperationBase):
         return cls(type, id, level, timestamp, block, hash, accused_level, accuser, accuser_rewards, offender, offender_lost_deposits, offender_lost_rewards, offender_lost_fees, quote)
 
     @classmethod
+    @list_query
     def get(cls, **kwargs):
         """
         Returns a list of double baking operations.
@@ -945,6 +978,7 @@ class DoubleEndorsing(OperationBase):
         return cls(type, id, level, timestamp, block, hash, accused_level, accuser, accuser_rewards, offender, offender_lost_deposits, offender_lost_rewards, offender_lost_fees, quote)
 
     @classmethod
+    @list_query
     def get(cls, **kwargs):
         """
         Returns a list of double endorsing operations.
@@ -1051,6 +1085,7 @@ class NonceRevelation(OperationBase):
         return cls(type, id, level, timestamp, block, hash, baker, baker_rewards, sender, revealed_level, quote)
 
     @classmethod
+    @list_query
     def get(cls, **kwargs):
         """
         Returns a list of nonce revelation operations.
@@ -1199,6 +1234,7 @@ class Delegation(OperationBase):
         return cls(type, id, level, timestamp, block, hash, counter, initiator, sender, nonce, gas_limit, gas_used, storage_limit, storage_used, baker_fee, amount, prev_delegate, new_delegate, status, errors, quote)
 
     @classmethod
+    @list_query
     def get(cls, **kwargs):
         """
         Returns a list of delegation operations.
@@ -1340,6 +1376,7 @@ class Origination(OperationBase):
         return cls(type, id, level, timestamp, block, hash, counter, initiator, sender, nonce, gas_limit, gas_used, storage_limit, storage_used, baker_fee, storage_fee, allocation_fee, contract_balance, contract_manager, contract_delegate, code, storage, diffs, status, errors, originated_contract, quote)
 
     @classmethod
+    @list_query
     def get(cls, **kwargs):
         """
         Returns a list of origination operations.
@@ -1447,6 +1484,11 @@ class Transaction(OperationBase):
         has_internals (bool):  Indicates if the operation is internal or not.
     """
     __slots__ = ('type', 'id', 'level', 'timestamp', 'block', 'hash', 'counter', 'initiator', 'sender', 'target', 'quote', 'nonce', 'gas_limit', 'gas_used', 'storage_limit', 'storage_used', 'baker_fee', 'storage_fee', 'allocation_fee', 'amount', 'parameter', 'parameters', 'storage', 'diffs', 'status', 'has_internals')
+    column_types = {
+        'id': 'int', 'level': 'int', 'timestamp': 'datetime', 'hash': 'str', 'sender.address': 'address',
+        'target.address': 'address', 'amount': 'mutez', 'bakerFee': 'mutez', 'storageFee': 'mutez',
+        'allocationFee': 'mutez', 'gasUsed': 'int', 'status': 'category', 'hasInternals': 'bool',
+    }
 
     def __init__(self, type, id, level, timestamp, block, hash, counter, initiator, sender, target, quote, nonce, gas_limit, gas_used, storage_limit, storage_used, baker_fee, storage_fee, allocation_fee, amount, parameter, parameters, storage, diffs, status, has_internals):
         super(Transaction, self).__init__(type, id, level, timestamp, block)
@@ -1509,6 +1551,7 @@ class Transaction(OperationBase):
         return cls(type, id, level, timestamp, block, hash, counter, initiator, sender, target, quote, nonce, gas_limit, gas_used, storage_limit, storage_used, baker_fee, storage_fee, allocation_fee, amount, parameter, parameters, storage, diffs, status, has_internals)
 
     @classmethod
+    @list_query
     def get(cls, **kwargs):
         """
         Returns a list of transaction operations.
@@ -1644,6 +1687,7 @@ class Reveal(OperationBase):
         return cls(type, id, level, timestamp, block, hash, sender, counter, gas_limit, gas_used, baker_fee, status, errors, quote)
 
     @classmethod
+    @list_query
     def get(cls, **kwargs):
         """
         Returns a list of reveal operations.
@@ -1757,6 +1801,7 @@ class Migration(OperationBase):
         return cls(type, id, level, timestamp, block, kind, account, balance_change, quote)
 
     @classmethod
+    @list_query
     def get(cls, **kwargs):
         """
         Returns a list of migration operations.
@@ -1862,6 +1907,7 @@ class RevelationPenalty(OperationBase):
         return cls(type, id, level, timestamp, block, baker, missed_level, lost_reward, lost_fees, quote)
 
     @classmethod
+    @list_query
     def get(cls, **kwargs):
         """
         Returns a list of revelation penalty operations.
@@ -1980,6 +2026,7 @@ class Baking(OperationBase):
         return cls(type, id, level, timestamp, block, baker, priority, deposit, reward, fees, quote)
 
     @classmethod
+    @list_query
     def get(cls, **kwargs):
         """
         Returns a list of baking operations.
@@ -1,4 +1,4 @@
-from .base import Base
+from .base import Base, list_query
 __all__ = ('Protocol', )
 
 
@@ -51,6 +51,7 @@ class Protocol(Base):
         return int(data)
 
     @classmethod
+    @list_query
     def get(cls, **kwargs):
         """
         Returns a list of protocols.
@@ -1,9 +1,13 @@
-from .base import Base
+from .base import Base, list_query
 __all__ = ('Quote', )
 
 
 class Quote(Base):
     __slots__ = ('level', 'timestamp', 'btc', 'eur', 'usd', 'cny', 'jpy', 'krw', 'eth')
+    column_types = {
+        'level': 'int', 'timestamp': 'datetime', 'btc': 'float', 'eur': 'float', 'usd': 'float', 'cny': 'float',
+        'jpy': 'float', 'krw': 'float', 'eth': 'float',
+    }
 
     def __init__(self, level, timestamp, btc, eur, usd, cny, jpy, krw, eth):
         self.level = level
@@ -55,6 +59,7 @@ class Quote(Base):
         return cls.from_api(data)
 
     @classmethod
+    @list_query
     def get(cls, **kwargs):
         """
         Returns a list of quotes aligned with blocks.
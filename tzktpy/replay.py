@@ -0,0 +1,166 @@
+"""
+Record and replay of HTTP traffic.
+
+A `RecordingTransport` passes requests through to a real transport and stores every response in a `FixtureStore`, a
+single gzipped JSON file.  A `ReplayTransport` answers requests from such a file without any network access, so the
+same queries return the same objects deterministically.  Fixtures are keyed by method, path and query parameters only,
+so traffic recorded on `https://api.tzkt.io` replays against any domain, including the local `tzktpy.standin`
+server.
+
+Example:
+    >>> from tzktpy import replay, transport
+    >>> store = replay.FixtureStore('fixtures/mainnet.json.gz')
+    >>> with transport.use_transport(replay.RecordingTransport(transport.get_transport(), store)):
+    ...     bigmaps = BigMap.by_contract('KT1...')
+    >>> store.save()
+    >>> with transport.use_transport(replay.ReplayTransport(store)):
+    ...     bigmaps = BigMap.by_contract('KT1...')
+"""
+import gzip
+import json
+import os
+import tempfile
+import threading
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from . import transport
+from .cache import CachedResponse
+__all__ = ('MissingFixture', 'FixtureStore', 'RecordingTransport', 'ReplayTransport')
+
+
+class MissingFixture(LookupError):
+    """
+    Raised by a `ReplayTransport` for a request that was never recorded.
+    """
+    def __init__(self, key):
+        super(MissingFixture, self).__init__(key)
+        self.key = key
+
+
+class FixtureStore(object):
+    """
+    Recorded responses, persisted as one gzipped JSON file.
+
+    Parameters:
+        path (str, optional):  File the fixtures are loaded from (when it exists) and saved to.
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.responses = dict()
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def __repr__(self):
+        return '<%s %s path=%r, responses=%r>' % (self.__class__.__name__, id(self), self.path, len(self.responses))
+
+    def __len__(self):
+        return len(self.responses)
+
+    def __contains__(self, key):
+        return key in self.responses
+
+    @staticmethod
+    def key(method, url, params=None):
+        """
+        Returns the domain-independent key of a request: its method, path and sorted query parameters, whether they
+        are part of the url or passed separately.
+        """
+        parts = urlsplit(url)
+        pairs = parse_qsl(parts.query, keep_blank_values=True)
+        for name, value in (params or {}).items():
+            values = value if isinstance(value, (list, tuple)) else [value]
+            pairs.extend((name, str(item)) for item in values)
+        return '%s %s?%s' % (method, parts.path, urlencode(sorted(pairs)))
+
+    def add(self, method, url, params, status_code, content):
+        key = self.key(method, url, params)
+        with self._lock:
+            self.responses[key] = dict(status_code=status_code, content=content.decode('utf-8'))
+        return key
+
+    def add_json(self, method, url, params, payload, status_code=200):
+        return self.add(method, url, params, status_code, json.dumps(payload).encode('utf-8'))
+
+    def add_query(self, payload, query, *args, **kwargs):
+        """
+        Stores `payload` as the JSON response of the request a tzktpy query sends.
+
+        Parameters:
+            payload (object):  The JSON document to answer with.
+            query (callable):  A tzktpy query classmethod, called with the remaining arguments.
+
+        Example:
+            >>> store.add_query([{'ptr': 7, 'path': 'portfolios'}], BigMap.by_contract, 'KT1...')
+        """
+        request = transport.capture(query, *args, **kwargs)
+        if request is None:
+            raise ValueError('%s sent no request' % query.__name__)
+        return self.add_json(request.method, request.url, request.kwargs.get('params'), payload)
+
+    def lookup(self, method, url, params=None):
+        """
+        Returns the recorded response of a request as a `CachedResponse`, or None.
+        """
+        recorded = self.responses.get(self.key(method, url, params))
+        if recorded is None:
+            return None
+        return CachedResponse(recorded['status_code'], recorded['content'].encode('utf-8'), url)
+
+    def load(self, path=None):
+        with gzip.open(path or self.path, 'rt', encoding='utf-8') as fixture_file:
+            responses = json.load(fixture_file)
+        with self._lock:
+            self.responses.update(responses)
+
+    def save(self, path=None):
+        """
+        Writes the fixtures atomically.  The output only depends on the recorded responses, so re-recording the same
+        traffic does not produce a diff.
+        """
+        path = path or self.path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            document = json.dumps(self.responses, sort_keys=True, indent=1)
+        file_descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(file_descriptor, 'wb') as raw_file:
+            with gzip.GzipFile(fileobj=raw_file, mode='wb', mtime=0) as fixture_file:
+                fixture_file.write(document.encode('utf-8'))
+        os.replace(temp_path, path)
+
+
+class RecordingTransport(object):
+    """
+    Wraps a transport, storing every response it returns in a `FixtureStore`.
+    """
+    def __init__(self, inner, store):
+        self.inner = inner
+        self.store = store
+
+    def request(self, method, url, **kwargs):
+        response = self.inner.request(method, url, **kwargs)
+        self.store.add(method, url, kwargs.get('params'), response.status_code, response.content)
+        return response
+
+
+class ReplayTransport(object):
+    """
+    Answers requests from a `FixtureStore`.
+
+    Parameters:
+        store (FixtureStore):  The recorded responses.
+        fallback (object, optional):  Transport for requests that were not recorded.  `MissingFixture` is raised
+            for them by default.
+    """
+    def __init__(self, store, fallback=None):
+        self.store = store
+        self.fallback = fallback
+
+    def request(self, method, url, **kwargs):
+        response = self.store.lookup(method, url, kwargs.get('params'))
+        if response is not None:
+            return response
+        if self.fallback is not None:
+            return self.fallback.request(method, url, **kwargs)
+        raise MissingFixture(self.store.key(method, url, kwargs.get('params')))
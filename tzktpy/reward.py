@@ -1,4 +1,4 @@
-from .base import Base
+from .base import Base, list_query
 __all__ = ('Reward', )
 
 
@@ -135,6 +135,7 @@ class Reward(Base):
         return int(data)
 
     @classmethod
+    @list_query
     def by_baker(cls, address, **kwargs):
         """
         Returns a list of baker rewards for every cycle, including future cycles.
@@ -219,6 +220,7 @@ class Reward(Base):
         return int(data)
 
     @classmethod
+    @list_query
     def by_delegator(cls, address, **kwargs):
         """
         Returns a list of delegator rewards for every cycle, including future cycles.
@@ -1,4 +1,4 @@
-from .base import Base
+from .base import Base, list_query
 __all__ = ('Right', )
 
 
@@ -34,6 +34,7 @@ class Right(Base):
         return cls(type, cycle, level, timestamp, priority, slots, baker, status)
 
     @classmethod
+    @list_query
     def get(cls, **kwargs):
         """
         Returns a list of rights.
@@ -0,0 +1,173 @@
+"""
+In-flight request coalescing.
+
+Concurrent callers asking for the same key share one outstanding call and all receive its result (or its error).
+`SingleFlightTransport` and `AsyncSingleFlightTransport` apply this to GET requests keyed by url and params.
+
+Example:
+    >>> from tzktpy import singleflight
+    >>> flight = singleflight.enable()
+    >>> flight.stats()
+    {'calls': 0, 'executions': 0, 'coalesced': 0}
+"""
+import asyncio
+import threading
+
+from . import aio, transport
+__all__ = ('SingleFlight', 'SingleFlightTransport', 'AsyncSingleFlightTransport', 'enable')
+
+
+class _Call(object):
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Deduplicates concurrent calls sharing a key, in threads (`do`) and in asyncio tasks (`do_async`).
+
+    Attributes:
+        calls (int):  Number of calls made.
+        executions (int):  Number of calls that actually ran.
+        coalesced (int):  Number of calls that waited for an identical call already in flight.
+    """
+    def __init__(self):
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self._calls = dict()
+        self._futures = dict()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<%s %s calls=%r, executions=%r, coalesced=%r>' % (
+            self.__class__.__name__, id(self), self.calls, self.executions, self.coalesced,
+        )
+
+    def stats(self):
+        return dict(calls=self.calls, executions=self.executions, coalesced=self.coalesced)
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        Calls `fn(*args, **kwargs)` unless a call with the same key is already running, in which case its result
+        is awaited and returned instead.
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        if not is_leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as error:
+            # interruptions (KeyboardInterrupt, SystemExit) are passed on too, waiters must not read a None result
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+    async def do_async(self, key, fn, *args, **kwargs):
+        """
+        Awaits `fn(*args, **kwargs)` unless a call with the same key is already pending on the running event loop,
+        in which case its result is awaited and returned instead.
+        """
+        loop = asyncio.get_running_loop()
+        loop_key = (id(loop), key)
+        with self._lock:
+            self.calls += 1
+            future = self._futures.get(loop_key)
+            is_leader = future is None
+            if is_leader:
+                future = self._futures[loop_key] = loop.create_future()
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        if not is_leader:
+            return await asyncio.shield(future)
+
+        try:
+            result = await fn(*args, **kwargs)
+        except Exception as error:
+            future.set_exception(error)
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            # a cancelled leader cancels its waiters instead of leaving them pending forever
+            if not future.done():
+                future.cancel()
+            with self._lock:
+                del self._futures[loop_key]
+        return result
+
+
+class SingleFlightTransport(object):
+    """
+    Wraps a transport so that identical concurrent GET requests share one HTTP call.
+    """
+    def __init__(self, inner, flight=None):
+        self.inner = inner
+        self.flight = flight or SingleFlight()
+
+    def request(self, method, url, **kwargs):
+        # a streamed body can only be read once, so it is never shared
+        if method != 'GET' or kwargs.get('stream'):
+            return self.inner.request(method, url, **kwargs)
+        key = transport.request_key(method, url, kwargs.get('params'))
+        return self.flight.do(key, self.inner.request, method, url, **kwargs)
+
+    def close(self):
+        self.inner.close()
+
+
+class AsyncSingleFlightTransport(SingleFlightTransport):
+    """
+    Wraps an async transport so that identical concurrent GET requests share one HTTP call.
+    """
+    async def request(self, method, url, **kwargs):
+        if method != 'GET':
+            return await self.inner.request(method, url, **kwargs)
+        key = transport.request_key(method, url, kwargs.get('params'))
+        return await self.flight.do_async(key, self.inner.request, method, url, **kwargs)
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+def enable(flight=None):
+    """
+    Installs request coalescing in front of both the blocking and the async transports.  Calling it again replaces
+    the installed coalescing instead of stacking another one.
+
+    Parameters:
+        flight (SingleFlight, optional):  The coalescing state to share.  A new one is created by default.
+
+    Returns:
+        SingleFlight:  Holds the counters of both transports.
+    """
+    flight = flight or SingleFlight()
+    inner = transport.unwrap(transport.get_transport(), SingleFlightTransport)
+    async_inner = transport.unwrap(aio.get_async_transport(), AsyncSingleFlightTransport)
+    transport.set_transport(SingleFlightTransport(inner, flight))
+    aio.set_async_transport(AsyncSingleFlightTransport(async_inner, flight))
+    return flight
@@ -1,4 +1,4 @@
-from .base import Base
+from .base import Base, list_query
 __all__ = ('Software', )
 
 
@@ -37,6 +37,7 @@ class Software(Base):
         return cls(shortHash, firstLevel, firstTime, lastLevel, lastTime, blocksCount, metadata)
 
     @classmethod
+    @list_query
     def get(cls, **kwargs):
         """
         Returns a list of baker software.
@@ -0,0 +1,280 @@
+"""
+Local stand-ins for the TzKT and Spicya APIs.
+
+`StandinServer` serves the responses of a `tzktpy.replay.FixtureStore` over HTTP, with configurable latency and error
+injection, so the pooled transports, retries and the application endpoints can be load-tested and benchmarked
+offline.  Requests without a fixture are answered with 404.
+
+`StandinHub` is an in-process replacement of the TzKT events hub, to drive a `tzktpy.events.EventSubscriber`
+without SignalR: it answers subscriptions with their state, publishes messages and drops connections on demand.
+
+Examples:
+    >>> with StandinServer(FixtureStore('fixtures/mainnet.json.gz'), latency=0.05, error_rate=0.01) as server:
+    ...     head = Head.get(domain=server.url)
+    >>> hub = StandinHub(level=100)
+    >>> subscriber = EventSubscriber(connection_factory=hub.connect).start()
+    >>> hub.publish('head', {'level': 101}, level=101)
+"""
+import json
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .replay import FixtureStore
+__all__ = ('StandinServer', 'StandinHub', 'StandinHubConnection')
+
+logger = logging.getLogger(__name__)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.standin.handle(self)
+
+    def do_HEAD(self):
+        self.server.standin.handle(self)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+class StandinServer(object):
+    """
+    Serves recorded fixtures on a local port from a background thread.
+
+    Parameters:
+        store (FixtureStore):  The responses to serve.
+        host (str):  Interface to listen on.
+        port (int):  Port to listen on, 0 picks a free one.
+        latency (float):  Seconds every response is delayed by.
+        jitter (float):  Maximum random seconds added to the latency.
+        error_rate (float):  Probability in [0, 1] of answering with `error_status` instead of the fixture.
+        error_status (int):  Status code of the injected errors.
+        seed (int, optional):  Seed of the jitter and error injection, for reproducible runs.
+
+    Attributes:
+        requests (int):  Number of requests received.
+        errors (int):  Number of injected errors.
+    """
+    def __init__(
+        self, store, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, error_rate=0.0, error_status=503, seed=None,
+    ):
+        self.store = store
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def __repr__(self):
+        return '<%s %s url=%r, latency=%r, error_rate=%r, requests=%r, errors=%r>' % (
+            self.__class__.__name__, id(self), self.url, self.latency, self.error_rate, self.requests, self.errors,
+        )
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def url(self):
+        if self._server is None:
+            return None
+        host, port = self._server.server_address[:2]
+        return 'http://%s:%s' % (host, port)
+
+    def start(self):
+        self._server = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._server.daemon_threads = True
+        self._server.standin = self
+        self._thread = threading.Thread(target=self._server.serve_forever, name='tzktpy-standin', daemon=True)
+        self._thread.start()
+        logger.info('serving %s fixtures on %s', len(self.store), self.url)
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+            self._thread = None
+
+    def _draw(self):
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+            is_error = self.error_rate > 0 and self._random.random() < self.error_rate
+            if is_error:
+                self.errors += 1
+        return delay, is_error
+
+    def handle(self, handler):
+        delay, is_error = self._draw()
+        if delay:
+            time.sleep(delay)
+
+        if is_error:
+            status_code, content = self.error_status, json.dumps({'error': 'injected'}).encode('utf-8')
+        else:
+            response = self.store.lookup('GET', handler.path)
+            if response is None:
+                status_code, content = 404, json.dumps({'error': 'no fixture', 'path': handler.path}).encode('utf-8')
+            else:
+                status_code, content = response.status_code, response.content
+
+        handler.send_response(status_code)
+        handler.send_header('Content-Type', 'application/json; charset=utf-8')
+        handler.send_header('Content-Length', str(len(content)))
+        handler.end_headers()
+        if handler.command != 'HEAD':
+            handler.wfile.write(content)
+
+
+class StandinHubConnection(object):
+    """
+    A connection to a `StandinHub`, with the interface of a `signalrcore` hub connection.
+    """
+    def __init__(self, hub, url):
+        self.hub = hub
+        self.url = url
+        self.is_open = False
+        self.subscriptions = list()
+        self._handlers = dict()
+        self._on_open = None
+        self._on_close = None
+
+    def __repr__(self):
+        return '<%s %s url=%r, is_open=%r, subscriptions=%r>' % (
+            self.__class__.__name__, id(self), self.url, self.is_open, self.subscriptions,
+        )
+
+    def on_open(self, callback):
+        self._on_open = callback
+
+    def on_close(self, callback):
+        self._on_close = callback
+
+    def on(self, event, callback):
+        self._handlers.setdefault(event, list()).append(callback)
+
+    def start(self):
+        if self.hub.refuse:
+            return False
+        self.is_open = True
+        if self._on_open is not None:
+            self._on_open()
+        return True
+
+    def stop(self):
+        if self.is_open:
+            self.is_open = False
+            if self._on_close is not None:
+                self._on_close()
+
+    def send(self, method, arguments):
+        channel = self.hub.methods[method]
+        self.subscriptions.append((channel, arguments[0] if arguments else None))
+        self.deliver(channel, dict(type=0, state=self.hub.level))
+
+    def deliver(self, channel, message):
+        for handler in self._handlers.get(channel, ()):
+            handler([message])
+
+
+class StandinHub(object):
+    """
+    In-process stand-in of the TzKT `/v1/events` hub.
+
+    Parameters:
+        level (int):  Level reported in the state messages.
+
+    Attributes:
+        connections (list):  Every connection made, open or not.
+        refuse (bool):  When set, new connections fail to start.
+    """
+    methods = {'SubscribeToHead': 'head', 'SubscribeToBigMaps': 'bigmaps', 'SubscribeToOperations': 'operations'}
+
+    def __init__(self, level=0):
+        self.level = level
+        self.refuse = False
+        self.connections = list()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<%s %s level=%r, connections=%r>' % (
+            self.__class__.__name__, id(self), self.level, len(self.open_connections()),
+        )
+
+    def connect(self, url):
+        connection = StandinHubConnection(self, url)
+        with self._lock:
+            self.connections.append(connection)
+        return connection
+
+    def open_connections(self):
+        with self._lock:
+            return [connection for connection in self.connections if connection.is_open]
+
+    def publish(self, channel, data, level=None):
+        """
+        Sends a data message to the open connections subscribed to the channel.
+        """
+        if level is not None:
+            self.level = level
+        message = dict(type=1, state=self.level, data=data)
+        for connection in self.open_connections():
+            if any(name == channel for name, _ in connection.subscriptions):
+                connection.deliver(channel, message)
+
+    def reorg(self, level):
+        self.level = level
+        for connection in self.open_connections():
+            for channel in set(name for name, _ in connection.subscriptions):
+                connection.deliver(channel, dict(type=2, state=level))
+
+    def drop(self):
+        """
+        Closes every open connection, as a network failure would.
+        """
+        for connection in self.open_connections():
+            connection.stop()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Serve recorded TzKT/Spicya fixtures locally.')
+    parser.add_argument('fixtures', help='gzipped JSON fixture file')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5080)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='maximum random seconds added to the latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='probability of an injected error')
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = StandinServer(
+        FixtureStore(args.fixtures), host=args.host, port=args.port, latency=args.latency, jitter=args.jitter,
+        error_rate=args.error_rate, error_status=args.error_status, seed=args.seed,
+    )
+    server.start()
+    print('Serving %s fixtures on %s' % (len(server.store), server.url))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
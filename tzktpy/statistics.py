@@ -1,9 +1,15 @@
-from .base import Base
+from .base import Base, list_query
 __all__ = ('Statistics', )
 
 
 class Statistics(Base):
     __slots__ = ('cycle', 'date', 'level', 'timestamp', 'total_supply', 'circulating_supply', 'total_bootstrapped', 'total_commitments', 'total_activated', 'total_created', 'total_burned', 'total_vested', 'total_frozen', 'quote')
+    column_types = {
+        'cycle': 'int', 'date': 'datetime', 'level': 'int', 'timestamp': 'datetime', 'totalSupply': 'mutez',
+        'circulatingSupply': 'mutez', 'totalBootstrapped': 'mutez', 'totalCommitments': 'mutez',
+        'totalActivated': 'mutez', 'totalCreated': 'mutez', 'totalBurned': 'mutez', 'totalVested': 'mutez',
+        'totalFrozen': 'mutez',
+    }
 
     def __init__(self, cycle, date, level, timestamp, total_supply, circulating_supply, total_bootstrapped, total_commitments, total_activated, total_created, total_burned, total_vested, total_frozen, quote):
         self.cycle = cycle
@@ -51,6 +57,7 @@ class Statistics(Base):
         return cls(cycle, date, level, timestamp, total_supply, circulating_supply, total_bootstrapped, total_commitments, total_activated, total_created, total_burned, total_vested, total_frozen, quote)
 
     @classmethod
+    @list_query
     def get(cls, **kwargs):
         """
         Returns a list of end-of-block statistics.
@@ -80,6 +87,7 @@ class Statistics(Base):
         return [cls.from_api(item) for item in data]
 
     @classmethod
+    @list_query
     def daily(cls, **kwargs):
         """
         Returns a list of end-of-day statistics.
@@ -108,6 +116,7 @@ class Statistics(Base):
         return [cls.from_api(item) for item in data]
 
     @classmethod
+    @list_query
     def cyclic(cls, **kwargs):
         """
         Returns a list of end-of-cycle statistics.
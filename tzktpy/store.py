@@ -0,0 +1,363 @@
+"""
+Local incremental copies of tzktpy resources.
+
+An `EntityStore` keeps one SQLite table per resource (quotes, statistics, cycles, blocks, transactions...).  A sync
+only fetches what is after the resource's watermark, following its natural cursor: a level (or id) filter for most
+resources, the `lastId` cursor for account operations and the offset for cycles.  Rows keep the JSON returned by TzKT,
+so `get` can mirror the remote `get` with the same `__` modifiers, answered locally from indexed columns or
+`json_extract`, and tables can be exported to Parquet.
+
+Examples:
+    >>> store = EntityStore('analytics.sqlite3', domain='https://api.tzkt.io')
+    >>> store.sync('quotes')
+    >>> quotes = store.get('quotes', level__gt=2000000, sort__desc='level', limit=10)
+    >>> store.to_parquet('quotes', 'quotes.parquet')
+
+CLI:
+    python -m tzktpy.store analytics.sqlite3 sync quotes blocks
+    python -m tzktpy.store analytics.sqlite3 export quotes quotes.parquet
+    python -m tzktpy.store analytics.sqlite3 status
+"""
+import collections
+import datetime
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from .base import Base
+from .block import Block
+from .cycle import Cycle
+from .head import Head
+from .operation import Operation, Transaction
+from .quote import Quote
+from .statistics import Statistics
+__all__ = ('Resource', 'RESOURCES', 'EntityStore')
+
+logger = logging.getLogger(__name__)
+
+Resource = collections.namedtuple(
+    'Resource', ('name', 'entity', 'query', 'key', 'cursor', 'cursor_kind', 'order', 'level', 'head_cursor'),
+    defaults=(None, None),
+)
+Resource.__doc__ = """
+A syncable resource.
+
+Attributes:
+    name (str):  Table name.
+    entity (type):  tzktpy class decoding the rows (`from_api`) and typing exported columns (`column_types`).
+    query (callable):  List query returning the raw pages, e.g. `Quote.get`.
+    key (str):  Unique field of the items.
+    cursor (str):  Increasing field the sync resumes from.
+    cursor_kind (str):  `filter` (`<cursor>__gt` or `__ge` filter), `last_id` (`lastId` parameter) or `offset`.
+    order (dict):  Query parameters sorting the items by cursor, ascending.
+    level (str, optional):  Level field of the items.  Syncs stop `confirmations` levels below the head, so items of
+        blocks that may still be orphaned are never stored.
+    head_cursor (str, optional):  Head field bounding the cursor, for resources that can't be filtered by level.
+        Items after the head's value, e.g. the precomputed future cycles, are not stored.
+"""
+
+RESOURCES = {
+    'quotes': Resource('quotes', Quote, Quote.get, 'level', 'level', 'filter', {'sort__asc': 'level'}, 'level'),
+    'statistics': Resource(
+        'statistics', Statistics, Statistics.get, 'level', 'level', 'filter', {'sort__asc': 'level'}, 'level',
+    ),
+    'cycles': Resource(
+        'cycles', Cycle, Cycle.get, 'index', 'index', 'offset', {'sort__asc': 'index'}, head_cursor='cycle',
+    ),
+    'blocks': Resource('blocks', Block, Block.get, 'level', 'level', 'filter', {'sort__asc': 'level'}, 'level'),
+    'transactions': Resource(
+        'transactions', Transaction, Transaction.get, 'id', 'level', 'filter', {'sort__asc': 'id'}, 'level',
+    ),
+    # operations of one account, synced with store.sync('operations', address)
+    'operations': Resource('operations', Operation, Operation.by_address, 'id', 'id', 'last_id', {'sort': 0}, 'level'),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS "%(name)s" (
+    domain TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    key INTEGER NOT NULL,
+    cursor INTEGER,
+    data TEXT NOT NULL,
+    PRIMARY KEY (domain, scope, key)
+);
+CREATE INDEX IF NOT EXISTS "%(name)s_cursor" ON "%(name)s" (domain, scope, cursor);
+CREATE TABLE IF NOT EXISTS store_watermarks (
+    resource TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    cursor INTEGER NOT NULL,
+    synced_at REAL NOT NULL,
+    PRIMARY KEY (resource, domain, scope)
+);
+"""
+
+OPERATORS = {'eq': '=', 'ne': '!=', 'gt': '>', 'ge': '>=', 'lt': '<', 'le': '<='}
+
+
+def _sql_value(value):
+    if isinstance(value, datetime.datetime):
+        return value.strftime(Base.datetime_format)
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+class EntityStore(object):
+    """
+    SQLite copies of tzktpy resources, synced incrementally.
+
+    Parameters:
+        path (str):  SQLite database file.  Defaults to an in-memory one.
+        domain (str, optional):  The tzkt.io domain to sync from.  Rows of several domains can share a file.
+        resources (dict, optional):  Syncable resources by name.  Defaults to `RESOURCES`.
+        confirmations (int):  Number of levels below the head that syncs stop at.
+    """
+    def __init__(self, path=':memory:', domain=Base.domain, resources=None, confirmations=2):
+        self.path = path
+        self.domain = domain
+        self.confirmations = confirmations
+        self.resources = dict(resources or RESOURCES)
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        for name in self.resources:
+            self._connection.executescript(SCHEMA % dict(name=name))
+
+    def __repr__(self):
+        return '<%s %s path=%r, domain=%r, resources=%r>' % (
+            self.__class__.__name__, id(self), self.path, self.domain, sorted(self.resources),
+        )
+
+    def resource(self, name):
+        try:
+            return self.resources[name]
+        except KeyError:
+            raise ValueError('unknown resource %r, expected one of %s' % (name, ', '.join(sorted(self.resources))))
+
+    def watermark(self, name, scope=''):
+        """
+        Returns the cursor a resource was synced up to, None if it was never synced.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT cursor FROM store_watermarks WHERE resource = ? AND domain = ? AND scope = ?',
+                (name, self.domain, scope),
+            ).fetchone()
+        return row[0] if row else None
+
+    def target_level(self):
+        return Head.get(domain=self.domain).level - self.confirmations
+
+    def _pages(self, resource, args, watermark, page_size):
+        kwargs = dict(resource.order, domain=self.domain)
+        if resource.level is not None:
+            kwargs['%s__le' % resource.level] = self.target_level()
+        bound = getattr(Head.get(domain=self.domain), resource.head_cursor) if resource.head_cursor else None
+        if watermark is not None and resource.cursor_kind == 'filter':
+            # a cursor shared by several items (the level of transactions) is fetched again from its last value
+            modifier = 'gt' if resource.cursor == resource.key else 'ge'
+            kwargs['%s__%s' % (resource.cursor, modifier)] = watermark
+        if watermark is not None and resource.cursor_kind == 'last_id':
+            kwargs['lastId'] = watermark
+        offset = watermark + 1 if watermark is not None and resource.cursor_kind == 'offset' else 0
+        while True:
+            page_kwargs = dict(kwargs, limit=page_size)
+            if resource.cursor_kind != 'last_id':
+                page_kwargs['offset'] = offset
+            page = list(resource.entity._stream_items(resource.query, args, page_kwargs))
+            bounded = page if bound is None else [item for item in page if item[resource.cursor] <= bound]
+            if bounded:
+                yield bounded
+            if len(bounded) < page_size:
+                break
+            offset += len(page)
+            if resource.cursor_kind == 'last_id':
+                kwargs['lastId'] = page[-1][resource.cursor]
+
+    def sync(self, name, *args, **kwargs):
+        """
+        Fetches the items of a resource after its watermark and stores them.
+
+        Parameters:
+            name (str):  Resource name.
+            *args:  Positional arguments of the resource query, e.g. the address of account `operations`.
+
+        Keyword Parameters:
+            page_size (int):  Number of items fetched per request.
+
+        Returns:
+            int:  Number of items fetched.
+        """
+        resource = self.resource(name)
+        page_size = kwargs.pop('page_size', resource.entity.page_size)
+        if kwargs:
+            raise ValueError('The following parameters are invalid: %s' % ', '.join(kwargs))
+        scope = ','.join(str(arg) for arg in args)
+        count = 0
+        for page in self._pages(resource, args, self.watermark(name, scope), page_size):
+            rows = [
+                (self.domain, scope, item[resource.key], item.get(resource.cursor), json.dumps(item)) for item in page
+            ]
+            cursor = max(item[resource.cursor] for item in page)
+            with self._lock, self._connection:
+                self._connection.executemany('INSERT OR REPLACE INTO "%s" VALUES (?, ?, ?, ?, ?)' % name, rows)
+                # the watermark moves with every stored page, an interrupted sync resumes from it
+                self._connection.execute(
+                    'INSERT OR REPLACE INTO store_watermarks VALUES (?, ?, ?, ?, ?)',
+                    (name, self.domain, scope, cursor, time.time()),
+                )
+            count += len(page)
+        logger.info('synced %s %s items from %s', count, name, self.domain)
+        return count
+
+    def _column(self, resource, field):
+        if field == resource.key:
+            return 'key'
+        if field == resource.cursor:
+            return 'cursor'
+        return "json_extract(data, '$.%s')" % field.replace("'", '')
+
+    def _where(self, resource, scope, kwargs):
+        clauses, values = ['domain = ?', 'scope = ?'], [self.domain, scope]
+        for parameter, value in kwargs.items():
+            parts = parameter.split(Base.comparator_modifier_delimiter)
+            modifier = parts.pop() if len(parts) > 1 and parts[-1] in Base.comparator_suffixes else 'eq'
+            column = self._column(resource, '.'.join(parts))
+            if modifier in OPERATORS:
+                clauses.append('%s %s ?' % (column, OPERATORS[modifier]))
+                values.append(_sql_value(value))
+            elif modifier in ('in', 'ni'):
+                items = value.split(',') if isinstance(value, str) else list(value)
+                placeholders = ', '.join('?' * len(items))
+                clauses.append('%s %sIN (%s)' % (column, 'NOT ' if modifier == 'ni' else '', placeholders))
+                values.extend(_sql_value(item) for item in items)
+            elif modifier in ('as', 'un'):
+                clauses.append('%s %sLIKE ?' % (column, 'NOT ' if modifier == 'un' else ''))
+                values.append(value.replace('*', '%'))
+            elif modifier == 'null':
+                clauses.append('%s IS %sNULL' % (column, '' if value else 'NOT '))
+        return ' AND '.join(clauses), values
+
+    def _select(self, name, select, args, kwargs):
+        resource = self.resource(name)
+        scope = ','.join(str(arg) for arg in args)
+        kwargs = dict(kwargs)
+        limit = kwargs.pop('limit', None)
+        offset = kwargs.pop('offset', None)
+        order = 'key'
+        for suffix in Base.sort_suffixes:
+            field = kwargs.pop('sort__%s' % suffix, None)
+            if field:
+                order = '%s %s' % (self._column(resource, field), suffix.upper())
+        field = kwargs.pop('sort', None)
+        if field:
+            order = self._column(resource, field)
+
+        where, values = self._where(resource, scope, kwargs)
+        sql = 'SELECT %s FROM "%s" WHERE %s ORDER BY %s' % (select(resource), name, where, order)
+        if limit is not None or offset is not None:
+            sql += ' LIMIT ? OFFSET ?'
+            values += [-1 if limit is None else limit, offset or 0]
+        with self._lock:
+            return self._connection.execute(sql, values).fetchall()
+
+    def get(self, name, *args, **kwargs):
+        """
+        Returns the stored items of a resource, filtered like the remote `get`.
+
+        Parameters:
+            name (str):  Resource name.
+            *args:  Scope of the items, e.g. the address of account `operations`.
+
+        Keyword Parameters:
+            <field>__<modifier>:  Filters with the standard modifiers (eq, ne, gt, ge, lt, le, in, ni, as, un, null).
+                Nested fields are separated with `__` too (`sender__address='tz1...'`).
+            sort__asc, sort__desc (str):  Sorts by a field.  Defaults to the key of the resource.
+            offset (int):  Number of items to skip.
+            limit (int):  Maximum number of items to return.
+
+        Returns:
+            list:  Items decoded with the `from_api` of the resource entity.
+
+        Example:
+            >>> blocks = store.get('blocks', timestamp__ge=datetime.date(2022, 1, 1), limit=100)
+        """
+        entity = self.resource(name).entity
+        rows = self._select(name, lambda resource: 'data', args, kwargs)
+        return [entity.from_api(json.loads(data)) for data, in rows]
+
+    def count(self, name, *args, **kwargs):
+        return self._select(name, lambda resource: 'COUNT(*)', args, kwargs)[0][0]
+
+    def to_frame(self, name, *args, **kwargs):
+        """
+        Returns stored items as a DataFrame typed after the `column_types` of the resource entity.
+
+        Keyword Parameters:
+            columns (list, optional):  Fields to export.  Defaults to the keys of `column_types`.
+            **kwargs:  Filters, sorting and limits of `get`.
+        """
+        entity = self.resource(name).entity
+        columns = kwargs.pop('columns', None) or list(entity.column_types)
+
+        def select(resource):
+            return ', '.join(self._column(resource, column) for column in columns)
+        rows = self._select(name, select, args, kwargs)
+        return entity.to_frame(rows, columns)
+
+    def to_parquet(self, name, path, *args, **kwargs):
+        """
+        Writes stored items to a Parquet file, see `to_frame`.
+
+        Returns:
+            int:  Number of written rows.
+        """
+        frame = self.to_frame(name, *args, **kwargs)
+        frame.to_parquet(path, index=False)
+        return len(frame)
+
+    def close(self):
+        self._connection.close()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Sync tzktpy resources into a local SQLite store.')
+    parser.add_argument('path', help='SQLite database file')
+    parser.add_argument('--domain', default=Base.domain)
+    commands = parser.add_subparsers(dest='command', required=True)
+    sync_parser = commands.add_parser('sync', help='fetch the new items of resources')
+    sync_parser.add_argument('resources', nargs='+', choices=sorted(RESOURCES))
+    sync_parser.add_argument(
+        '--address', action='append', default=[], help='account of the operations resource, repeatable',
+    )
+    sync_parser.add_argument('--page-size', type=int, default=None)
+    export_parser = commands.add_parser('export', help='write a resource to a Parquet file')
+    export_parser.add_argument('resource', choices=sorted(RESOURCES))
+    export_parser.add_argument('output')
+    export_parser.add_argument('--address', default=None)
+    commands.add_parser('status', help='print the watermarks')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    store = EntityStore(args.path, domain=args.domain)
+    if args.command == 'sync':
+        for resource_name in args.resources:
+            options = dict(page_size=args.page_size) if args.page_size else dict()
+            scopes = [(address, ) for address in args.address] if resource_name == 'operations' else [()]
+            for scope_args in scopes:
+                synced = store.sync(resource_name, *scope_args, **options)
+                print('%s %s: %s items synced' % (resource_name, ','.join(scope_args), synced))
+    elif args.command == 'export':
+        scope_args = (args.address, ) if args.address else ()
+        print('wrote %s rows to %s' % (store.to_parquet(args.resource, args.output, *scope_args), args.output))
+    else:
+        for resource_name in sorted(store.resources):
+            watermark = store.watermark(resource_name)
+            print('%s: watermark %s, %s items' % (resource_name, watermark, store.count(resource_name)))
+    store.close()
@@ -0,0 +1,147 @@
+"""
+Incremental decoding of large response bodies.
+
+`iter_json_array` yields the items of a top level JSON array while the body is still being received, holding only the
+undecoded tail of the body in memory, and `iter_lines` does the same for the lines of a CSV report.  Both read from
+`iter_chunks`, which uses `iter_content` of a streamed `requests.Response` and falls back to the already received
+`content` of any other response (cached, replayed or fake responses).
+
+Example:
+    >>> for block in Block.get(limit=10000, stream=True):
+    ...     pass
+"""
+import codecs
+import json
+__all__ = ('iter_chunks', 'iter_json_array', 'iter_lines', 'batched')
+
+CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_whitespace = ' \t\n\r'
+
+
+def iter_chunks(response, chunk_size=CHUNK_SIZE):
+    """
+    Yields the body of a response in byte chunks, closing the response afterwards.
+    """
+    iter_content = getattr(response, 'iter_content', None)
+    try:
+        if iter_content is not None:
+            for chunk in iter_content(chunk_size=chunk_size):
+                if chunk:
+                    yield chunk
+        else:
+            content = response.content
+            for start in range(0, len(content), chunk_size):
+                yield content[start:start + chunk_size]
+    finally:
+        close = getattr(response, 'close', None)
+        if close is not None:
+            close()
+
+
+def _iter_text(chunks):
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    text = decoder.decode(b'', final=True)
+    if text:
+        yield text
+
+
+def iter_json_array(chunks):
+    """
+    Yields the items of a JSON array as soon as each one is complete.
+
+    Parameters:
+        chunks (iterable):  Byte chunks of the JSON body, e.g. `iter_chunks(response)`.
+
+    Returns:
+        generator
+    """
+    texts = _iter_text(chunks)
+    buffer = ''
+    position = 0
+    started = finished = exhausted = False
+
+    def more():
+        nonlocal buffer, position, exhausted
+        try:
+            text = next(texts)
+        except StopIteration:
+            exhausted = True
+            return False
+        # forget the decoded head of the buffer
+        buffer = buffer[position:] + text
+        position = 0
+        return True
+
+    while True:
+        while position < len(buffer) and buffer[position] in _whitespace:
+            position += 1
+        if position == len(buffer):
+            if finished or not more():
+                break
+            continue
+
+        char = buffer[position]
+        if not started:
+            if char != '[':
+                raise ValueError('expected a JSON array, got %r' % buffer[position:position + 20])
+            started = True
+            position += 1
+            continue
+        if finished:
+            raise ValueError('unexpected data after the JSON array: %r' % buffer[position:position + 20])
+        if char == ']':
+            finished = True
+            position += 1
+            continue
+        if char == ',':
+            position += 1
+            continue
+
+        try:
+            item, end = _decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if not more():
+                raise
+            continue
+        # a number or literal ending the buffer may continue in the next chunk
+        if end == len(buffer) and not exhausted and more():
+            continue
+        position = end
+        yield item
+
+    if not finished:
+        raise ValueError('truncated JSON array')
+
+
+def iter_lines(chunks):
+    """
+    Yields the lines of a body, split on newlines, as soon as each one is complete.
+    """
+    tail = b''
+    for chunk in chunks:
+        lines = (tail + chunk).split(b'\n')
+        tail = lines.pop()
+        for line in lines:
+            yield line
+    if tail:
+        yield tail
+
+
+def batched(items, size):
+    """
+    Groups an iterable into lists of at most `size` items.
+    """
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,258 @@
+"""
+Transports send the HTTP requests issued by the tzktpy entities.
+
+Every `Base._request` call is routed through the active transport, so pooling, timeouts and retries are configured
+once here instead of in each entity module.  A custom transport only has to provide a
+`request(method, url, **kwargs)` method returning a `requests.Response`-like object.
+"""
+import contextlib
+import contextvars
+import logging
+import threading
+from urllib.parse import urlencode, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+__all__ = (
+    'Transport', 'CapturedRequest', 'get_transport', 'set_transport', 'configure', 'use_transport', 'capture',
+    'respond', 'request_key', 'unwrap',
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Transport(object):
+    """
+    Sends requests through one keep-alive `requests.Session` per domain, each with its own connection pool.
+
+    Parameters:
+        pool_maxsize (int):  Maximum number of connections kept alive per domain.
+        timeout (float|tuple):  Connect and read timeout in seconds, passed to every request unless overridden.
+        retries (int):  Number of retries on connection errors and retryable status codes.
+        backoff_factor (float):  Exponential backoff factor between retries.
+        status_forcelist (tuple):  Status codes that trigger a retry.
+
+    Examples:
+        >>> from tzktpy import transport
+        >>> transport.set_transport(transport.Transport(pool_maxsize=32, timeout=5, retries=5))
+    """
+    retry_methods = frozenset(['GET', 'HEAD', 'OPTIONS'])
+
+    def __init__(
+        self, pool_maxsize=10, timeout=(3.05, 30), retries=3, backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+    ):
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.status_forcelist = status_forcelist
+        self._sessions = dict()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<%s %s pool_maxsize=%r, timeout=%r, retries=%r, domains=%r>' % (
+            self.__class__.__name__, id(self), self.pool_maxsize, self.timeout, self.retries, list(self._sessions),
+        )
+
+    @staticmethod
+    def domain_of(url):
+        parts = urlsplit(url)
+        return '%s://%s' % (parts.scheme, parts.netloc)
+
+    def create_session(self):
+        retry = Retry(
+            total=self.retries, backoff_factor=self.backoff_factor, status_forcelist=self.status_forcelist,
+            allowed_methods=self.retry_methods, raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=retry)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def session(self, url):
+        domain = self.domain_of(url)
+        session = self._sessions.get(domain)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(domain)
+                if session is None:
+                    session = self._sessions[domain] = self.create_session()
+        return session
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        response = self.session(url).request(method, url, **kwargs)
+        logger.debug('%s %s -> %s', method, response.url, response.status_code)
+        return response
+
+    def close(self):
+        with self._lock:
+            sessions, self._sessions = self._sessions, dict()
+        for session in sessions.values():
+            session.close()
+
+
+class CapturedRequest(Exception):
+    """
+    Raised by the capturing transport instead of sending a request, carrying what would have been sent.
+    """
+    def __init__(self, method, url, kwargs):
+        super(CapturedRequest, self).__init__(method, url)
+        self.method = method
+        self.url = url
+        self.kwargs = kwargs
+
+
+class _CapturingTransport(object):
+    def request(self, method, url, **kwargs):
+        raise CapturedRequest(method, url, kwargs)
+
+
+class _ResponseTransport(object):
+    def __init__(self, response):
+        self.response = response
+        self.requests = 0
+
+    def request(self, method, url, **kwargs):
+        self.requests += 1
+        if self.requests > 1:
+            raise RuntimeError(
+                'the query sent more than one request, only its first one was answered: %s %s' % (method, url),
+            )
+        return self.response
+
+
+def request_key(method, url, params=None):
+    """
+    Returns a string identifying a request by method, url and (order-insensitive) query parameters.
+    """
+    query = urlencode(sorted((params or {}).items()), doseq=True)
+    return '%s %s?%s' % (method, url, query)
+
+
+def unwrap(transport, wrapper_type):
+    """
+    Removes the wrappers of the given type from a chain of transports wrapping each other through `inner`.
+
+    Parameters:
+        transport (object):  The outermost transport.
+        wrapper_type (type):  The class of the wrappers to remove.
+
+    Returns:
+        object:  The outermost remaining transport.
+    """
+    while isinstance(transport, wrapper_type):
+        transport = transport.inner
+    outer = transport
+    while hasattr(outer, 'inner'):
+        if isinstance(outer.inner, wrapper_type):
+            outer.inner = outer.inner.inner
+        else:
+            outer = outer.inner
+    return transport
+
+
+_transport = None
+_transport_lock = threading.Lock()
+_context_transport = contextvars.ContextVar('tzktpy_transport', default=None)
+
+
+def get_transport():
+    """
+    Returns the transport used by `Base._request`, creating a default pooled `Transport` on first use.
+
+    A transport installed with `use_transport` takes precedence within its context.
+    """
+    global _transport
+    override = _context_transport.get()
+    if override is not None:
+        return override
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = Transport()
+    return _transport
+
+
+def set_transport(transport):
+    """
+    Replaces the transport used by every tzktpy entity and returns the previous one.
+
+    Parameters:
+        transport (object):  Any object with a `request(method, url, **kwargs)` method.
+    """
+    global _transport
+    with _transport_lock:
+        previous, _transport = _transport, transport
+    return previous
+
+
+def configure(**kwargs):
+    """
+    Installs a new pooled `Transport` built from the given options, closing the previous one.
+
+    Keyword Parameters:
+        pool_maxsize (int):  Maximum number of connections kept alive per domain.
+        timeout (float|tuple):  Connect and read timeout in seconds.
+        retries (int):  Number of retries on connection errors and retryable status codes.
+        backoff_factor (float):  Exponential backoff factor between retries.
+        status_forcelist (tuple):  Status codes that trigger a retry.
+
+    Returns:
+        Transport
+    """
+    transport = Transport(**kwargs)
+    previous = set_transport(transport)
+    if isinstance(previous, Transport):
+        previous.close()
+    return transport
+
+
+@contextlib.contextmanager
+def use_transport(transport):
+    """
+    Routes the requests made within the block (in the current thread or task only) through the given transport.
+
+    Example:
+        >>> with use_transport(replay):
+        ...     quotes = Quote.get(level__gt=150000)
+    """
+    token = _context_transport.set(transport)
+    try:
+        yield transport
+    finally:
+        _context_transport.reset(token)
+
+
+def capture(query, *args, **kwargs):
+    """
+    Runs a tzktpy query without touching the network and returns the request it would have sent.
+
+    Parameters:
+        query (callable):  A tzktpy query classmethod, e.g. `BigMap.by_contract`.
+
+    Returns:
+        CapturedRequest:  The request, or None if the query completed without issuing one.
+    """
+    with use_transport(_CapturingTransport()):
+        try:
+            query(*args, **kwargs)
+        except CapturedRequest as request:
+            return request
+    return None
+
+
+def respond(query, response, *args, **kwargs):
+    """
+    Runs a tzktpy query against an already received response, so it is parsed exactly as a live one would be.
+    Queries sending more than one request (pages, chunks) raise `RuntimeError`.
+
+    Parameters:
+        query (callable):  A tzktpy query classmethod, e.g. `BigMap.by_contract`.
+        response (object):  A `requests.Response`-like object for the request returned by `capture`.
+    """
+    with use_transport(_ResponseTransport(response)):
+        return query(*args, **kwargs)
@@ -1,4 +1,4 @@
-from .base import Base
+from .base import Base, list_query
 __all__ = ('Proposal', 'VotingEpoch', 'VotingPeriod', 'PeriodVoter')
 
 
@@ -46,6 +46,7 @@ class Proposal(Base):
         return cls(hash, initiator, first_period, last_period, epoch, upvotes, rolls, status, metadata)
 
     @classmethod
+    @list_query
     def get(cls, **kwargs):
         """
         Returns a list of protocol proposals.
@@ -182,6 +183,7 @@ class VotingPeriod(Base):
         return cls(index, epoch, first_level, start_time, last_level, end_time, kind, status, total_bakers, total_rolls, upvotes_quorum, proposals_count, top_upvotes, top_rolls, ballots_quorum, supermajority, yay_ballots, yay_rolls, nay_ballots, nay_rolls, pass_ballots, pass_rolls)
 
     @classmethod
+    @list_query
     def get(cls, **kwargs):
         """
         Returns a list of voting periods.
@@ -292,6 +294,7 @@ class VotingEpoch(Base):
         return cls(index, first_level, start_time, last_level, end_time, status, periods, proposals)
 
     @classmethod
+    @list_query
     def get(cls, **kwargs):
         """
         Returns a list of voting epochs
@@ -400,6 +403,7 @@ class PeriodVoter(Base):
         return cls(delegate, rolls, status)
 
     @classmethod
+    @list_query
     def get(cls, index, **kwargs):
         """
         Returns voters from the voting period at the specified index.